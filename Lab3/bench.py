@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# bench.py
+"""
+Benchmarks del plano de control y del reenvío, con comparación contra una
+línea base guardada.
+
+Para cada tipo de topología de topogen.py y cada tamaño mide:
+- load_topology:  leer el topo.json generado (dijkstra_rt.load_topology)
+- routing_table:  routing_table_for desde un nodo (Dijkstra + tabla)
+- lsdb_graph:     reconstruir el grafo desde la LSDB (RouterSnapshot.graph)
+- lsdb_update:    instalar un LSP en la LSDB copy-on-write (with_lsdb_record)
+- flood_dedup:    un router de flooding recibe N paquetes distintos y cada uno
+                  repetido (un broadcast de cada nodo de la red); por paquete
+
+De cada medición se guarda el mínimo y la mediana de varias repeticiones
+(hasta juntar MIN_TIME s). Los resultados salen en JSON (--out) y se comparan
+con la línea base (bench_baseline.json): una medición es regresión si su
+mínimo supera al de la base en más de --threshold (y por más de NOISE_FLOOR
+s, para que los casos de microsegundos no den falsas alarmas); las
+regresiones se vuelven a medir una vez antes de informarlas y con
+regresiones el código de salida es 1.
+
+La base es de una máquina: en otra, regenerarla con --update-baseline (o
+comparar con --normalize, que escala la base por el tiempo de una carga fija
+de calibración guardado en cada corrida). En máquinas virtuales compartidas
+conviene --runs 2 o más: se queda con el mínimo de cada caso.
+
+Uso:
+    python bench.py                                   # 10..10k, compara con la base
+    python bench.py --sizes 10,100,1000,10000,50000 --kinds grid,scalefree
+    python bench.py --bench routing_table,lsdb_graph --out resultados.json
+    python bench.py --update-baseline --runs 3        # guarda la corrida como nueva base
+"""
+from __future__ import annotations
+import argparse
+import copy
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import id_map
+import router_log
+import topogen
+from dijkstra_rt import Graph, load_topology, routing_table_for
+from packets import BROADCAST, make_packet
+from router_state import RouterSnapshot
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+MIN_TIME    = 0.2     # s acumulados por medición
+MAX_REPEATS = 50
+THRESHOLD   = 0.25    # +25% sobre la base = regresión
+NOISE_FLOOR = 20e-6   # s; diferencias menores no cuentan
+
+
+class _NullTransport:
+    """Transporte que descarta lo publicado: mide el router, no Redis."""
+
+    def __init__(self, my_channel: str, on_packet: Callable[[Dict[str, Any]], None]):
+        self.my_channel = my_channel
+        self.on_packet = on_packet
+        self.published = 0
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def publish(self, channel: str, packet: dict) -> None:
+        self.published += 1
+
+    def put_blob(self, key: str, data: str, ttl: int) -> None:
+        pass
+
+    def get_blobs(self, keys: List[str]) -> List[Optional[str]]:
+        return [None] * len(keys)
+
+
+def measure(fn: Callable[[Any], Any], setup: Optional[Callable[[], Any]] = None,
+            min_time: float = MIN_TIME, max_repeats: int = MAX_REPEATS) -> Dict[str, Any]:
+    """Corre fn(setup()) hasta juntar min_time s; la preparación no se cronometra."""
+    times: List[float] = []
+    while len(times) < max_repeats and (not times or sum(times) < min_time):
+        arg = setup() if setup else None
+        # como timeit: sin GC durante la medición (la basura de casos anteriores mete ruido)
+        gc.collect()
+        gc.disable()
+        try:
+            t0 = time.perf_counter()
+            fn(arg)
+            times.append(time.perf_counter() - t0)
+        finally:
+            gc.enable()
+    return {"min_s": min(times), "median_s": statistics.median(times), "repeats": len(times)}
+
+
+def _lsdb_snapshot(graph: Graph) -> RouterSnapshot:
+    return RouterSnapshot().with_lsdb({n: {"seq": 1, "neighbors": neighs} for n, neighs in graph.items()})
+
+
+def _flood_case(graph: Graph):
+    """Router de flooding en un nodo de grado mediano y un broadcast por nodo, cada uno duplicado."""
+    from router_flooding_redis import FloodingRouterRedis
+    # grado mediano: en scalefree el hub mediría su fanout (cientos de publish por paquete), no el dedup
+    me = sorted(graph, key=lambda n: (len(graph[n]), n))[len(graph) // 2]
+    neighs = list(graph[me]) or [me]
+    base = []
+    for i, origin in enumerate(graph):
+        src = id_map.NODE_TO_CHANNEL[neighs[i % len(neighs)]]
+        base.append(make_packet("message", src, BROADCAST, hops=16, payload=origin))
+
+    def setup():
+        router = FloodingRouterRedis(me, graph, mode="flood", learning=False, transport_factory=_NullTransport)
+        pkts = copy.deepcopy(base)
+        return router, pkts + copy.deepcopy(base)
+
+    def run(arg):
+        router, pkts = arg
+        on_packet = router._on_packet
+        for p in pkts:
+            on_packet(p)
+
+    return setup, run, 2 * len(base)
+
+
+def run_benchmarks(kinds: List[str], sizes: List[int], benches: List[str], seed: int = 0,
+                   min_time: float = MIN_TIME, verbose: bool = True) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+
+    def record(bench: str, kind: str, size: int, graph: Graph, m: Dict[str, Any], items: int = 1):
+        row = {"bench": bench, "topo": kind, "size": size, "nodes": len(graph),
+               "edges": topogen.edge_count(graph), **m}
+        if items > 1:
+            row["per_item_us"] = m["min_s"] / items * 1e6
+        results.append(row)
+        if verbose:
+            extra = f"  ({row['per_item_us']:.2f} µs/paquete)" if items > 1 else ""
+            print(f"  {bench:<14} {kind:<10} {size:>6}  {m['min_s'] * 1000:10.3f} ms  x{m['repeats']}{extra}",
+                  flush=True)
+
+    for kind in kinds:
+        for size in sizes:
+            graph = topogen.generate(kind, str(size), seed)
+            missing = {n: n for n in graph if n not in id_map.NODE_TO_CHANNEL}
+            if missing:
+                id_map.register_nodes(missing)
+            src = next(iter(graph))
+
+            if "load_topology" in benches:
+                fd, path = tempfile.mkstemp(suffix=".json")
+                os.close(fd)
+                try:
+                    topogen.write_topology(graph, path)
+                    record("load_topology", kind, size, graph,
+                           measure(lambda _: load_topology(path), min_time=min_time))
+                finally:
+                    os.remove(path)
+            if "routing_table" in benches:
+                record("routing_table", kind, size, graph,
+                       measure(lambda _: routing_table_for(graph, src), min_time=min_time))
+            if "lsdb_graph" in benches or "lsdb_update" in benches:
+                snap = _lsdb_snapshot(graph)
+                if "lsdb_graph" in benches:
+                    record("lsdb_graph", kind, size, graph, measure(lambda _: snap.graph(), min_time=min_time))
+                if "lsdb_update" in benches:
+                    rec = {"seq": 2, "neighbors": dict(graph[src])}
+                    record("lsdb_update", kind, size, graph,
+                           measure(lambda _: snap.with_lsdb_record(src, rec), min_time=min_time))
+            if "flood_dedup" in benches:
+                setup, run, items = _flood_case(graph)
+                record("flood_dedup", kind, size, graph, measure(run, setup, min_time=min_time), items)
+    return results
+
+
+def calibrate() -> float:
+    """Tiempo de una carga fija (SPF sobre una grilla 32x32): la velocidad de la máquina."""
+    graph = topogen.grid(32, 32)
+    return measure(lambda _: routing_table_for(graph, "r0c0"), min_time=0.3)["min_s"]
+
+
+def run_meta() -> Dict[str, Any]:
+    """Fecha, commit, versión de Python, plataforma y calibración de la corrida."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except Exception:
+        commit = ""
+    return {"date": datetime.datetime.now().isoformat(timespec="seconds"), "commit": commit,
+            "python": platform.python_version(), "platform": platform.platform(),
+            "machine": platform.machine(), "calibration_s": calibrate()}
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+            threshold: float = THRESHOLD, scale: float = 1.0,
+            noise_floor: float = NOISE_FLOOR) -> List[Dict[str, Any]]:
+    """
+    Una fila por medición presente en ambas corridas, con ratio nuevo/base y
+    estado. `scale` = calibración nueva / calibración base: la base se
+    escala a la velocidad de esta máquina antes de comparar.
+    """
+    base = {(r["bench"], r["topo"], r["size"]): r for r in baseline}
+    rows = []
+    for r in results:
+        b = base.get((r["bench"], r["topo"], r["size"]))
+        if b is None:
+            continue
+        expected = b["min_s"] * scale
+        ratio = r["min_s"] / expected if expected > 0 else float("inf")
+        if ratio > 1 + threshold and r["min_s"] - expected > noise_floor:
+            status = "regresión"
+        elif ratio < 1 / (1 + threshold) and expected - r["min_s"] > noise_floor:
+            status = "mejora"
+        else:
+            status = "igual"
+        rows.append({"bench": r["bench"], "topo": r["topo"], "size": r["size"],
+                     "base_s": b["min_s"], "new_s": r["min_s"], "ratio": ratio, "status": status})
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks de SPF, LSDB y flooding")
+    ap.add_argument("--kinds", default=",".join(topogen.KINDS))
+    ap.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES))
+    ap.add_argument("--bench", default="load_topology,routing_table,lsdb_graph,lsdb_update,flood_dedup")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--min-time", type=float, default=MIN_TIME, help="s acumulados por medición")
+    ap.add_argument("--runs", type=int, default=1, help="pasadas completas; se queda con el mínimo de cada caso")
+    ap.add_argument("--out", help="escribir los resultados en este JSON")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--threshold", type=float, default=THRESHOLD)
+    ap.add_argument("--normalize", action="store_true", help="escalar la base por la calibración (otra máquina)")
+    ap.add_argument("--update-baseline", action="store_true", help="guardar esta corrida como línea base")
+    args = ap.parse_args()
+
+    router_log.set_level("warn")
+    kinds = [k for k in args.kinds.split(",") if k]
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    benches = [b for b in args.bench.split(",") if b]
+    print(f"⏱️ {len(kinds)} topologías x {len(sizes)} tamaños: {', '.join(benches)}")
+    results = run_benchmarks(kinds, sizes, benches, args.seed, args.min_time)
+    for i in range(1, args.runs):
+        print(f"⏱️ pasada {i + 1}/{args.runs}")
+        _keep_min(results, run_benchmarks(kinds, sizes, benches, args.seed, args.min_time, verbose=False))
+    doc: Dict[str, Any] = {"meta": run_meta(), "results": results}
+
+    if args.update_baseline:
+        _write(args.baseline, doc)
+        print(f"📌 Línea base → {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"(sin línea base en {args.baseline}; usar --update-baseline)")
+        if args.out:
+            _write(args.out, doc)
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    base_meta = baseline.get("meta", {})
+    scale = 1.0
+    if args.normalize and base_meta.get("calibration_s"):
+        scale = doc["meta"]["calibration_s"] / base_meta["calibration_s"]
+    rows = compare(results, baseline.get("results", []), args.threshold, scale)
+    # una segunda medición de cada regresión: el mínimo de las dos descarta picos de carga
+    retry = [r for r in rows if r["status"] == "regresión"]
+    if retry:
+        for r in retry:
+            _keep_min(results, run_benchmarks([r["topo"]], [r["size"]], [r["bench"]], args.seed,
+                                              args.min_time, verbose=False))
+        rows = compare(results, baseline.get("results", []), args.threshold, scale)
+    doc["comparison"] = {"baseline": base_meta, "scale": scale, "threshold": args.threshold, "rows": rows}
+    if args.out:
+        _write(args.out, doc)
+
+    speed = f", velocidad x{1 / scale:.2f}" if args.normalize else ""
+    print(f"\n📊 Contra la base ({base_meta.get('commit') or '?'}{speed}), umbral +{args.threshold:.0%}:")
+    for r in rows:
+        if r["status"] != "igual":
+            print(f"  {r['status']:<10} {r['bench']:<14} {r['topo']:<10} {r['size']:>6}  "
+                  f"{r['base_s'] * 1000:.3f} → {r['new_s'] * 1000:.3f} ms  (x{r['ratio']:.2f})")
+    worse = sum(r["status"] == "regresión" for r in rows)
+    better = sum(r["status"] == "mejora" for r in rows)
+    print(f"  {len(rows)} comparadas: {worse} regresiones, {better} mejoras")
+    sys.exit(1 if worse else 0)
+
+
+def _keep_min(results: List[Dict[str, Any]], again: List[Dict[str, Any]]) -> None:
+    """Reemplaza en `results` las mediciones que en `again` salieron más rápidas."""
+    by_key = {(r["bench"], r["topo"], r["size"]): r for r in results}
+    for r in again:
+        old = by_key.get((r["bench"], r["topo"], r["size"]))
+        if old is not None and r["min_s"] < old["min_s"]:
+            old.update(r)
+
+
+def _write(path: str, doc: Dict[str, Any]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=1)
+    if path != BASELINE_PATH:
+        print(f"📄 Resultados → {path}")
+
+if __name__ == "__main__":
+    main()
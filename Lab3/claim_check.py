@@ -0,0 +1,110 @@
+# claim_check.py
+"""
+Claim-check: enrutar una referencia al payload en vez del payload.
+
+Todos los nodos comparten el mismo Redis, así que copiar un cuerpo de varios
+MB en cada salto Pub/Sub es trabajo desperdiciado. Con claim-check el origen
+guarda el payload una sola vez (SET ... NX EX, clave direccionada por
+contenido: sha256 del JSON) y solo enruta un sobre chico:
+
+    "payload": "", "claim": {"key": "sec10.grupo0.blob:<sha256>", "size": <bytes>}
+
+El destino lo recupera con un GET (MGET en lote con fetch_many) y lo deja
+en una caché LRU local, así los repetidos no vuelven a Redis. El costo por
+salto ya no depende del tamaño del payload.
+
+ENV: CLAIM_CHECK_TTL (s), CLAIM_CHECK_MIN_BYTES (envío automático por
+     referencia a partir de ese tamaño; 0 = solo si se pide), CLAIM_CACHE_BYTES
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from id_map import SECTION, GROUP
+
+CLAIM_CHECK_TTL       = int(os.getenv("CLAIM_CHECK_TTL", "300"))                  # s en Redis
+CLAIM_CHECK_MIN_BYTES = int(os.getenv("CLAIM_CHECK_MIN_BYTES", "0"))
+CLAIM_CACHE_BYTES     = int(os.getenv("CLAIM_CACHE_BYTES", str(16 * 1024 * 1024)))
+
+
+def blob_key(digest: str) -> str:
+    return f"sec{SECTION}.grupo{GROUP}.blob:{digest}"
+
+
+class ClaimCheck:
+    def __init__(self, ttl: int = CLAIM_CHECK_TTL, min_bytes: int = CLAIM_CHECK_MIN_BYTES,
+                 cache_bytes: int = CLAIM_CACHE_BYTES):
+        self.ttl = ttl
+        self.min_bytes = min_bytes
+        self.cache_bytes = cache_bytes
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, str]" = OrderedDict()   # clave -> JSON del payload
+        self._cached = 0
+        self.stats: Dict[str, int] = {"stored": 0, "fetched": 0, "cache_hits": 0, "missing": 0}
+
+    def wants(self, payload: Any) -> bool:
+        """¿Conviene mandar este payload por referencia automáticamente?"""
+        return self.min_bytes > 0 and isinstance(payload, str) and len(payload) >= self.min_bytes
+
+    # ---------- origen ----------
+    def store(self, transport, payload: Any) -> Dict[str, Any]:
+        """Guarda `payload` en Redis (una vez por contenido) y devuelve el sobre "claim"."""
+        data = json.dumps(payload, ensure_ascii=False)
+        key = blob_key(hashlib.sha256(data.encode("utf-8")).hexdigest())
+        transport.put_blob(key, data, self.ttl)
+        self._remember(key, data)
+        self.stats["stored"] += 1
+        return {"key": key, "size": len(data.encode("utf-8"))}
+
+    # ---------- destino ----------
+    def resolve(self, transport, packet: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Paquete con el payload recuperado, o None si el blob ya venció."""
+        key = str((packet.get("claim") or {}).get("key", ""))
+        data = self.fetch_many(transport, [key])[0] if key else None
+        if data is None:
+            self.stats["missing"] += 1
+            return None
+        whole = dict(packet)
+        whole.pop("claim", None)
+        whole["payload"] = json.loads(data)
+        return whole
+
+    def fetch_many(self, transport, keys: List[str]) -> List[Optional[str]]:
+        """JSON de cada clave; las que no están en caché se piden juntas en un solo MGET."""
+        out: List[Optional[str]] = []
+        missing: List[str] = []
+        with self._lock:
+            for key in keys:
+                data = self._cache.get(key)
+                if data is not None:
+                    self._cache.move_to_end(key)
+                    self.stats["cache_hits"] += 1
+                else:
+                    missing.append(key)
+                out.append(data)
+        if missing:
+            fetched = dict(zip(missing, transport.get_blobs(missing)))
+            self.stats["fetched"] += len(missing)
+            for i, key in enumerate(keys):
+                if out[i] is None and fetched.get(key) is not None:
+                    out[i] = fetched[key]
+                    self._remember(key, fetched[key])
+        return out
+
+    def _remember(self, key: str, data: str) -> None:
+        size = len(data)
+        if size > self.cache_bytes:
+            return
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return
+            self._cache[key] = data
+            self._cached += size
+            while self._cached > self.cache_bytes:
+                _, old = self._cache.popitem(last=False)
+                self._cached -= len(old)
@@ -0,0 +1,34 @@
+# clock.py
+"""
+Reloj y timers de los routers.
+
+Los routers no llaman a time.time()/threading.Timer directamente sino a un
+reloj inyectable: en producción es SYSTEM_CLOCK (hora real + hilos Timer);
+el simulador (netsim.py) pasa un reloj virtual que avanza de evento en
+evento, así los HELLO/LSP/vectores periódicos corren en tiempo simulado.
+
+    clock.time()                -> s, época (marcas que viajan en paquetes)
+    clock.monotonic()           -> s, para medir intervalos
+    clock.call_later(delay, fn) -> objeto con cancel()
+"""
+from __future__ import annotations
+import threading
+import time
+from typing import Callable
+
+
+class SystemClock:
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def call_later(self, delay: float, fn: Callable[[], None]) -> threading.Timer:
+        t = threading.Timer(delay, fn)
+        t.daemon = True
+        t.start()
+        return t
+
+
+SYSTEM_CLOCK = SystemClock()
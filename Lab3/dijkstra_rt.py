@@ -1,11 +1,22 @@
 # dijkstra_rt.py
 from __future__ import annotations
+import os
 import json
-from typing import Dict, Tuple, List
+from collections import deque
+from typing import Dict, Tuple, List, Optional, Mapping
 import math
 import heapq
 
 Graph = Dict[str, Dict[str, float]]
+# rutas resumidas inyectadas por ABRs: {abr: {destino: costo desde el abr}}
+Summaries = Dict[str, Dict[str, float]]
+# saltos de esas mismas rutas: {abr: {destino: saltos desde el abr}}
+SummaryHops = Dict[str, Dict[str, int]]
+
+DEFAULT_AREA = "0"
+
+# margen de saltos sobre el camino más corto para el TTL de paquetes nuevos
+TTL_MARGIN = int(os.getenv("TTL_MARGIN", "2"))
 
 def load_topology(path: str) -> Graph:
     with open(path, "r", encoding="utf-8") as f:
@@ -22,7 +33,151 @@ def load_topology(path: str) -> Graph:
             graph[u] = {}
     return graph
 
-def routing_table_for(graph: Graph, source: str) -> List[Dict[str, object]]:
+def load_areas(path: str) -> Dict[str, str]:
+    """
+    Áreas por nodo desde topo.json (clave opcional "areas", hermana de "config"):
+        {"type": "topo", "config": {...}, "areas": {"A": "0", "C": "1"}}
+    Los nodos sin área asignada quedan en DEFAULT_AREA.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    cfg = data.get("config", data)
+    areas = data.get("areas", {}) if isinstance(data.get("areas", {}), dict) else {}
+    out = {u: DEFAULT_AREA for u in cfg}
+    out.update({u: str(a) for u, a in areas.items()})
+    return out
+
+def shortest_path_tree(graph: Graph, source: str) -> Dict[str, Optional[str]]:
+    """
+    Árbol de caminos más cortos desde `source` como {nodo: padre}. El desempate
+    es determinista (heap por (distancia, nodo)), así que todos los nodos que
+    comparten el mismo grafo calculan exactamente el mismo árbol.
+    """
+    dist: Dict[str, float] = {source: 0.0}
+    parent: Dict[str, Optional[str]] = {source: None}
+    pq: List[Tuple[float, str]] = [(0.0, source)]
+    done = set()
+    while pq:
+        d, u = heapq.heappop(pq)
+        if u in done:
+            continue
+        done.add(u)
+        for v in sorted(graph.get(u, {})):
+            nd = d + float(graph[u][v])
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                parent[v] = u
+                heapq.heappush(pq, (nd, v))
+    return parent
+
+def shortest_path(graph: Graph, source: str, dest: str) -> List[str]:
+    """Camino más corto [source, ..., dest] según shortest_path_tree; [] si no hay."""
+    parent = shortest_path_tree(graph, source)
+    if dest not in parent or dest == source:
+        return []
+    path = [dest]
+    while parent[path[-1]] is not None:
+        path.append(parent[path[-1]])
+    return path[::-1]
+
+def link_disjoint_paths(graph: Graph, source: str, dest: str, k: int) -> List[List[str]]:
+    """
+    Hasta `k` caminos source->dest sin enlaces en común: se toma el más corto,
+    se quitan sus enlaces (en ambos sentidos) y se repite. Greedy: puede
+    encontrar menos caminos que el óptimo, pero todos son disjuntos.
+    """
+    g = {u: dict(vs) for u, vs in graph.items()}
+    paths: List[List[str]] = []
+    while len(paths) < k:
+        path = shortest_path(g, source, dest)
+        if not path:
+            break
+        paths.append(path)
+        for u, v in zip(path, path[1:]):
+            g.get(u, {}).pop(v, None)
+            g.get(v, {}).pop(u, None)
+    return paths
+
+def path_cost(graph: Graph, path: List[str]) -> float:
+    return sum(float(graph[u][v]) for u, v in zip(path, path[1:]))
+
+def k_shortest_paths(graph: Graph, source: str, dest: str, k: int) -> List[List[str]]:
+    """
+    Hasta `k` caminos simples source->dest en orden de costo (algoritmo de Yen).
+    El primero es el mismo de shortest_path; los demás sirven para fijar
+    rutas alternativas (ingeniería de tráfico, mediciones).
+    """
+    first = shortest_path(graph, source, dest)
+    if not first:
+        return []
+    found = [first]
+    candidates: List[Tuple[float, List[str]]] = []
+    while len(found) < k:
+        last = found[-1]
+        for i in range(len(last) - 1):
+            root = last[:i + 1]
+            g = {u: dict(vs) for u, vs in graph.items() if u not in root[:-1]}
+            for vs in g.values():
+                for n in root[:-1]:
+                    vs.pop(n, None)
+            for p in found:
+                if p[:i + 1] == root and len(p) > i + 1:
+                    g.get(p[i], {}).pop(p[i + 1], None)
+            spur = shortest_path(g, root[-1], dest)
+            if spur:
+                cand = root[:-1] + spur
+                if cand not in found and all(cand != c for _, c in candidates):
+                    heapq.heappush(candidates, (path_cost(graph, cand), cand))
+        if not candidates:
+            break
+        found.append(heapq.heappop(candidates)[1])
+    return found
+
+def hop_counts(graph: Graph, source: str) -> Dict[str, int]:
+    """Saltos mínimos desde `source` a cada nodo alcanzable (BFS, ignora pesos)."""
+    hops = {source: 0}
+    q = deque([source])
+    while q:
+        u = q.popleft()
+        for v in graph.get(u, {}):
+            if v not in hops:
+                hops[v] = hops[u] + 1
+                q.append(v)
+    return hops
+
+def tree_hop_counts(graph: Graph, source: str) -> Dict[str, int]:
+    """
+    Saltos desde `source` a cada nodo por el árbol de shortest_path_tree, es
+    decir por el camino de menor costo (no el de menos saltos): con pesos, el
+    camino que siguen los paquetes puede ser más largo que el BFS.
+    """
+    parent = shortest_path_tree(graph, source)
+    hops = {source: 0}
+    for node in parent:
+        chain = []
+        while node not in hops:
+            chain.append(node)
+            node = parent[node]
+        for n in reversed(chain):
+            hops[n] = hops[node] + 1
+            node = n
+    return hops
+
+def ttl_for(hops: Mapping[str, int], dest: str, margin: int = TTL_MARGIN, fallback: int = 8) -> int:
+    """
+    TTL para un paquete nuevo: saltos del camino usado hasta `dest` + margen.
+    Para broadcast se usa la excentricidad del origen, es decir el máximo de
+    saltos a cualquier nodo conocido. Un destino sin dato de saltos (o nada
+    conocido) recibe `fallback`: la excentricidad podría quedarse corta.
+    """
+    if dest != "*":
+        return max(1, int(hops[dest]) + margin) if dest in hops else fallback
+    if hops:
+        return max(1, max(int(h) for h in hops.values()) + margin)
+    return fallback
+
+def routing_table_for(graph: Graph, source: str, summaries: Optional[Summaries] = None,
+                      summary_hops: Optional[SummaryHops] = None) -> List[Dict[str, object]]:
     dist = {n: math.inf for n in graph}
     prev = {n: None for n in graph}
     dist[source] = 0.0
@@ -40,12 +195,51 @@ def routing_table_for(graph: Graph, source: str) -> List[Dict[str, object]]:
                 heapq.heappush(pq, (nd, v))
 
     table = []
+    first_hop: Dict[str, str] = {}
+    hops_to: Dict[str, int] = {}
     for dest in graph:
         if dest == source or dist[dest] == math.inf:
             continue
         hop = dest
+        n_hops = 1
         while prev.get(hop) and prev[hop] != source:
             hop = prev[hop]
+            n_hops += 1
         next_hop = hop if prev.get(hop) == source else hop
-        table.append({"destino": dest, "next_hop": next_hop, "costo": dist[dest]})
+        first_hop[dest] = next_hop
+        hops_to[dest] = n_hops
+        # "saltos" cuenta enlaces del camino elegido aunque el costo sea ponderado
+        table.append({"destino": dest, "next_hop": next_hop, "costo": dist[dest], "saltos": n_hops})
+
+    if summaries:
+        table.extend(_inter_area_routes(summaries, source, dist, first_hop, hops_to, summary_hops or {}))
+    return table
+
+
+def _inter_area_routes(summaries: Summaries, source: str, dist: Dict[str, float],
+                       first_hop: Dict[str, str], hops_to: Dict[str, int],
+                       summary_hops: SummaryHops) -> List[Dict[str, object]]:
+    """
+    Rutas inter-área: costo(source->abr) + costo resumido; las intra-área tienen
+    prioridad. "saltos" = saltos hasta el abr + los que él anunció; sin ese dato
+    la entrada va sin "saltos" (el TTL cae en el fallback, no en la excentricidad).
+    """
+    best: Dict[str, Tuple[float, str, str]] = {}
+    for abr, routes in summaries.items():
+        d_abr = dist.get(abr, math.inf)
+        if d_abr == math.inf or abr == source or abr not in first_hop:
+            continue
+        for dest, cost in routes.items():
+            if dest == source or dist.get(dest, math.inf) < math.inf:
+                continue
+            total = d_abr + float(cost)
+            if dest not in best or total < best[dest][0]:
+                best[dest] = (total, first_hop[abr], abr)
+    table = []
+    for dest, (cost, nh, abr) in best.items():
+        entry: Dict[str, object] = {"destino": dest, "next_hop": nh, "costo": cost}
+        advertised = summary_hops.get(abr, {}).get(dest)
+        if advertised is not None:
+            entry["saltos"] = hops_to[abr] + int(advertised)
+        table.append(entry)
     return table
@@ -0,0 +1,298 @@
+# echo.py
+"""
+Servicio de eco y ping.
+
+Todo router con EchoService contesta los paquetes "echo" con un
+"echo_reply" que devuelve el mismo payload al origen. Con un router LSR la
+solicitud viaja con ruta de origen (camino SPF) y lleva ese camino en
+"echo.path"; la respuesta vuelve por el camino inverso, así el RTT mide ida
+y vuelta por los mismos enlaces. Con DV/flooding la respuesta usa la ruta
+normal.
+
+ping() manda `count` solicitudes cada `interval` s (sin esperar la
+respuesta anterior, como ping) y devuelve pérdida y RTT
+min/avg/p50/p99/max. flood() mide el máximo de paquetes/s por el camino:
+mantiene `window` solicitudes en vuelo y manda la siguiente en cuanto
+vuelve una respuesta.
+
+Los envíos se programan y los RTT se miden con router.clock (en netsim.py, el
+reloj virtual). ping()/flood() bloquean hasta el resultado; start_ping() y
+start_flood() no bloquean y entregan el resumen a on_done, para usarlos con
+un reloj virtual que avanza en el mismo hilo.
+
+    echo = EchoService(router)
+    echo.ping("D", count=10, interval=0.2, size=512)
+"""
+from __future__ import annotations
+import threading
+import uuid
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+from id_map import channel_to_node
+from metrics import histogram
+from router_log import get_logger
+from clock import SYSTEM_CLOCK
+
+REQUEST_TYPE = "echo"
+REPLY_TYPE   = "echo_reply"
+
+DEFAULT_COUNT    = 4
+DEFAULT_INTERVAL = 1.0   # s
+DEFAULT_SIZE     = 56    # caracteres de payload
+DEFAULT_TIMEOUT  = 2.0   # s de espera tras la última solicitud
+FLOOD_WINDOW     = 16    # solicitudes en vuelo en flood()
+
+ECHO_RTT_SECONDS = histogram("lab3_echo_rtt_seconds", "RTT de ping (echo → echo_reply)", ("node", "dst"))
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not values:
+        return float("nan")
+    rank = max(1, min(len(values), int(round(p / 100.0 * len(values) + 0.5))))
+    return values[rank - 1]
+
+
+def summarize(sent: int, rtts: List[float], elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(rtts)
+    received = len(ordered)
+    out: Dict[str, Any] = {"sent": sent, "received": received,
+                           "loss": (sent - received) / sent if sent else 0.0,
+                           "seconds": elapsed, "pps": received / elapsed if elapsed > 0 else 0.0}
+    if ordered:
+        out.update({"min": ordered[0], "avg": sum(ordered) / received, "p50": percentile(ordered, 50),
+                    "p99": percentile(ordered, 99), "max": ordered[-1]})
+    return out
+
+
+def format_summary(dst_node: str, r: Dict[str, Any]) -> List[str]:
+    """Resumen estilo ping para la CLI."""
+    lines = [f"--- {dst_node}: {r['sent']} enviados, {r['received']} recibidos, "
+             f"{r['loss'] * 100:.1f}% pérdida, {r['seconds']:.2f}s ({r['pps']:.0f} paquetes/s)"]
+    if r["received"]:
+        lines.append("rtt min/avg/p50/p99/max = " +
+                     "/".join(f"{r[k] * 1000:.3f}" for k in ("min", "avg", "p50", "p99", "max")) + " ms")
+    return lines
+
+
+def parse_ping_args(args: List[str]) -> Dict[str, Any]:
+    """`<destino> [-c N] [-i intervalo] [-s tamaño] [-f]` → kwargs de ping/flood (ValueError si no)."""
+    if not args:
+        raise ValueError("falta el destino")
+    opts: Dict[str, Any] = {"dst_node": args[0], "flood": False}
+    flags = {"-c": ("count", int), "-i": ("interval", float), "-s": ("size", int)}
+    i = 1
+    while i < len(args):
+        flag = args[i]
+        if flag == "-f":
+            opts["flood"] = True
+            i += 1
+        elif flag in flags and i + 1 < len(args):
+            name, conv = flags[flag]
+            opts[name] = conv(args[i + 1])
+            i += 2
+        else:
+            raise ValueError(f"opción desconocida: {flag}")
+    return opts
+
+
+class _Run:
+    def __init__(self, dst: str, total: int, started: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.dst = dst
+        self.total = total
+        self.started = started
+        self.next_seq = 0
+        self.sent: Dict[int, float] = {}    # seq -> enviado_en
+        self.rtts: List[float] = []
+        self.timer: Optional[Any] = None    # clock.call_later(...): próximo envío o fin de la espera
+        self.result: Optional[Dict[str, Any]] = None
+        self.done = threading.Event()
+        self.on_reply: Optional[Callable[[int, float], None]] = None
+        self.on_slot: Optional[Callable[[], None]] = None   # flood(): cada respuesta libera un lugar
+        self.on_done: Optional[Callable[[Dict[str, Any]], None]] = None
+
+
+class EchoService:
+    def __init__(self, router):
+        self.router = router
+        self.node_id = router.node_id
+        self.clock = getattr(router, "clock", SYSTEM_CLOCK)
+        self.log = get_logger(self.node_id)
+        self._lock = threading.Lock()
+        self._runs: Dict[str, _Run] = {}
+        self.stats: Dict[str, int] = {"requests": 0, "replies": 0}
+        router.register_handler(REQUEST_TYPE, self._on_request)
+        router.register_handler(REPLY_TYPE, self._on_reply)
+
+    # ---------- origen ----------
+    def ping(self, dst_node: str, count: int = DEFAULT_COUNT, interval: float = DEFAULT_INTERVAL,
+             size: int = DEFAULT_SIZE, timeout: float = DEFAULT_TIMEOUT,
+             on_reply: Optional[Callable[[int, float], None]] = None) -> Dict[str, Any]:
+        """Manda `count` ecos espaciados `interval` s; on_reply(seq, rtt_s) por cada respuesta."""
+        run = self.start_ping(dst_node, count, interval, size, timeout, on_reply)
+        return self._wait(run, count * interval + timeout)
+
+    def flood(self, dst_node: str, count: int = 1000, size: int = DEFAULT_SIZE,
+              window: int = FLOOD_WINDOW, timeout: float = DEFAULT_TIMEOUT) -> Dict[str, Any]:
+        """Tanda de `count` ecos con `window` en vuelo: paquetes/s sostenibles por el camino."""
+        run = self.start_flood(dst_node, count, size, window, timeout)
+        # cota de pared: en el peor caso cada lugar de la ventana se libera por timeout
+        return self._wait(run, (count / max(1, window) + 1) * timeout)
+
+    def start_ping(self, dst_node: str, count: int = DEFAULT_COUNT, interval: float = DEFAULT_INTERVAL,
+                   size: int = DEFAULT_SIZE, timeout: float = DEFAULT_TIMEOUT,
+                   on_reply: Optional[Callable[[int, float], None]] = None,
+                   on_done: Optional[Callable[[Dict[str, Any]], None]] = None) -> _Run:
+        """Como ping() pero sin bloquear: los envíos corren en el reloj y on_done(resumen) al terminar."""
+        run = self._open(dst_node, count)
+        run.on_reply, run.on_done = on_reply, on_done
+        self._ping_next(run, interval, size, timeout)
+        return run
+
+    def start_flood(self, dst_node: str, count: int = 1000, size: int = DEFAULT_SIZE,
+                    window: int = FLOOD_WINDOW, timeout: float = DEFAULT_TIMEOUT,
+                    on_done: Optional[Callable[[Dict[str, Any]], None]] = None) -> _Run:
+        """Como flood() pero sin bloquear; on_done(resumen) al terminar."""
+        run = self._open(dst_node, count)
+        run.on_done = on_done
+        run.on_slot = partial(self._flood_next, run, size, timeout)
+        for _ in range(min(max(1, window), count)):
+            self._flood_send(run, size)
+        self._arm(run, timeout, partial(self._flood_next, run, size, timeout, True))
+        if not count:
+            self._finish(run)
+        return run
+
+    def _ping_next(self, run: _Run, interval: float, size: int, timeout: float) -> None:
+        with self._lock:
+            if run.result is not None:
+                return
+            seq = run.next_seq
+            run.next_seq += 1
+        if seq < run.total:
+            self._request(run, seq, size)
+        if seq + 1 < run.total:
+            self._arm(run, interval, partial(self._ping_next, run, interval, size, timeout))
+        elif run.total:
+            self._arm(run, timeout, partial(self._finish, run))
+        else:
+            self._finish(run)
+
+    def _flood_send(self, run: _Run, size: int) -> bool:
+        with self._lock:
+            if run.result is not None or run.next_seq >= run.total:
+                return False
+            seq = run.next_seq
+            run.next_seq += 1
+        self._request(run, seq, size)
+        return True
+
+    def _flood_next(self, run: _Run, size: int, timeout: float, stalled: bool = False) -> None:
+        """Una respuesta (o `timeout` sin ninguna: se da por perdida) libera un lugar de la ventana."""
+        if self._flood_send(run, size) or not stalled:
+            self._arm(run, timeout, partial(self._flood_next, run, size, timeout, True))
+        else:
+            self._finish(run)   # nada más que enviar y `timeout` sin respuestas
+
+    def _arm(self, run: _Run, delay: float, fn: Callable[[], None]) -> None:
+        with self._lock:
+            if run.result is not None:
+                return
+            if run.timer:
+                run.timer.cancel()
+            run.timer = self.clock.call_later(delay, fn)
+
+    def _finish(self, run: _Run) -> None:
+        with self._lock:
+            if run.result is not None:
+                return
+            if run.timer:
+                run.timer.cancel()
+                run.timer = None
+            self._runs.pop(run.id, None)
+            run.result = summarize(run.total, run.rtts, self.clock.monotonic() - run.started)
+        run.done.set()
+        if run.on_done:
+            run.on_done(run.result)
+
+    def _wait(self, run: _Run, bound: float) -> Dict[str, Any]:
+        # espera en tiempo de pared: con el reloj del sistema los timers terminan la corrida antes
+        run.done.wait(bound + 1.0)
+        self._finish(run)
+        return run.result
+
+    def cli(self, args: List[str], out: Callable[[str], None] = print) -> None:
+        """Comando `ping <destino> [-c N] [-i intervalo] [-s tamaño] [-f]` de las CLIs."""
+        try:
+            opts = parse_ping_args(args)
+        except ValueError as e:
+            out(f"❌ {e}. Uso: ping <destino> [-c N] [-i intervalo] [-s tamaño] [-f]")
+            return
+        dst = opts.pop("dst_node")
+        if opts.pop("flood"):
+            opts.pop("interval", None)
+            opts.setdefault("count", 1000)
+            out(f"🌊 Flood ping a {dst}: {opts['count']} paquetes, {FLOOD_WINDOW} en vuelo")
+            result = self.flood(dst, **opts)
+        else:
+            out(f"🏓 PING {dst}: {opts.get('count', DEFAULT_COUNT)} paquetes de "
+                f"{opts.get('size', DEFAULT_SIZE)} caracteres")
+            result = self.ping(dst, on_reply=lambda seq, rtt: out(
+                f"  respuesta de {dst}: seq={seq} rtt={rtt * 1000:.3f} ms"), **opts)
+        for line in format_summary(dst, result):
+            out(line)
+
+    def _open(self, dst_node: str, count: int) -> _Run:
+        run = _Run(dst_node, count, self.clock.monotonic())
+        with self._lock:
+            self._runs[run.id] = run
+        return run
+
+    def _request(self, run: _Run, seq: int, size: int) -> None:
+        info: Dict[str, Any] = {"id": run.id, "seq": seq}
+        kwargs: Dict[str, Any] = {}
+        path = self.router.path_to(run.dst) if hasattr(self.router, "path_to") else []
+        if path:
+            info["path"] = path
+            kwargs["source_route"] = path
+        run.sent[seq] = self.clock.monotonic()
+        self.router.send(run.dst, "x" * size, p_type=REQUEST_TYPE, extra={"echo": info}, **kwargs)
+
+    def _on_reply(self, packet: Dict[str, Any]) -> None:
+        now = self.clock.monotonic()
+        info = packet.get("echo") or {}
+        self.stats["replies"] += 1
+        with self._lock:
+            run = self._runs.get(str(info.get("id", "")))
+        if run is None:
+            if "id" not in info:
+                # eco suelto (comando `echo` de la CLI)
+                self.log.info("data", "🔁 Eco de %s: %s", channel_to_node(packet.get("from", "")), packet.get("payload"))
+            return  # o respuesta tardía de un ping ya cerrado
+        sent_at = run.sent.pop(info.get("seq"), None)
+        if sent_at is None:
+            return
+        rtt = now - sent_at
+        run.rtts.append(rtt)
+        ECHO_RTT_SECONDS.labels(self.node_id, run.dst).observe(rtt)
+        if run.on_reply:
+            run.on_reply(info.get("seq"), rtt)
+        if len(run.rtts) == run.total:
+            self._finish(run)
+        elif run.on_slot:
+            run.on_slot()
+
+    # ---------- destino ----------
+    def _on_request(self, packet: Dict[str, Any]) -> None:
+        src = channel_to_node(packet.get("from", ""))
+        if not src:
+            return
+        self.stats["requests"] += 1
+        info = dict(packet.get("echo") or {})
+        kwargs: Dict[str, Any] = {}
+        path = info.pop("path", None)
+        if path and hasattr(self.router, "path_to"):
+            kwargs["source_route"] = list(reversed(path))   # vuelve por los mismos enlaces
+        self.router.send(src, packet.get("payload", ""), p_type=REPLY_TYPE, extra={"echo": info}, **kwargs)
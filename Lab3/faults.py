@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# faults.py
+"""
+Inyección de fallas y tiempos de convergencia sobre netsim.SimNetwork: los
+routers reales con reloj virtual, así una ventana de 60 s tarda lo que tarden
+sus eventos.
+
+Tras la convergencia inicial cada flujo de sondeo (--probes) manda un paquete
+cada --probe-interval s; primero se mide el control de fondo (--baseline s) y
+después se aplican los eventos en orden, uno por ventana (--window s):
+
+    link_down:A:B   link_up:A:B    enlace caído / restablecido (ambos sentidos)
+    kill:C          restart:C      router detenido / relanzado con estado vacío
+    cost:A:B:5                     costo nuevo del enlace: DV lo toma como costo
+                                   configurado; LSR lo mide por RTT, así que cambia
+                                   la demora del enlace en proporción
+    pause:3                        "Redis" caído 3 s: lo publicado se pierde
+
+Por evento:
+- blackhole_s: el tramo más largo de sondeos perdidos de un flujo (del primero
+  al último perdido, más un intervalo) y el total de sondeos perdidos;
+- fib_ok_s: hasta que la FIB de toda la red quedó consistente y sin lazos
+  (siguiendo next hops por enlaces vivos, cada par alcanzable llega a destino)
+  y no volvió a romperse; None si al cierre de la ventana seguía rota. También
+  el máximo de pares en lazo (micro-loops), sin camino, y rutas rancias a
+  destinos que ya no se alcanzan;
+- fib_settled_s: último cambio de alguna FIB dentro de la ventana;
+- control: mensajes de control por tipo en la ventana y el extra sobre el fondo.
+
+--timer NOMBRE=VALOR cambia constantes del módulo del router antes de crearlos
+(HELLO_PERIOD, DEAD_HELLOS, LSP_PERIOD, UPDATE_PERIOD, ROUTE_TIMEOUT, TRIGGER_DELAY...), para
+ajustar timers con datos. Las derivadas (ROUTE_TIMEOUT = 3 * UPDATE_PERIOD) no
+se recalculan solas: hay que pasarlas también.
+
+Uso:
+    python faults.py topo.json --router dv
+    python faults.py --gen grid:25 --router lsr --event link_down:r0c0:r0c1 --event link_up:r0c0:r0c1
+    python faults.py topo.json --router dv --timer UPDATE_PERIOD=2 --timer ROUTE_TIMEOUT=6 --json fallas.json
+"""
+from __future__ import annotations
+import argparse
+import importlib
+import json
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import router_log
+import topogen
+from dijkstra_rt import load_topology, hop_counts, routing_table_for, shortest_path
+from loadgen import traffic_matrix
+from netsim import SimNetwork, CHECK_PERIOD, DATA_TYPE, ROUTER_KINDS
+
+PROBE_TYPE     = "probe"
+PROBE_INTERVAL = 0.1    # s virtuales entre sondeos de un flujo
+DEFAULT_WINDOW = 60.0   # s virtuales por evento
+BASELINE       = 20.0   # s virtuales de control de fondo antes del primer evento
+GRACE          = 2.0    # s al final de la ventana: sondeos aún en vuelo, no se cuentan
+EVENT_ARGS = {"link_down": 2, "link_up": 2, "kill": 1, "restart": 1, "cost": 3, "pause": 1}
+ROUTER_MODULES = {"lsr": "router_lsr_redis", "dv": "router_dv_redis", "flooding": "router_flooding_redis"}
+
+
+def parse_event(spec: str) -> Tuple[str, List[str]]:
+    kind, *args = spec.split(":")
+    if kind not in EVENT_ARGS or len(args) != EVENT_ARGS[kind]:
+        raise ValueError(f"evento inválido '{spec}'")
+    return kind, args
+
+
+def apply_timers(router: str, overrides: Dict[str, float]) -> None:
+    """Pisa constantes numéricas del módulo del router (se leen al programar cada timer)."""
+    module = importlib.import_module(ROUTER_MODULES[router])
+    for name, value in overrides.items():
+        current = getattr(module, name, None)
+        if not isinstance(current, (int, float)) or isinstance(current, bool):
+            raise ValueError(f"{module.__name__} no tiene la constante numérica {name}")
+        setattr(module, name, type(current)(value))
+
+
+class FaultHarness:
+    def __init__(self, graph: Dict[str, Dict[str, float]], router: str = "lsr",
+                 probes: Optional[List[Tuple[str, str]]] = None, probe_interval: float = PROBE_INTERVAL,
+                 delay_per_cost: float = 0.01, seed: int = 0, **router_kwargs: Any):
+        self.net = SimNetwork(graph, router, delay_per_cost=delay_per_cost, seed=seed, **router_kwargs)
+        self.kind = router
+        self.delay_per_cost = delay_per_cost
+        self.interval = probe_interval
+        self.flows = list(probes or [])
+        self.weights: Dict[Tuple[str, str], float] = {
+            (a, b): float(w) for a, neighs in graph.items() for b, w in neighs.items()}
+        self._probes: List[Tuple[float, int]] = []   # id de sondeo -> (enviado_en, flujo)
+        self._arrived: Set[int] = set()
+        self._topo_version = 0
+        self._expected: Optional[Tuple[int, Dict[str, Set[str]]]] = None
+        self._fibs: Dict[str, Any] = {}
+        self._fib_changed_at = 0.0
+        self.net.register_handler(PROBE_TYPE, self._on_probe)
+
+    # ---------- topología viva ----------
+    def live_graph(self) -> Dict[str, Dict[str, float]]:
+        down = self.net.down
+        live: Dict[str, Dict[str, float]] = {n: {} for n in self.net.graph if n not in down}
+        for (a, b), link in self.net.links.items():
+            if link.up and a in live and b in live:
+                live[a][b] = self.weights[(a, b)]
+        return live
+
+    def expected(self) -> Dict[str, Set[str]]:
+        """Destinos que cada router vivo debería alcanzar ahora (DV: costo < infinito del DV)."""
+        if self._expected is None or self._expected[0] != self._topo_version:
+            live = self.live_graph()
+            if self.kind == "dv":
+                from router_dv_redis import infinity_for
+                limit = infinity_for(self.net.graph)   # el de los routers: pesos de topo.json
+                reach = {n: {r["destino"] for r in routing_table_for(live, n) if r["costo"] < limit}
+                         for n in live}
+            else:
+                reach = {n: set(hop_counts(live, n)) - {n} for n in live}
+            self._expected = (self._topo_version, reach)
+        return self._expected[1]
+
+    def fib_status(self) -> Dict[str, int]:
+        """Pares (origen, destino) alcanzables cuyo camino de next hops entra en lazo o se corta."""
+        if self.kind == "flooding":
+            return {"loop_pairs": 0, "blackhole_pairs": 0, "stale_routes": 0}   # sin FIB
+        live = self.live_graph()
+        expected = self.expected()
+        fibs = {n: self.net.routers[n]._state.snapshot.fib for n in live}
+        for n, fib in fibs.items():
+            if self._fibs.get(n) is not fib and self._fibs.get(n) != fib:
+                self._fib_changed_at = self.net.clock.now
+            self._fibs[n] = fib
+        counts = {"loop": 0, "hole": 0}
+        for dst in live:
+            outcome: Dict[str, str] = {dst: "ok"}   # nodo -> cómo termina su camino hacia dst
+            for src in live:
+                if dst not in expected[src] or src in outcome:
+                    continue
+                path: List[str] = []
+                on_path: Set[str] = set()
+                cur = src
+                while cur not in outcome:
+                    if cur in on_path:
+                        result = "loop"
+                        break
+                    on_path.add(cur)
+                    path.append(cur)
+                    nh = fibs[cur].get(dst)
+                    if not nh or nh not in live[cur]:
+                        result = "hole"
+                        break
+                    cur = nh
+                else:
+                    result = outcome[cur]
+                for n in path:
+                    outcome[n] = result
+            for src in live:
+                if dst in expected[src] and outcome[src] != "ok":
+                    counts[outcome[src]] += 1
+        stale = sum(1 for n, fib in fibs.items() for d in fib if d not in expected[n])
+        return {"loop_pairs": counts["loop"], "blackhole_pairs": counts["hole"], "stale_routes": stale}
+
+    # ---------- sondeos ----------
+    def _probe_tick(self) -> None:
+        expected = self.expected()
+        for i, (src, dst) in enumerate(self.flows):
+            if src not in expected or dst not in expected[src]:
+                continue   # origen caído o destino inalcanzable: no hay nada que medir
+            pid = len(self._probes)
+            self._probes.append((self.net.clock.now, i))
+            self.net.routers[src].send(dst, "", p_type=PROBE_TYPE, extra={"probe": {"id": pid, "dst": dst}})
+        self.net.clock.call_later(self.interval, self._probe_tick)
+
+    def _on_probe(self, node: str, packet: Dict[str, Any]) -> None:
+        info = packet.get("probe") or {}
+        if info.get("dst") == node:
+            self._arrived.add(info.get("id"))
+
+    def _losses(self, first: int, until: float) -> Dict[str, Any]:
+        """Sondeos desde el id `first` enviados antes de `until`: perdidos y peor tramo por flujo."""
+        runs: Dict[int, Tuple[float, float]] = {}   # flujo -> (inicio, fin) del tramo actual
+        worst = 0.0
+        lost = sent = 0
+        for pid in range(first, len(self._probes)):
+            t, flow = self._probes[pid]
+            if t >= until:
+                break
+            sent += 1
+            if pid in self._arrived:
+                runs.pop(flow, None)
+                continue
+            lost += 1
+            start = runs.get(flow, (t, t))[0]
+            runs[flow] = (start, t)
+            worst = max(worst, t - start + self.interval)
+        return {"probes": sent, "lost": lost, "blackhole_s": round(worst, 3)}
+
+    # ---------- eventos ----------
+    def apply(self, kind: str, args: List[str]) -> None:
+        net = self.net
+        if kind in ("link_down", "link_up"):
+            net.set_link(args[0], args[1], up=kind == "link_up")
+        elif kind == "kill":
+            net.kill(args[0])
+        elif kind == "restart":
+            net.restart(args[0])
+        elif kind == "cost":
+            a, b, cost = args[0], args[1], float(args[2])
+            self.weights[(a, b)] = self.weights[(b, a)] = cost
+            net.set_link(a, b, delay=cost * self.delay_per_cost)
+            if self.kind == "dv":
+                for x, y in ((a, b), (b, a)):
+                    if x not in net.down:
+                        net.routers[x].set_link_cost(y, cost)
+        elif kind == "pause":
+            net.paused = True
+            net.clock.call_later(float(args[0]), lambda: setattr(net, "paused", False))
+        self._topo_version += 1
+
+    def _control(self, before: Counter) -> Dict[str, int]:
+        return {t: n - before.get(t, 0) for t, n in self.net.sent.items()
+                if t not in (PROBE_TYPE, DATA_TYPE) and n > before.get(t, 0)}
+
+    def fib_ok(self) -> bool:
+        status = self.fib_status()
+        return not (status["loop_pairs"] or status["blackhole_pairs"])
+
+    def start(self, timeout: float = 120.0) -> Optional[float]:
+        """Corre hasta la primera FIB consistente (devuelve el instante, o None) y arranca los sondeos."""
+        converged: Optional[float] = None
+        while self.net.clock.now < timeout:
+            self.net.run(CHECK_PERIOD)
+            if self.fib_ok():
+                converged = self.net.clock.now
+                break
+        self._probe_tick()
+        return converged
+
+    def baseline(self, seconds: float = BASELINE) -> Dict[str, Any]:
+        before, first = Counter(self.net.sent), len(self._probes)
+        t0 = self.net.clock.now
+        self.net.run(seconds)
+        control = self._control(before)
+        out = self._losses(first, t0 + seconds - GRACE)
+        out.update({"seconds": seconds, "control": control,
+                    "control_per_s": sum(control.values()) / seconds, **self.fib_status()})
+        return out
+
+    def run_event(self, kind: str, args: List[str], window: float = DEFAULT_WINDOW,
+                  control_rate: float = 0.0) -> Dict[str, Any]:
+        net = self.net
+        t0 = net.clock.now
+        before, first = Counter(net.sent), len(self._probes)
+        self._fib_changed_at = t0
+        self.apply(kind, args)
+        worst = {"loop_pairs": 0, "blackhole_pairs": 0, "stale_routes": 0}
+        last_bad: Optional[float] = None
+        status = self.fib_status()
+        while True:
+            for k in worst:
+                worst[k] = max(worst[k], status[k])
+            if self.kind != "flooding" and (status["loop_pairs"] or status["blackhole_pairs"]):
+                last_bad = net.clock.now
+            if net.clock.now >= t0 + window:
+                break
+            net.run(CHECK_PERIOD)
+            status = self.fib_status()
+        control = self._control(before)
+        total = sum(control.values())
+        if self.kind == "flooding":
+            fib_ok = None   # sin FIB: solo cuentan los sondeos
+        elif last_bad is None:
+            fib_ok = 0.0
+        elif last_bad >= net.clock.now:
+            fib_ok = None
+        else:
+            fib_ok = round(last_bad - t0 + CHECK_PERIOD, 3)
+        out: Dict[str, Any] = {"event": ":".join([kind] + args), "at": round(t0, 3)}
+        out.update(self._losses(first, t0 + window - GRACE))
+        out.update({"fib_ok_s": fib_ok, "fib_settled_s": round(self._fib_changed_at - t0, 3),
+                    "max_loop_pairs": worst["loop_pairs"], "max_blackhole_pairs": worst["blackhole_pairs"],
+                    "stale_routes_at_end": status["stale_routes"],
+                    "control": control, "control_total": total,
+                    "control_extra": round(total - control_rate * window, 1)})
+        return out
+
+
+def default_scenario(graph: Dict[str, Dict[str, float]], flows: List[Tuple[str, str]]) -> List[str]:
+    """Sobre el camino del primer flujo: cae y vuelve un enlace, sube y baja su costo,
+    muere y se relanza un nodo de tránsito, y una pausa de Redis."""
+    src, dst = flows[0]
+    path = shortest_path(graph, src, dst)
+    a, b = path[0], path[1]
+    if len(path) > 2:
+        transit = path[1]
+    else:
+        transit = max((n for n in graph if n not in (src, dst)), key=lambda n: len(graph[n]), default=b)
+    weight = float(graph[a][b])
+    return [f"link_down:{a}:{b}", f"link_up:{a}:{b}", f"cost:{a}:{b}:{weight * 10:g}",
+            f"cost:{a}:{b}:{weight:g}", f"kill:{transit}", f"restart:{transit}", "pause:2"]
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "—" if value is None else f"{value:.1f}s"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fallas inyectadas y tiempos de convergencia (simulados)")
+    ap.add_argument("topo", nargs="?", help="topo.json (o --gen)")
+    ap.add_argument("--gen", help="topología generada TIPO:TAMAÑO (ver topogen.py)")
+    ap.add_argument("--router", choices=ROUTER_KINDS, default="lsr")
+    ap.add_argument("--event", action="append", default=[],
+                    help="link_down:A:B, link_up:A:B, kill:C, restart:C, cost:A:B:N, pause:S (repetible, en orden)")
+    ap.add_argument("--probes", default="", help='"all", "random:K" o A:D,B:C (por defecto: all hasta 6 nodos, si no random:16)')
+    ap.add_argument("--probe-interval", type=float, default=PROBE_INTERVAL)
+    ap.add_argument("--window", type=float, default=DEFAULT_WINDOW, help="s virtuales por evento")
+    ap.add_argument("--baseline", type=float, default=BASELINE, help="s virtuales de fondo antes del primer evento")
+    ap.add_argument("--delay-ms", type=float, default=10.0, help="demora por unidad de costo del enlace")
+    ap.add_argument("--timer", action="append", default=[], help="NOMBRE=VALOR en el módulo del router (repetible)")
+    ap.add_argument("--timeout", type=float, default=120.0, help="s virtuales máximos para la convergencia inicial")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--log", default="error", help="nivel de log de los routers")
+    ap.add_argument("--json", help="escribir los resultados en este JSON")
+    args = ap.parse_args()
+
+    if args.gen:
+        kind, _, size = args.gen.partition(":")
+        graph = topogen.generate(kind, size, args.seed)
+    elif args.topo:
+        graph = load_topology(args.topo)
+    else:
+        ap.error("falta topo.json o --gen")
+    router_log.set_level(args.log)
+    try:
+        timers = {k: float(v) for k, _, v in (t.partition("=") for t in args.timer)}
+        apply_timers(args.router, timers)
+        events = [parse_event(e) for e in args.event]
+        reachable = {n: set(hop_counts(graph, n)) - {n} for n in graph}
+        flows = traffic_matrix(reachable, args.probes or ("all" if len(graph) <= 6 else "random:16"), args.seed)
+    except ValueError as e:
+        ap.error(str(e))
+    if not events:
+        events = [parse_event(e) for e in default_scenario(graph, flows)]
+    for kind, ev_args in events:
+        nodes = [] if kind == "pause" else ev_args[:2]   # cost:A:B:N -> A, B
+        unknown = [n for n in nodes if n not in graph]
+        if unknown:
+            ap.error(f"nodos desconocidos en {kind}: {', '.join(unknown)}")
+
+    t_wall = time.perf_counter()
+    h = FaultHarness(graph, args.router, flows, args.probe_interval, args.delay_ms / 1000.0, args.seed)
+    converged = h.start(args.timeout)
+    if converged is None and args.router != "flooding":
+        print(f"[faults] ⚠️ Sin convergencia inicial en {args.timeout}s virtuales", file=sys.stderr)
+    base = h.baseline(args.baseline)
+    print(f"🧪 {args.router}: {len(graph)} nodos, {len(flows)} flujos de sondeo cada {args.probe_interval:g}s; "
+          f"convergencia inicial {_fmt(converged)}; control de fondo {base['control_per_s']:.1f} msgs/s")
+    if base["lost"]:
+        # pérdida sin fallas (p.ej. TTL corto para el camino elegido): se repite en cada ventana
+        print(f"⚠️ Sin eventos ya se pierden {base['lost']}/{base['probes']} sondeos "
+              f"(tramo máximo {base['blackhole_s']:.1f}s)")
+    results = []
+    for kind, ev_args in events:
+        r = h.run_event(kind, ev_args, args.window, base["control_per_s"])
+        results.append(r)
+        print(f"💥 {r['event']:<22} blackhole {r['blackhole_s']:5.1f}s ({r['lost']}/{r['probes']} sondeos)  "
+              f"FIB ok {_fmt(r['fib_ok_s']):>6}  estable {r['fib_settled_s']:.1f}s  "
+              f"lazos {r['max_loop_pairs']}  control {r['control_total']} ({r['control_extra']:+.0f})")
+    print(f"⏱️ {h.net.clock.now:.0f}s simulados en {time.perf_counter() - t_wall:.1f}s")
+    if args.json:
+        doc = {"router": args.router, "nodes": len(graph), "flows": [f"{s}>{d}" for s, d in flows],
+               "timers": timers, "window": args.window, "converged_s": converged,
+               "baseline": base, "events": results}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=1, ensure_ascii=False)
+        print(f"📄 Resultados → {args.json}")
+
+
+if __name__ == "__main__":
+    main()
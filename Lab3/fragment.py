@@ -0,0 +1,143 @@
+# fragment.py
+"""
+Fragmentación y reensamblado de payloads grandes.
+
+El router de origen parte los payloads de texto de más de FRAGMENT_SIZE
+caracteres en fragmentos numerados; cada fragmento es un paquete completo
+(mismo tipo, destino y campos extra, id propio) que se enruta por su cuenta
+y sale sin esperar al anterior. El campo "frag" los identifica:
+
+    "frag": {"id": <id del paquete original>, "i": <índice>, "n": <total>}
+
+Solo el destino reensambla. El buffer de reensamblado está acotado en bytes
+(REASSEMBLY_MAX_BYTES, se descartan primero los mensajes incompletos más
+viejos) y en tiempo (REASSEMBLY_TIMEOUT, un mensaje al que le falta algún
+fragmento se descarta al vencer). Con evict=False un fragmento que no entra
+se rechaza en vez de desalojar mensajes ajenos: quien confirma fragmentos
+(multipath.py) no puede perder partes ya confirmadas.
+
+ENV: FRAGMENT_SIZE (0 = sin fragmentar), REASSEMBLY_MAX_BYTES, REASSEMBLY_TIMEOUT
+"""
+from __future__ import annotations
+import copy
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from packets import get_packet_id
+
+FRAGMENT_SIZE        = int(os.getenv("FRAGMENT_SIZE", "4096"))                  # caracteres por fragmento
+REASSEMBLY_MAX_BYTES = int(os.getenv("REASSEMBLY_MAX_BYTES", str(4 * 1024 * 1024)))
+REASSEMBLY_TIMEOUT   = float(os.getenv("REASSEMBLY_TIMEOUT", "10"))              # s
+
+
+def fragment_packet(packet: Dict[str, Any], size: int = FRAGMENT_SIZE) -> List[Dict[str, Any]]:
+    """Parte `packet` en fragmentos; devuelve [packet] si no hace falta."""
+    payload = packet.get("payload")
+    if size <= 0 or not isinstance(payload, str) or len(payload) <= size:
+        return [packet]
+    orig_id = get_packet_id(packet)
+    n = (len(payload) + size - 1) // size
+    frags = []
+    for i in range(n):
+        # copia profunda (sin el payload): cada fragmento viaja por su cuenta y los
+        # routers agregan a "trace" y recortan "route" en el propio paquete
+        frag = copy.deepcopy(dict(packet, payload=""))
+        # id propio por fragmento (el flooding descarta ids repetidos)
+        frag["headers"][0]["id"] = str(uuid.uuid4())
+        frag["payload"] = payload[i * size:(i + 1) * size]
+        frag["frag"] = {"id": orig_id, "i": i, "n": n}
+        frags.append(frag)
+    return frags
+
+
+class Reassembler:
+    def __init__(self, max_bytes: int = REASSEMBLY_MAX_BYTES, timeout: float = REASSEMBLY_TIMEOUT,
+                 evict: bool = True, now: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.evict = evict
+        self._now = now   # los routers pasan clock.monotonic (reloj virtual en netsim.py)
+        self._lock = threading.Lock()
+        # id original -> {"t": primer fragmento, "n": total, "parts": {i: str}, "bytes": int, "first": paquete}
+        self._partial: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self.stats: Dict[str, int] = {"fragments": 0, "reassembled": 0, "expired": 0, "evicted": 0}
+
+    def add(self, packet: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Agrega un fragmento; devuelve el paquete original cuando está completo."""
+        return self.offer(packet)[1]
+
+    def offer(self, packet: Dict[str, Any]) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Como add(), pero dice además si el fragmento quedó guardado (o ya lo
+        estaba): (aceptado, paquete original si se completó).
+        """
+        info = packet.get("frag") or {}
+        try:
+            key, i, n = str(info["id"]), int(info["i"]), int(info["n"])
+        except (KeyError, TypeError, ValueError):
+            return False, None
+        part = packet.get("payload") or ""
+        size = len(part.encode("utf-8"))
+        now = self._now()
+        with self._lock:
+            self.stats["fragments"] += 1
+            self._expire_locked(now)
+            entry = self._partial.get(key)
+            if entry is None:
+                if n <= 0 or size > self.max_bytes:
+                    return False, None
+                entry = self._partial[key] = {"t": now, "n": n, "parts": {}, "bytes": 0, "first": packet}
+            if not 0 <= i < entry["n"]:
+                return False, None
+            if i in entry["parts"]:
+                return True, None   # repetido (p.ej. reenvío tras perder la confirmación)
+            while self.evict and self._bytes + size > self.max_bytes and self._evict_oldest_locked(keep=key):
+                pass
+            if self._bytes + size > self.max_bytes:
+                if not entry["parts"]:
+                    del self._partial[key]
+                return False, None
+            entry["parts"][i] = part
+            entry["bytes"] += size
+            self._bytes += size
+            if len(entry["parts"]) < entry["n"]:
+                return True, None
+            del self._partial[key]
+            self._bytes -= entry["bytes"]
+            self.stats["reassembled"] += 1
+
+        whole = dict(entry["first"])
+        whole.pop("frag", None)
+        whole["headers"] = [dict(whole["headers"][0], id=key)] + whole["headers"][1:]
+        whole["payload"] = "".join(entry["parts"][j] for j in range(entry["n"]))
+        return True, whole
+
+    def pending(self) -> Dict[str, str]:
+        """{id: "recibidos/total"} de los mensajes incompletos."""
+        with self._lock:
+            return {k: f"{len(e['parts'])}/{e['n']}" for k, e in self._partial.items()}
+
+    def _expire_locked(self, now: float) -> None:
+        while self._partial:
+            key, entry = next(iter(self._partial.items()))
+            if now - entry["t"] <= self.timeout:
+                break
+            self._drop_locked(key)
+            self.stats["expired"] += 1
+
+    def _evict_oldest_locked(self, keep: str) -> bool:
+        for key in self._partial:
+            if key != keep:
+                self._drop_locked(key)
+                self.stats["evicted"] += 1
+                return True
+        return False
+
+    def _drop_locked(self, key: str) -> None:
+        entry = self._partial.pop(key)
+        self._bytes -= entry["bytes"]
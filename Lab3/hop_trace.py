@@ -0,0 +1,182 @@
+# hop_trace.py
+"""
+Traza por salto: dónde se va el tiempo de un mensaje.
+
+Con trace=True (o TRACE=1 para todos los envíos) el paquete lleva
+
+    "trace": [[nodo, rx_ms, tx_ms], ...]
+
+El origen abre el primer registro al crear el paquete; cada router agrega
+[nodo, rx_ms, None] al recibirlo y completa tx_ms justo antes de publicarlo
+(también si el paquete esperó en la cola sin ruta). El destino agrega su
+registro de llegada y descompone (las marcas salen del reloj del router,
+clock.py: en netsim.py son tiempo simulado):
+
+- cola del nodo i:     tx_i - rx_i        (mismo reloj: exacto)
+- enlace i → i+1:      rx_{i+1} - tx_i    (relojes distintos: incluye el
+                                           desfase si los nodos no están
+                                           sincronizados)
+
+Cada descomposición va a dos histogramas (lab3_trace_queue_seconds por
+router y lab3_trace_link_seconds por enlace, etiquetados con el nodo que
+observa), así el router o enlace caliente de un camino aparece en /metrics.
+
+Tracer agrega sondas a pedido: "trace" viaja trazado hasta el destino, que
+devuelve los registros en un "trace_reply".
+
+ENV: TRACE (1 = trazar todos los envíos)
+"""
+from __future__ import annotations
+import os
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from clock import SYSTEM_CLOCK
+from id_map import channel_to_node
+from metrics import histogram
+
+TRACE_ALL = os.getenv("TRACE", "0") == "1"
+
+PROBE_TYPE = "trace"
+REPLY_TYPE = "trace_reply"
+
+TRACE_QUEUE_SECONDS = histogram("lab3_trace_queue_seconds",
+                                "Tiempo de un paquete trazado dentro de cada router (recepción → publicación)",
+                                ("node", "router"))
+TRACE_LINK_SECONDS = histogram("lab3_trace_link_seconds",
+                               "Latencia de cada enlace en paquetes trazados (publicación → recepción)",
+                               ("node", "link"))
+
+
+def now_ms(clock=SYSTEM_CLOCK) -> float:
+    # el reloj del router: en netsim.py es virtual y la traza mide tiempo simulado
+    return round(clock.time() * 1000, 3)
+
+
+def open_trace(packet: Dict[str, Any], node: str, clock=SYSTEM_CLOCK) -> None:
+    """El origen abre la traza; tx se completa al publicar."""
+    packet["trace"] = [[node, now_ms(clock), None]]
+
+
+def on_receive(packet: Dict[str, Any], node: str, clock=SYSTEM_CLOCK) -> None:
+    trace = packet.get("trace")
+    if isinstance(trace, list):
+        trace.append([node, now_ms(clock), None])
+
+
+def on_send(packet: Dict[str, Any], clock=SYSTEM_CLOCK) -> None:
+    trace = packet.get("trace")
+    if trace:
+        trace[-1][2] = now_ms(clock)
+
+
+def breakdown(trace: List[List[Any]]) -> List[Dict[str, Any]]:
+    """Un dict por nodo del camino: {"node", "queue_ms", "link_ms"} (link_ms: hacia el siguiente)."""
+    hops = []
+    for i, rec in enumerate(trace):
+        try:
+            node, rx, tx = str(rec[0]), float(rec[1]), rec[2]
+        except (IndexError, TypeError, ValueError):
+            return hops
+        hop: Dict[str, Any] = {"node": node, "queue_ms": None, "link_ms": None}
+        if tx is not None:
+            hop["queue_ms"] = max(0.0, float(tx) - rx)
+            if i + 1 < len(trace):
+                hop["link_ms"] = float(trace[i + 1][1]) - float(tx)
+        hops.append(hop)
+    return hops
+
+
+def observe(observer: str, trace: List[List[Any]]) -> List[Dict[str, Any]]:
+    """Descompone la traza y la acumula en los histogramas del nodo `observer`."""
+    hops = breakdown(trace)
+    for i, hop in enumerate(hops):
+        if hop["queue_ms"] is not None:
+            TRACE_QUEUE_SECONDS.labels(observer, hop["node"]).observe(hop["queue_ms"] / 1000.0)
+        if hop["link_ms"] is not None:
+            link = f"{hop['node']}>{hops[i + 1]['node']}"
+            TRACE_LINK_SECONDS.labels(observer, link).observe(max(0.0, hop["link_ms"]) / 1000.0)
+    return hops
+
+
+class Tracer:
+    """Sondas trazadas para la CLI (`trace <destino>`)."""
+
+    def __init__(self, router):
+        self.router = router
+        self.node_id = router.node_id
+        self._lock = threading.Lock()
+        self._waiting: Dict[str, Dict[str, Any]] = {}   # id -> {"event", "hops"}
+        router.register_handler(PROBE_TYPE, self._on_probe)
+        router.register_handler(REPLY_TYPE, self._on_reply)
+
+    def probe(self, dst_node: str, count: int = 3, timeout: float = 2.0) -> List[List[Dict[str, Any]]]:
+        """Manda `count` sondas de a una; devuelve la descomposición de las que volvieron."""
+        results = []
+        for _ in range(max(1, count)):
+            pid = uuid.uuid4().hex[:12]
+            slot = {"event": threading.Event(), "hops": None}
+            with self._lock:
+                self._waiting[pid] = slot
+            self.router.send(dst_node, pid, p_type=PROBE_TYPE, trace=True)
+            slot["event"].wait(timeout)
+            with self._lock:
+                self._waiting.pop(pid, None)
+            if slot["hops"]:
+                results.append(slot["hops"])
+        return results
+
+    @staticmethod
+    def summary(results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Promedio por posición en el camino: [{"node", "queue_ms", "link_ms", "n"}]."""
+        rows: List[Dict[str, Any]] = []
+        for hops in results:
+            for i, hop in enumerate(hops):
+                if i == len(rows):
+                    rows.append({"node": hop["node"], "queue": [], "link": []})
+                if hop["queue_ms"] is not None:
+                    rows[i]["queue"].append(hop["queue_ms"])
+                if hop["link_ms"] is not None:
+                    rows[i]["link"].append(hop["link_ms"])
+        return [{"node": r["node"],
+                 "queue_ms": sum(r["queue"]) / len(r["queue"]) if r["queue"] else None,
+                 "link_ms": sum(r["link"]) / len(r["link"]) if r["link"] else None,
+                 "n": max(len(r["queue"]), len(r["link"]))} for r in rows]
+
+    def cli(self, dst_node: str, count: int = 3, out: Callable[[str], None] = print) -> None:
+        """Comando `trace <destino> [N]` de las CLIs: sondas + tabla de promedios por salto."""
+        results = self.probe(dst_node, count)
+        if not results:
+            out(f"❌ Ninguna sonda volvió de {dst_node}")
+            return
+        rows = self.summary(results)
+        out(f"\n🧭 Traza hacia {dst_node} ({len(results)}/{count} sondas, promedios en ms):")
+        total = 0.0
+        for i, row in enumerate(rows):
+            if row["queue_ms"] is None:
+                out(f"  {row['node']:<10} (destino)")
+                continue
+            line = f"  {row['node']:<10} cola {row['queue_ms']:8.3f}"
+            total += row["queue_ms"]
+            if row["link_ms"] is not None and i + 1 < len(rows):
+                line += f"   enlace → {rows[i + 1]['node']} {row['link_ms']:8.3f}"
+                total += row["link_ms"]
+            out(line)
+        out(f"  total {total:.3f} ms")
+
+    def _on_probe(self, packet: Dict[str, Any]) -> None:
+        # la descomposición ya quedó en los histogramas de este nodo; se devuelve la traza cruda
+        src = channel_to_node(packet.get("from", ""))
+        if src:
+            self.router.send(src, "", p_type=REPLY_TYPE,
+                             extra={"probe": {"id": packet.get("payload"), "trace": packet.get("trace", [])}})
+
+    def _on_reply(self, packet: Dict[str, Any]) -> None:
+        info = packet.get("probe") or {}
+        with self._lock:
+            slot: Optional[Dict[str, Any]] = self._waiting.get(str(info.get("id", "")))
+        if slot is None:
+            return  # respuesta tardía
+        slot["hops"] = observe(self.node_id, info.get("trace") or [])
+        slot["event"].set()
@@ -19,6 +19,19 @@ def _mk_channel(username: str) -> str:
     return f"sec{SECTION}.grupo{GROUP}.{username}"
 
 NODE_TO_CHANNEL: Dict[str, str] = {node: _mk_channel(user) for node, user in NODES_TO_USER.items()}
+# índice inverso usuario -> nodo (si dos nodos comparten usuario gana el primero)
+USER_TO_NODE: Dict[str, str] = {}
+for _node, _user in NODES_TO_USER.items():
+    USER_TO_NODE.setdefault(_user, _node)
+
+def register_nodes(mapping: Dict[str, str]) -> None:
+    """Agrega nodos {nodo: usuario} en caliente (netsim.py, topologías generadas).
+    Se actualizan los dicts existentes, así quien los importó ve los nuevos."""
+    for node, user in mapping.items():
+        user = str(user)
+        NODES_TO_USER[node] = user
+        NODE_TO_CHANNEL[node] = _mk_channel(user)
+        USER_TO_NODE.setdefault(user, node)
 
 def get_channel(node_id: str) -> str:
     if node_id == "*":
@@ -28,8 +41,4 @@ def get_channel(node_id: str) -> str:
     return NODE_TO_CHANNEL[node_id]
 
 def channel_to_node(channel: str) -> str:
-    username = channel.split(".")[-1]
-    for node, user in NODES_TO_USER.items():
-        if user == username:
-            return node
-    return ""
+    return USER_TO_NODE.get(channel.split(".")[-1], "")
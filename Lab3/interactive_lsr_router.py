@@ -5,293 +5,174 @@ Uso: python interactive_lsr_router.py topo.json A
 
 Comandos disponibles:
 - send <destino> <mensaje>     : Enviar mensaje a un nodo específico
+- rsend <destino> <mensaje>    : Enviar mensaje con entrega confiable (ACK/retransmisión)
+- sendref <destino> <mensaje>  : Enviar por referencia (payload en Redis, claim-check)
+- bulk <destino> <caracteres>  : Transferencia de prueba repartida en caminos disjuntos
+- paths <destino> [k]          : Los k caminos más cortos hacia un destino
+- sendsr <destino|A-C-D> <msg> : Enviar con ruta de origen (SPF o camino fijo)
 - broadcast <mensaje>          : Enviar mensaje a todos los nodos
 - hello <destino>             : Enviar HELLO manual a un nodo
 - show lsdb                   : Mostrar Link State Database
 - show routes                 : Mostrar tabla de enrutamiento
 - show neighbors              : Mostrar vecinos descubiertos
 - status                      : Mostrar estado general del router
+- ping <destino> [-c N] [-i s] [-s tamaño] [-f] : RTT (min/avg/p50/p99/max), pérdida; -f mide paquetes/s
+- trace <destino> [n]        : Latencia por salto (cola en cada router y cada enlace)
+- stats                       : Métricas del router (las mismas que exporta METRICS_PORT)
+- debug <on|off> [categoría]  : Log por paquete (pkt, fwd, hello, lsp, route, ...)
+- log <nivel> [categoría]     : Nivel de log (debug|info|warn|error|off)
 - help                        : Mostrar ayuda
 - quit/exit                   : Salir del programa
 """
 
 import sys
 import time
-import threading
-from typing import Dict, Set, Any, List
-
-from redis_transport import RedisTransport
-from id_map import NODE_TO_CHANNEL, get_channel, channel_to_node
-from packets import make_packet, validate_packet, normalize_packet, get_packet_id, dec_hops, is_deliver_to_me
-from dijkstra_rt import load_topology, routing_table_for
-
-HELLO_PERIOD = 5.0   # s
-LSP_PERIOD   = 7.5   # s
-
-class InteractiveLSRRouter:
-    def __init__(self, node_id: str, graph: Dict[str, Dict[str, float]]):
-        if node_id not in NODE_TO_CHANNEL:
-            raise ValueError(f"Nodo '{node_id}' não está em NODE_TO_CHANNEL")
-
-        self.node_id = node_id
-        self.channel_local: str = NODE_TO_CHANNEL[node_id]
-        self.neighbors: List[str] = list(graph.get(node_id, {}).keys())
+from typing import Dict, Optional, Set
+
+from id_map import get_channel, channel_to_node
+from packets import make_packet, DEFAULT_HOPS
+from dijkstra_rt import load_topology, load_areas, ttl_for
+from router_lsr_redis import LinkStateRouterRedis
+from reliable import ReliableChannel
+from multipath import Multipath
+from hop_trace import Tracer
+from echo import EchoService
+from metrics import REGISTRY
+import router_log
+
+
+class InteractiveLSRRouter(LinkStateRouterRedis):
+    """
+    Router LSR con comandos manuales. La lógica de protocolo (HELLO, LSP,
+    LSDB, Dijkstra y forwarding) y el estado copy-on-write se heredan de
+    LinkStateRouterRedis; aquí solo se agregan la API y las vistas para la CLI.
+    """
+    def __init__(self, node_id: str, graph: Dict[str, Dict[str, float]],
+                 areas: Optional[Dict[str, str]] = None):
+        super().__init__(node_id, graph, areas=areas)
         self.discovered_neighbors: Set[str] = set()
-
-        # LSR state
-        self.lsdb: Dict[str, Dict[str, Any]] = {}
-        self.sequence_number = 0
-        self.seen_lsp_ids: Set[str] = set()
-        self.routing_table: List[Dict[str, Any]] = []
-
-        self.transport = RedisTransport(self.channel_local, self._on_packet)
-        self._stop = threading.Event()
-        self._t_hello = None
-        self._t_lsp = None
+        self.reliable = ReliableChannel(self)
+        self.multipath = Multipath(self)
+        self.tracer = Tracer(self)
+        self.echo = EchoService(self)
 
         print(f"🔗 [{self.node_id}] LSR Router iniciado")
         print(f"📡 Canal: {self.channel_local}")
         print(f"👥 Vecinos configurados: {self.neighbors}")
         print("=" * 50)
 
-    def start(self) -> None:
-        """Inicia el router y los timers automáticos"""
-        self.transport.start()
-        self._schedule_hello()
-        self._schedule_lsp()
-        print(f"✅ [{self.node_id}] Router LSR activo - escuchando mensajes...")
-
-    def stop(self) -> None:
-        """Detiene el router y limpia recursos"""
-        self._stop.set()
-        if self._t_hello:
-            self._t_hello.cancel()
-        if self._t_lsp:
-            self._t_lsp.cancel()
-        try:
-            self.transport.stop()
-        except Exception:
-            pass
-
-    # ========== TIMERS AUTOMÁTICOS ==========
-    def _schedule_hello(self):
-        if self._stop.is_set(): 
-            return
-        self._t_hello = threading.Timer(HELLO_PERIOD, self._emit_hello)
-        self._t_hello.daemon = True
-        self._t_hello.start()
-
-    def _schedule_lsp(self):
-        if self._stop.is_set(): 
-            return
-        self._t_lsp = threading.Timer(LSP_PERIOD, self._emit_lsp)
-        self._t_lsp.daemon = True
-        self._t_lsp.start()
-
-    def _emit_hello(self):
-        """Envía HELLOs periódicos a todos los vecinos"""
-        try:
-            for neigh in self.neighbors:
-                ch = get_channel(neigh)
-                pkt = make_packet("hello", self.channel_local, ch, hops=1, payload="HELLO")
-                self.transport.publish(ch, pkt)
-                print(f"📡 [{self.node_id}] HELLO automático → {neigh}")
-        finally:
-            self._schedule_hello()
-
-    def _emit_lsp(self):
-        """Envía LSPs periódicos con información de vecinos"""
-        try:
-            neighbors_costs = {n: 1 for n in self.neighbors}
-            lsp = make_packet("lsp", self.channel_local, "*", hops=8,
-                              headers=[{"id": f"LSP-{self.node_id}-{self.sequence_number}"}],
-                              payload="")
-            lsp["originator"] = self.node_id
-            lsp["neighbors"] = neighbors_costs
-            self.sequence_number += 1
-            self._flood_lsp(lsp)
-            print(f"📢 [{self.node_id}] LSP automático enviado (seq: {self.sequence_number-1})")
-        finally:
-            self._schedule_lsp()
-
-    # ========== MANEJO DE PAQUETES ==========
-    def _on_packet(self, packet: Dict[str, Any]) -> None:
-        """Procesa paquetes recibidos"""
-        packet = normalize_packet(packet)
-        if not validate_packet(packet):
-            return
-
-        pkt_type = packet["type"]
-        sender = channel_to_node(packet.get("from", ""))
-
-        if pkt_type == "hello":
-            self._handle_hello(packet)
-        elif pkt_type == "hello_ack":
-            print(f"✅ [{self.node_id}] HELLO_ACK recibido de {sender}")
-        elif pkt_type == "lsp":
-            self._handle_lsp(packet)
-        elif pkt_type == "message":
-            self._handle_data_packet(packet)
-
-    def _handle_hello(self, packet: Dict[str, Any]) -> None:
-        """Maneja paquetes HELLO"""
-        sender_ch = packet.get("from", "")
-        sender_node = channel_to_node(sender_ch)
-        
+    def _handle_hello(self, packet) -> None:
+        sender_node = channel_to_node(packet.get("from", ""))
         if sender_node:
             self.discovered_neighbors.add(sender_node)
-            if sender_node not in self.neighbors:
-                self.neighbors.append(sender_node)
-                print(f"🔍 [{self.node_id}] Nuevo vecino descubierto: {sender_node}")
-
-        # Responder con HELLO_ACK
-        ack = make_packet("hello_ack", self.channel_local, sender_ch, hops=1, payload="HELLO_ACK")
-        self.transport.publish(sender_ch, ack)
-
-    def _handle_lsp(self, packet: Dict[str, Any]) -> None:
-        """Maneja Link State Packets"""
-        lsp_id = get_packet_id(packet)
-        if not lsp_id or lsp_id in self.seen_lsp_ids:
-            return
-        
-        self.seen_lsp_ids.add(lsp_id)
-        originator = packet.get("originator", "")
-        if not originator:
-            return
-
-        # Actualizar LSDB
-        self.lsdb[originator] = {
-            "neighbors": dict(packet.get("neighbors", {}))
-        }
-        print(f"📊 [{self.node_id}] LSP recibido de {originator} - LSDB actualizada")
-
-        # Reenviar LSP (flooding)
-        exclude = packet.get("from", "")
-        self._flood_lsp(packet, exclude=exclude)
-
-        # Recalcular tabla de enrutamiento
-        self._calculate_routing_table()
-
-    def _handle_data_packet(self, packet: Dict[str, Any]) -> None:
-        """Maneja paquetes de datos"""
-        if is_deliver_to_me(packet, self.channel_local):
-            sender = channel_to_node(packet.get("from", ""))
-            payload = packet.get("payload", "")
-            print(f"📨 [{self.node_id}] ✅ MENSAJE RECIBIDO de {sender}: '{payload}'")
-            return
-
-        # Reenviar usando tabla de enrutamiento
-        dst_ch = packet.get("to", "")
-        dst_node = channel_to_node(dst_ch)
-        if not dst_node:
-            print(f"❌ [{self.node_id}] Destino desconocido: {dst_ch}")
-            return
-
-        next_hop = self._get_next_hop(dst_node)
-        if next_hop:
-            self._forward_packet(packet, next_hop)
-            print(f"🔄 [{self.node_id}] Reenviando a {dst_node} vía {next_hop}")
-        else:
-            print(f"❌ [{self.node_id}] Sin ruta para {dst_node}")
-
-    # ========== FLOODING Y FORWARDING ==========
-    def _flood_lsp(self, packet: Dict[str, Any], exclude: str = None) -> None:
-        """Inunda LSP a todos los vecinos excepto el remitente"""
-        for neigh in self.neighbors:
-            ch = get_channel(neigh)
-            if exclude and ch == exclude:
-                continue
-            self.transport.publish(ch, packet)
-
-    def _forward_packet(self, packet: Dict[str, Any], next_hop_node: str) -> None:
-        """Reenvía paquete al siguiente salto"""
-        if dec_hops(packet) <= 0:
-            print(f"⚠️ [{self.node_id}] Paquete descartado - TTL agotado")
-            return
-        self.transport.publish(get_channel(next_hop_node), packet)
-
-    # ========== TABLA DE ENRUTAMIENTO ==========
-    def _calculate_routing_table(self) -> None:
-        """Recalcula tabla de enrutamiento usando Dijkstra"""
-        graph: Dict[str, Dict[str, float]] = {}
-        
-        # Construir grafo desde LSDB
-        for node, rec in self.lsdb.items():
-            graph[node] = {v: float(c) for v, c in rec.get("neighbors", {}).items()}
-
-        # Agregar información local
-        if self.node_id not in graph:
-            graph[self.node_id] = {n: 1.0 for n in self.neighbors}
-
-        # Calcular rutas con Dijkstra
-        self.routing_table = routing_table_for(graph, self.node_id)
-
-    def _get_next_hop(self, destination_node: str) -> str:
-        """Obtiene el siguiente salto para un destino"""
-        for entry in self.routing_table:
-            if entry["destino"] == destination_node:
-                return str(entry["next_hop"])
-        return ""
+        super()._handle_hello(packet)
 
     # ========== API PÚBLICA ==========
-    def send_message(self, dst_node: str, payload: str, hops: int = 8) -> None:
-        """Envía mensaje a un nodo específico"""
+    def send_message(self, dst_node: str, payload: str, hops: Optional[int] = None,
+                     claim_check: bool = False) -> None:
+        """Envía mensaje a un nodo específico (claim_check: solo viaja la referencia)"""
         if dst_node == "*":
             self.broadcast_message(payload, hops)
             return
 
-        pkt = make_packet("message", self.channel_local, get_channel(dst_node), hops=hops, payload=payload)
         next_hop = self._get_next_hop(dst_node)
-        
+        self.send(dst_node, payload, hops=hops, claim_check=claim_check)
         if next_hop:
-            self._forward_packet(pkt, next_hop)
             print(f"📤 [{self.node_id}] Mensaje enviado a {dst_node} vía {next_hop}")
         else:
-            # Fallback: flooding
-            for neigh in self.neighbors:
-                self.transport.publish(get_channel(neigh), pkt)
-            print(f"📤 [{self.node_id}] Mensaje enviado por flooding (sin ruta)")
+            print(f"📤 [{self.node_id}] Sin ruta a {dst_node} (política: {self.no_route_policy})")
+
+    def send_reliable(self, dst_node: str, payload: str) -> None:
+        """Envía mensaje con entrega confiable y en orden (ver reliable.py)"""
+        seq = self.reliable.send_reliable(dst_node, payload)
+        print(f"📤 [{self.node_id}] Mensaje confiable #{seq} encolado para {dst_node}")
+
+    def show_paths(self, dst_node: str, k: int = 3) -> None:
+        """Muestra los k caminos más cortos (candidatos para sendsr)"""
+        paths = self.paths_to(dst_node, k)
+        if not paths:
+            print(f"❌ Sin camino hacia {dst_node} en la LSDB")
+        for i, path in enumerate(paths):
+            print(f"  {i}: {'-'.join(path)}")
+
+    def send_source_routed(self, target: str, payload: str) -> None:
+        """Envía con ruta de origen: `target` es un destino (camino SPF) o un camino A-C-D fijo"""
+        path = target.split("-")
+        try:
+            self.send(path[-1], payload, source_route=path if len(path) > 1 else True)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        print(f"📤 [{self.node_id}] Mensaje con ruta de origen hacia {path[-1]}")
+
+    def send_bulk(self, dst_node: str, size: int) -> None:
+        """Transferencia de prueba de `size` caracteres por caminos disjuntos (ver multipath.py)"""
+        data = "".join(chr(ord("a") + i % 26) for i in range(size))
+        try:
+            self.multipath.send_bulk(dst_node, data)
+        except ValueError as e:
+            print(f"❌ {e}")
+
+    def show_trace(self, dst_node: str, count: int = 3) -> None:
+        """Sondas trazadas hacia un destino: tiempo en cada router y en cada enlace (ver hop_trace.py)"""
+        self.tracer.cli(dst_node, count)
+
+    def ping(self, args) -> None:
+        """ping <destino> [-c N] [-i intervalo] [-s tamaño] [-f] (ver echo.py)"""
+        self.echo.cli(args)
 
-    def broadcast_message(self, payload: str, hops: int = 8) -> None:
+    def stop(self) -> None:
+        self.reliable.close()
+        self.multipath.close()
+        super().stop()
+
+    def broadcast_message(self, payload: str, hops: Optional[int] = None) -> None:
         """Envía mensaje broadcast a todos los nodos"""
+        if hops is None:
+            hops = ttl_for(self.state.hop_counts, "*", fallback=DEFAULT_HOPS)
         pkt = make_packet("message", self.channel_local, "*", hops=hops, payload=payload)
-        for neigh in self.neighbors:
+        for neigh in self.state.neighbors:
             self.transport.publish(get_channel(neigh), pkt)
         print(f"📡 [{self.node_id}] Broadcast enviado a todos los vecinos")
 
     def send_hello(self, dst_node: str) -> None:
         """Envía HELLO manual a un nodo específico"""
         pkt = make_packet("hello", self.channel_local, get_channel(dst_node), hops=1, payload="HELLO")
+        pkt["area"] = self.area
+        pkt["ts"] = self.clock.time() * 1000.0
         self.transport.publish(get_channel(dst_node), pkt)
         print(f"👋 [{self.node_id}] HELLO manual enviado a {dst_node}")
 
     # ========== COMANDOS DE INFORMACIÓN ==========
     def show_lsdb(self) -> None:
         """Muestra la Link State Database"""
+        lsdb = self.state.lsdb
         print(f"\n📊 LSDB de {self.node_id}:")
         print("=" * 40)
-        if not self.lsdb:
+        if not lsdb:
             print("  (vacía)")
         else:
-            for node, info in self.lsdb.items():
+            for node, info in lsdb.items():
                 neighbors = info.get("neighbors", {})
                 print(f"  {node}: {dict(neighbors)}")
         print()
 
     def show_routing_table(self) -> None:
         """Muestra la tabla de enrutamiento"""
+        table = self.state.routing_table
         print(f"\n🗺️  Tabla de Enrutamiento de {self.node_id}:")
         print("=" * 50)
-        if not self.routing_table:
+        if not table:
             print("  (vacía)")
         else:
-            print("  Destino | Next-Hop | Costo")
-            print("  --------|----------|------")
-            for entry in self.routing_table:
+            print("  Destino | Next-Hop | Costo | Saltos")
+            print("  --------|----------|-------|-------")
+            for entry in table:
                 dest = entry["destino"]
                 nh = entry["next_hop"]
                 cost = entry["costo"]
-                print(f"  {dest:7} | {nh:8} | {cost}")
+                hops = entry.get("saltos", "?")
+                print(f"  {dest:7} | {nh:8} | {cost:5} | {hops}")
         print()
 
     def show_neighbors(self) -> None:
@@ -300,19 +181,48 @@ class InteractiveLSRRouter:
         print("=" * 30)
         print(f"  Configurados: {self.neighbors}")
         print(f"  Descubiertos: {list(self.discovered_neighbors)}")
+        for n in self.neighbors:
+            srtt = self.link_costs.srtt.get(n)
+            rtt = f"{srtt:.1f} ms" if srtt is not None else "sin medir"
+            print(f"    {n}: costo {self.link_costs.advertised(n)} (RTT suavizado {rtt})")
         print()
 
     def show_status(self) -> None:
         """Muestra estado general del router"""
+        snap = self.state
         print(f"\n📋 Estado del Router {self.node_id}:")
         print("=" * 40)
         print(f"  Canal: {self.channel_local}")
-        print(f"  Vecinos configurados: {len(self.neighbors)}")
+        print(f"  Área: {self.area}{' (ABR)' if self.is_abr else ''}")
+        print(f"  Vecinos configurados: {len(snap.neighbors)}")
         print(f"  Vecinos descubiertos: {len(self.discovered_neighbors)}")
-        print(f"  Entradas en LSDB: {len(self.lsdb)}")
-        print(f"  Rutas en tabla: {len(self.routing_table)}")
+        print(f"  Entradas en LSDB: {len(snap.lsdb)}")
+        print(f"  Rutas en tabla: {len(snap.routing_table)}")
+        print(f"  Versión del snapshot: {snap.version}")
         print(f"  Sequence number: {self.sequence_number}")
         print(f"  LSPs vistos: {len(self.seen_lsp_ids)}")
+        depth = self.pending.depth()
+        if depth:
+            print("  En espera de ruta: " + ", ".join(f"{d}={n} ({b} B)" for d, (n, b) in depth.items()))
+        outstanding = self.reliable.outstanding()
+        if outstanding:
+            print("  Confiable (en vuelo/backlog): " + ", ".join(
+                f"{d}={f}/{b} RTO {self.reliable.rto(d):.2f}s" for d, (f, b) in outstanding.items()))
+        print(f"  Estadísticas confiable: {self.reliable.stats}")
+        for tid, progress in self.multipath.active().items():
+            print(f"  Transferencia {tid}: {progress} trozos confirmados")
+        for path in self.multipath.paths():
+            print(f"  Camino {path}")
+        partial = self.reassembler.pending()
+        if partial:
+            print("  Reensamblando: " + ", ".join(f"{k[:8]}={v}" for k, v in partial.items()))
+        print()
+
+    def show_stats(self) -> None:
+        """Muestra las métricas de este nodo (contadores, colas, promedios de histogramas)"""
+        print(f"\n📈 Métricas de {self.node_id}:")
+        for name, value in sorted(REGISTRY.snapshot(node=self.node_id).items()):
+            print(f"  {name} = {value:g}")
         print()
 
 def print_help():
@@ -320,12 +230,22 @@ def print_help():
     print("\n🔗 Comandos disponibles para LSR Router:")
     print("=" * 50)
     print("  send <destino> <mensaje>     - Enviar mensaje a nodo específico")
+    print("  rsend <destino> <mensaje>    - Enviar mensaje confiable (ACK + retransmisión)")
+    print("  sendref <destino> <mensaje>  - Enviar por referencia (payload en Redis)")
+    print("  bulk <destino> <caracteres>  - Transferencia por caminos disjuntos")
+    print("  paths <destino> [k]          - k caminos más cortos")
+    print("  sendsr <destino|A-C-D> <msg> - Enviar con ruta de origen")
     print("  broadcast <mensaje>          - Enviar mensaje a todos los nodos")
     print("  hello <destino>             - Enviar HELLO manual")
     print("  show lsdb                   - Mostrar Link State Database")
     print("  show routes                 - Mostrar tabla de enrutamiento")
     print("  show neighbors              - Mostrar vecinos")
     print("  status                      - Mostrar estado del router")
+    print("  ping <destino> [-c N] [-i s] [-s tam] [-f] - RTT y pérdida (-f: flood, paquetes/s)")
+    print("  trace <destino> [n]         - Latencia por router y enlace (n sondas)")
+    print("  stats                       - Mostrar métricas")
+    print("  debug <on|off> [categoría]  - Log por paquete (pkt, fwd, hello, lsp, route)")
+    print("  log <nivel> [categoría]     - Nivel de log: debug|info|warn|error|off")
     print("  help                        - Mostrar esta ayuda")
     print("  quit/exit                   - Salir del programa")
     print("\nEjemplos:")
@@ -348,7 +268,7 @@ def main():
         print(f"❌ Error cargando topología '{topo_path}': {e}")
         sys.exit(2)
 
-    router = InteractiveLSRRouter(node, graph)
+    router = InteractiveLSRRouter(node, graph, areas=load_areas(topo_path))
 
     try:
         router.start()
@@ -373,6 +293,17 @@ def main():
                 elif action == "send" and len(parts) >= 3:
                     dest, message = parts[1], " ".join(parts[2:])
                     router.send_message(dest, message)
+                elif action == "paths" and len(parts) >= 2:
+                    k = int(parts[2]) if len(parts) >= 3 and parts[2].isdigit() else 3
+                    router.show_paths(parts[1], k)
+                elif action == "sendsr" and len(parts) >= 3:
+                    router.send_source_routed(parts[1], parts[2])
+                elif action == "bulk" and len(parts) >= 3 and parts[2].isdigit():
+                    router.send_bulk(parts[1], int(parts[2]))
+                elif action == "sendref" and len(parts) >= 3:
+                    router.send_message(parts[1], parts[2], claim_check=True)
+                elif action == "rsend" and len(parts) >= 3:
+                    router.send_reliable(parts[1], parts[2])
                 elif action == "broadcast" and len(parts) >= 2:
                     message = " ".join(parts[1:])
                     router.broadcast_message(message)
@@ -391,6 +322,22 @@ def main():
                         print("❌ Opciones: show lsdb|routes|neighbors")
                 elif action == "status":
                     router.show_status()
+                elif action == "stats":
+                    router.show_stats()
+                elif action == "ping":
+                    router.ping(cmd.split()[1:])
+                elif action == "trace" and len(parts) >= 2:
+                    n = int(parts[2]) if len(parts) >= 3 and parts[2].isdigit() else 3
+                    router.show_trace(parts[1], n)
+                elif action == "debug":
+                    on = len(parts) < 2 or parts[1].lower() == "on"
+                    category = parts[2] if len(parts) > 2 else None
+                    router_log.set_level("debug" if on else "info", category)
+                    print(f"🔎 Debug {'activado' if on else 'desactivado'}" + (f" para '{category}'" if category else ""))
+                elif action == "log" and len(parts) >= 2 and parts[1].lower() in router_log.LEVELS:
+                    category = parts[2] if len(parts) > 2 else None
+                    router_log.set_level(parts[1], category)
+                    print(f"📝 Nivel de log: {router_log.get_level(category)}" + (f" para '{category}'" if category else ""))
                 else:
                     print("❌ Comando desconocido. Usa 'help' para ver comandos disponibles.")
 
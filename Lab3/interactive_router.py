@@ -18,13 +18,19 @@ import sys
 import json
 import time
 import threading
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 # Importar los routers implementados
 from router_flooding_redis import FloodingRouterRedis
+from router_dv_redis import DistanceVectorRouterRedis
 from dijkstra_rt import load_topology
 from id_map import NODE_TO_CHANNEL, get_channel
 from packets import make_packet
+from reliable import ReliableChannel
+from hop_trace import Tracer
+from echo import EchoService
+from metrics import REGISTRY
+import router_log
 
 
 class InteractiveRouter:
@@ -35,8 +41,13 @@ class InteractiveRouter:
         # Inicializar el router según el algoritmo seleccionado
         if algorithm == "flooding":
             self.router = FloodingRouterRedis(node_id, graph)
+        elif algorithm == "distance_vector":
+            self.router = DistanceVectorRouterRedis(node_id, graph)
         else:
             raise ValueError(f"Algoritmo '{algorithm}' no implementado aún")
+        self.reliable = ReliableChannel(self.router)
+        self.tracer = Tracer(self.router)
+        self.echo = EchoService(self.router)
         
         print(f"\n🚀 Router {node_id} iniciado con algoritmo: {algorithm}")
         print(f"📡 Canal: {NODE_TO_CHANNEL[node_id]}")
@@ -62,11 +73,20 @@ class InteractiveRouter:
         """Muestra el menú de ayuda"""
         print("\n📋 COMANDOS DISPONIBLES:")
         print("  send <destino> <mensaje>     - Enviar mensaje a un nodo")
+        print("  rsend <destino> <mensaje>    - Enviar mensaje confiable (ACK + retransmisión)")
+        print("  sendref <destino> <mensaje>  - Enviar por referencia (payload en Redis)")
         print("  broadcast <mensaje>          - Enviar mensaje a todos (*)")
         print("  hello <destino>              - Enviar paquete HELLO/PING")
         print("  info <destino>               - Enviar paquete de información")
-        print("  echo <destino> <mensaje>     - Enviar paquete ECHO")
+        print("  echo <destino> <mensaje>     - Enviar paquete ECHO (el destino lo devuelve)")
+        print("  ping <destino> [-c N] [-i s] [-s tam] [-f] - RTT y pérdida (-f: flood, paquetes/s)")
         print("  status                       - Mostrar estado del nodo")
+        print("  trace <destino> [n]          - Latencia por router y enlace (n sondas)")
+        print("  stats                        - Mostrar métricas (también en METRICS_PORT)")
+        print("  debug <on|off> [categoría]   - Log por paquete (pkt, fwd, info, route, ...)")
+        print("  log <nivel> [categoría]      - Nivel de log: debug|info|warn|error|off")
+        print("  mode <flood|rpf|gossip>      - Modo de reenvío (solo flooding)")
+        print("  gossip <fanout> [prob]       - Parámetros de gossip + entrega estimada")
         print("  nodes                        - Mostrar nodos disponibles")
         print("  help                         - Mostrar esta ayuda")
         print("  quit                         - Salir del programa")
@@ -98,6 +118,7 @@ class InteractiveRouter:
                     break
                     
         finally:
+            self.reliable.close()
             try:
                 self.router.transport.stop()
             except:
@@ -119,6 +140,20 @@ class InteractiveRouter:
             message = " ".join(parts[2:])
             self.send_message(dest, message, "message")
             
+        elif command == "sendref":
+            if len(parts) < 3:
+                print("❌ Uso: sendref <destino> <mensaje>")
+                return
+            self.router.send(parts[1], " ".join(parts[2:]), claim_check=True)
+            print(f"📤 Referencia enviada a {parts[1]} (payload en Redis)")
+            
+        elif command == "rsend":
+            if len(parts) < 3:
+                print("❌ Uso: rsend <destino> <mensaje>")
+                return
+            seq = self.reliable.send_reliable(parts[1], " ".join(parts[2:]))
+            print(f"📤 Mensaje confiable #{seq} encolado para {parts[1]}")
+            
         elif command == "broadcast":
             if len(parts) < 2:
                 print("❌ Uso: broadcast <mensaje>")
@@ -152,14 +187,70 @@ class InteractiveRouter:
                 return
             dest = parts[1]
             message = " ".join(parts[2:])
-            self.send_message(dest, message, "echo")
+            self.router.send(dest, message, p_type="echo")
+            print(f"📤 ECHO enviado a {dest}: {message}")
+
+        elif command == "ping":
+            self.ping(parts[1:])
             
         elif command == "status":
             self.show_status()
+
+        elif command == "mode":
+            if len(parts) < 2 or not hasattr(self.router, "set_mode"):
+                print("❌ Uso: mode <flood|rpf|gossip> (solo con algoritmo flooding)")
+                return
+            try:
+                self.router.set_mode(parts[1].lower())
+                print(f"🔀 Modo de reenvío: {self.router.mode}")
+            except ValueError as e:
+                print(f"❌ {e}")
+
+        elif command == "gossip":
+            if len(parts) < 2 or not hasattr(self.router, "gossip_report"):
+                print("❌ Uso: gossip <fanout> [prob] (solo con algoritmo flooding)")
+                return
+            try:
+                self.router.fanout = int(parts[1])
+                if len(parts) > 2:
+                    self.router.forward_prob = float(parts[2])
+            except ValueError:
+                print("❌ fanout debe ser entero y prob un número entre 0 y 1")
+                return
+            r = self.router.gossip_report()
+            print(f"🎲 fanout={self.router.fanout} prob={self.router.forward_prob}")
+            print(f"  Entrega estimada: {r['delivery_ratio']:.3f} (a todos: {r['full_delivery_prob']:.3f})")
+            print(f"  Mensajes/broadcast: {r['msgs_per_broadcast']:.1f} vs flooding {r['flood_msgs_per_broadcast']:.0f}")
+            print(f"  Duplicados observados: {r['observed_dup_rate']:.2f}")
             
         elif command == "nodes":
             self.show_nodes()
             
+        elif command == "stats":
+            print(f"\n📈 Métricas de {self.node_id}:")
+            for name, value in sorted(REGISTRY.snapshot(node=self.node_id).items()):
+                print(f"  {name} = {value:g}")
+
+        elif command == "trace":
+            if len(parts) < 2:
+                print("❌ Uso: trace <destino> [n]")
+                return
+            self.show_trace(parts[1], int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else 3)
+
+        elif command == "debug":
+            on = len(parts) < 2 or parts[1].lower() == "on"
+            category = parts[2] if len(parts) > 2 else None
+            router_log.set_level("debug" if on else "info", category)
+            print(f"🔎 Debug {'activado' if on else 'desactivado'}" + (f" para '{category}'" if category else ""))
+
+        elif command == "log":
+            if len(parts) < 2 or parts[1].lower() not in router_log.LEVELS:
+                print(f"❌ Uso: log <{'|'.join(router_log.LEVELS)}> [categoría] (actual: {router_log.get_level()})")
+                return
+            category = parts[2] if len(parts) > 2 else None
+            router_log.set_level(parts[1], category)
+            print(f"📝 Nivel de log: {router_log.get_level(category)}" + (f" para '{category}'" if category else ""))
+
         elif command == "help":
             self.show_help()
             
@@ -170,7 +261,7 @@ class InteractiveRouter:
             print(f"❌ Comando desconocido: {command}")
             print("💡 Escribe 'help' para ver los comandos disponibles")
 
-    def send_message(self, dest: str, payload: str, msg_type: str = "message", hops: int = 8):
+    def send_message(self, dest: str, payload: str, msg_type: str = "message", hops: Optional[int] = None):
         """Envía un mensaje usando el router"""
         try:
             if dest == "*":
@@ -193,7 +284,29 @@ class InteractiveRouter:
         print(f"  Algoritmo: {self.algorithm}")
         print(f"  Canal: {NODE_TO_CHANNEL[self.node_id]}")
         print(f"  Vecinos: {self.router.neighbors}")
-        print(f"  Paquetes vistos: {len(self.router.seen)}")
+        if hasattr(self.router, "seen"):
+            print(f"  Paquetes vistos: {len(self.router.seen)}")
+        if hasattr(self.router, "mode"):
+            print(f"  Modo de reenvío: {self.router.mode}")
+        if hasattr(self.router, "stats"):
+            print(f"  Estadísticas: {self.router.stats}")
+        print(f"  Entrega confiable: {self.reliable.stats}")
+        if getattr(self.router, "learned", None):
+            print("  Destinos aprendidos:")
+            for ch, (neigh, dist, _) in self.router.learned.items():
+                print(f"    {ch} vía {neigh} (distancia {dist})")
+        if hasattr(self.router, "routing_table"):
+            print("  Tabla de enrutamiento:")
+            for entry in self.router.routing_table:
+                print(f"    {entry['destino']} vía {entry['next_hop']} (costo {entry['costo']})")
+
+    def ping(self, args):
+        """ping <destino> [-c N] [-i intervalo] [-s tamaño] [-f] (ver echo.py)"""
+        self.echo.cli(args)
+
+    def show_trace(self, dst_node: str, count: int = 3):
+        """Sondas trazadas hacia un destino: tiempo en cada router y en cada enlace (ver hop_trace.py)"""
+        self.tracer.cli(dst_node, count)
 
     def show_nodes(self):
         """Muestra todos los nodos disponibles"""
@@ -206,9 +319,10 @@ class InteractiveRouter:
 def main():
     if len(sys.argv) < 3:
         print("Uso: python interactive_router.py <topo.json> <Nodo> [algoritmo]")
-        print("Algoritmos disponibles: flooding (default)")
+        print("Algoritmos disponibles: flooding (default), distance_vector")
         print("\nEjemplo: python interactive_router.py topo.json A")
         print("         python interactive_router.py topo.json A flooding")
+        print("         python interactive_router.py topo.json A distance_vector")
         sys.exit(1)
 
     topo_path = sys.argv[1]
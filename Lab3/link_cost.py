@@ -0,0 +1,77 @@
+# link_cost.py
+"""
+Costos de enlace medidos a partir del RTT de HELLO/HELLO_ACK.
+
+- El HELLO lleva "ts" (ms, reloj del emisor) y el HELLO_ACK lo devuelve en
+  "echo_ts"; el RTT se mide siempre con el reloj de quien envió el HELLO, así
+  que no hace falta sincronizar relojes entre nodos.
+- Por vecino se mantiene un RTT suavizado (EWMA, como el SRTT de TCP) y de él
+  se deriva el costo: srtt / COST_UNIT_MS, con mínimo MIN_COST.
+- El costo anunciado solo cambia si el medido sale de una banda de histéresis
+  (relativa y absoluta), para no disparar LSPs y SPF por ruido.
+- Mientras no hay muestras se anuncia el peso configurado en topo.json.
+"""
+from __future__ import annotations
+import os
+import threading
+from typing import Dict, Mapping, Optional, Tuple
+
+EWMA_ALPHA      = 0.125   # peso de cada muestra nueva
+COST_UNIT_MS    = float(os.getenv("LINK_COST_UNIT_MS", "10"))  # ms de RTT por unidad de costo
+MIN_COST        = 1.0
+HYSTERESIS_REL  = 0.20    # cambio relativo mínimo para re-anunciar
+HYSTERESIS_ABS  = 1.0     # cambio absoluto mínimo para re-anunciar
+
+
+class LinkCostEstimator:
+    def __init__(self, configured: Optional[Mapping[str, float]] = None):
+        self._lock = threading.Lock()
+        self.configured: Dict[str, float] = {n: float(c) for n, c in (configured or {}).items()}
+        self.srtt: Dict[str, float] = {}         # ms
+        self.samples: Dict[str, int] = {}
+        self._advertised: Dict[str, float] = dict(self.configured)
+
+    def sample(self, neighbor: str, rtt_ms: float) -> Tuple[float, bool]:
+        """
+        Registra una muestra de RTT. Devuelve (costo_anunciado, cambió) donde
+        `cambió` indica que el costo salió de la banda y hay que re-anunciarlo.
+        """
+        if rtt_ms < 0:
+            return self.advertised(neighbor), False
+        with self._lock:
+            prev = self.srtt.get(neighbor)
+            srtt = rtt_ms if prev is None else (1 - EWMA_ALPHA) * prev + EWMA_ALPHA * rtt_ms
+            self.srtt[neighbor] = srtt
+            self.samples[neighbor] = self.samples.get(neighbor, 0) + 1
+
+            measured = self._cost_from_rtt(srtt)
+            current = self._advertised.get(neighbor)
+            if current is None or prev is None or self._outside_band(current, measured):
+                self._advertised[neighbor] = measured
+                return measured, current != measured
+            return current, False
+
+    def advertised(self, neighbor: str) -> float:
+        with self._lock:
+            return self._advertised.get(neighbor, self.configured.get(neighbor, MIN_COST))
+
+    def costs_for(self, neighbors) -> Dict[str, float]:
+        return {n: self.advertised(n) for n in neighbors}
+
+    def forget(self, neighbor: str) -> None:
+        with self._lock:
+            self.srtt.pop(neighbor, None)
+            self.samples.pop(neighbor, None)
+            if neighbor in self.configured:
+                self._advertised[neighbor] = self.configured[neighbor]
+            else:
+                self._advertised.pop(neighbor, None)
+
+    @staticmethod
+    def _cost_from_rtt(srtt_ms: float) -> float:
+        return round(max(MIN_COST, srtt_ms / COST_UNIT_MS), 1)
+
+    @staticmethod
+    def _outside_band(current: float, measured: float) -> bool:
+        delta = abs(measured - current)
+        return delta >= HYSTERESIS_ABS and delta > HYSTERESIS_REL * current
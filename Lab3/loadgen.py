@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# loadgen.py
+"""
+Generador de carga de punta a punta: levanta un router por nodo de la
+topología (en este proceso, cada uno con su RedisTransport real) contra un
+Redis local y mide lo que entrega la red.
+
+Redis (--redis):
+- inproc: broker RESP en memoria dentro del proceso (resp_broker.py), puerto efímero,
+          con --latency-ms como demora fija de cada mensaje
+- spawn:  lanza `redis-server` en un puerto libre (tiene que estar instalado)
+- env:    el Redis de REDIS_HOST/REDIS_PORT/REDIS_PWD, como los routers normales
+          (REDIS_HOST=embedded también vale: broker en proceso)
+
+Tráfico de lazo abierto: cada flujo (origen → destino) manda a `rate`
+mensajes/s según un calendario fijo, sin esperar entregas. Si el emisor se
+atrasa, la latencia se cuenta igual desde la hora programada (sin omisión
+coordinada). Por flujo se informa: ofrecido, mensajes/s entregados, pérdida
+y latencia p50/p90/p99/max.
+
+--sweep sube la carga ofrecida por pasos (lista de tasas o "auto": duplicar)
+y marca el punto de saturación: la última tasa con pérdida <= --max-loss y
+p99 <= --slo-ms.
+
+Uso:
+    python loadgen.py topo.json --router lsr --rate 20 --duration 10
+    python loadgen.py --gen grid:16 --router dv --matrix random:8 --sweep auto
+    python loadgen.py topo.json --flows A:D,B:C --sweep 50,100,200,400 --json carga.json
+"""
+from __future__ import annotations
+import argparse
+import heapq
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import id_map
+import router_log
+import topogen
+from dijkstra_rt import load_topology, load_areas, hop_counts, routing_table_for
+from echo import percentile
+
+LOAD_TYPE = "loadgen"
+ROUTER_KINDS = ("lsr", "dv", "flooding")
+DEFAULT_DURATION = 10.0   # s por paso
+DEFAULT_DRAIN    = 2.0    # s de espera tras el último envío
+MAX_LOSS         = 0.01
+SLO_MS           = 200.0
+
+
+class Flow:
+    def __init__(self, index: int, src: str, dst: str):
+        self.index = index
+        self.src = src
+        self.dst = dst
+        self.sent = 0
+        self.latencies: List[float] = []
+        self.seen: set = set()
+        self.lag = 0.0   # peor atraso del emisor respecto del calendario (s)
+
+    def reset(self) -> None:
+        self.sent = 0
+        self.latencies = []
+        self.seen = set()
+        self.lag = 0.0
+
+    def result(self, rate: float, duration: float) -> Dict[str, Any]:
+        lat = sorted(self.latencies)
+        delivered = len(lat)
+        out: Dict[str, Any] = {"flow": f"{self.src}>{self.dst}", "offered_rate": rate,
+                               "sent": self.sent, "delivered": delivered,
+                               "delivered_rate": delivered / duration if duration > 0 else 0.0,
+                               "loss": (self.sent - delivered) / self.sent if self.sent else 0.0,
+                               "sender_lag_ms": self.lag * 1000}
+        if lat:
+            out.update({f"{k}_ms": v * 1000 for k, v in
+                        (("p50", percentile(lat, 50)), ("p90", percentile(lat, 90)),
+                         ("p99", percentile(lat, 99)), ("max", lat[-1]))})
+        return out
+
+
+class LoadGen:
+    def __init__(self, graph: Dict[str, Dict[str, float]], router: str = "lsr",
+                 areas: Optional[Dict[str, str]] = None, size: int = 32):
+        if router not in ROUTER_KINDS:
+            raise ValueError(f"router debe ser uno de {ROUTER_KINDS}")
+        self.graph = graph
+        self.kind = router
+        self.areas = areas
+        self.payload = "x" * size
+        self.reachable = self._reachable()
+        self.routers: Dict[str, Any] = {}
+        self.flows: List[Flow] = []
+        self._lock = threading.Lock()
+        self._run = ""
+        self._broker = None
+        self._server: Optional[subprocess.Popen] = None
+
+    def _reachable(self) -> Dict[str, set]:
+        """Destinos que cada router debería poder alcanzar (DV: costo < infinito del DV, como RIP)."""
+        if self.kind == "flooding":
+            return {n: set(hop_counts(self.graph, n)) - {n} for n in self.graph}
+        limit = float("inf")
+        if self.kind == "dv":
+            from router_dv_redis import infinity_for
+            limit = infinity_for(self.graph)
+        return {n: {r["destino"] for r in routing_table_for(self.graph, n) if r["costo"] < limit}
+                for n in self.graph}
+
+    # ---------- Redis ----------
+    def start_redis(self, mode: str, password: str = "", latency: float = 0.0) -> Tuple[str, int]:
+        """Deja REDIS_HOST/PORT/PWD apuntando al Redis elegido (los lee RedisTransport)."""
+        if mode == "env":
+            from resp_broker import ensure_embedded
+            ensure_embedded()
+            if not os.getenv("REDIS_HOST"):
+                raise RuntimeError("--redis env necesita REDIS_HOST")
+            return os.environ["REDIS_HOST"], int(os.getenv("REDIS_PORT", "6379"))
+        if mode == "inproc":
+            from resp_broker import RespBroker
+            self._broker = RespBroker(password=password, latency=latency)
+            host, port = self._broker.start_in_thread()
+        elif mode == "spawn":
+            binary = shutil.which("redis-server")
+            if not binary:
+                raise RuntimeError("redis-server no está instalado (usar --redis inproc)")
+            with socket.socket() as s:
+                s.bind(("127.0.0.1", 0))
+                port = s.getsockname()[1]
+            host = "127.0.0.1"
+            cmd = [binary, "--port", str(port), "--bind", host, "--save", "", "--appendonly", "no"]
+            if password:
+                cmd += ["--requirepass", password]
+            self._server = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self._wait_port(host, port)
+        else:
+            raise ValueError(f"modo de Redis desconocido: {mode}")
+        os.environ.update({"REDIS_HOST": host, "REDIS_PORT": str(port), "REDIS_PWD": password})
+        return host, port
+
+    @staticmethod
+    def _wait_port(host: str, port: int, timeout: float = 10.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection((host, port), timeout=0.5).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError(f"redis-server no respondió en {host}:{port}")
+
+    # ---------- routers ----------
+    def start_routers(self) -> None:
+        missing = {n: n for n in self.graph if n not in id_map.NODE_TO_CHANNEL}
+        if missing:
+            id_map.register_nodes(missing)
+        for node in self.graph:
+            if self.kind == "lsr":
+                from router_lsr_redis import LinkStateRouterRedis
+                r = LinkStateRouterRedis(node, self.graph, checkpoint_path="", areas=self.areas)
+            elif self.kind == "dv":
+                from router_dv_redis import DistanceVectorRouterRedis
+                r = DistanceVectorRouterRedis(node, self.graph)
+            else:
+                from router_flooding_redis import FloodingRouterRedis
+                r = FloodingRouterRedis(node, self.graph)
+            r.register_handler(LOAD_TYPE, self._on_delivery)
+            self.routers[node] = r
+        for r in self.routers.values():
+            r.start()
+
+    def wait_converged(self, timeout: float = 60.0) -> Optional[float]:
+        """Espera a que cada FIB cubra su componente; devuelve los segundos o None."""
+        if self.kind == "flooding":
+            return 0.0
+        t0 = time.monotonic()
+        while time.monotonic() - t0 < timeout:
+            if all(self.reachable[n] <= set(r._state.snapshot.fib) for n, r in self.routers.items()):
+                return time.monotonic() - t0
+            time.sleep(0.2)
+        return None
+
+    def stop(self) -> None:
+        for r in self.routers.values():
+            stop = getattr(r, "stop", None) or r.transport.stop
+            try:
+                stop()
+            except Exception:
+                pass
+        if self._broker:
+            self._broker.stop()
+        if self._server:
+            self._server.terminate()
+            self._server.wait(timeout=5)
+
+    # ---------- tráfico ----------
+    def set_flows(self, pairs: List[Tuple[str, str]]) -> None:
+        self.flows = [Flow(i, s, d) for i, (s, d) in enumerate(pairs)]
+
+    def _on_delivery(self, packet: Dict[str, Any]) -> None:
+        now = time.perf_counter()
+        info = packet.get("lg") or {}
+        if info.get("run") != self._run:
+            return   # entrega tardía de un paso anterior
+        try:
+            flow = self.flows[int(info["f"])]
+        except (KeyError, IndexError, TypeError, ValueError):
+            return
+        with self._lock:
+            if info.get("s") in flow.seen:
+                return
+            flow.seen.add(info.get("s"))
+            flow.latencies.append(now - float(info["t"]))
+
+    def run_step(self, rate: float, duration: float = DEFAULT_DURATION,
+                 drain: float = DEFAULT_DRAIN) -> Dict[str, Any]:
+        """Un paso de carga: `rate` msgs/s por flujo durante `duration` s."""
+        self._run = uuid.uuid4().hex[:8]
+        for f in self.flows:
+            f.reset()
+        period = 1.0 / rate
+        t0 = time.perf_counter() + 0.05
+        end = t0 + duration
+        # flujos desfasados dentro del período: no todos salen en el mismo instante
+        heap = [(t0 + period * i / len(self.flows), i, 0) for i in range(len(self.flows))]
+        heapq.heapify(heap)
+        while heap:
+            when, i, seq = heapq.heappop(heap)
+            if when >= end:
+                continue
+            delay = when - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            flow = self.flows[i]
+            flow.lag = max(flow.lag, -delay)
+            flow.sent += 1
+            self.routers[flow.src].send(flow.dst, self.payload, p_type=LOAD_TYPE,
+                                        extra={"lg": {"run": self._run, "f": i, "s": seq, "t": when}})
+            heapq.heappush(heap, (when + period, i, seq + 1))
+        time.sleep(drain)
+        with self._lock:
+            flows = [f.result(rate, duration) for f in self.flows]
+        sent = sum(f["sent"] for f in flows)
+        delivered = sum(f["delivered"] for f in flows)
+        every = sorted(l for f in self.flows for l in f.latencies)
+        total: Dict[str, Any] = {"offered_rate": rate * len(self.flows), "sent": sent,
+                                 "delivered": delivered, "delivered_rate": delivered / duration,
+                                 "loss": (sent - delivered) / sent if sent else 0.0}
+        if every:
+            total.update({"p50_ms": percentile(every, 50) * 1000, "p90_ms": percentile(every, 90) * 1000,
+                          "p99_ms": percentile(every, 99) * 1000, "max_ms": every[-1] * 1000})
+        return {"rate_per_flow": rate, "duration": duration, "total": total, "flows": flows}
+
+
+def traffic_matrix(reachable: Dict[str, set], spec: str, seed: int = 0) -> List[Tuple[str, str]]:
+    """"all" (todos los pares alcanzables), "random:K" o "A:D,B:C"."""
+    pairs = [(a, b) for a in reachable for b in sorted(reachable[a])]
+    if spec == "all":
+        return pairs
+    if spec.startswith("random:"):
+        rng = random.Random(seed)
+        return rng.sample(pairs, min(int(spec.split(":", 1)[1]), len(pairs)))
+    pairs = []
+    for item in spec.split(","):
+        src, _, dst = item.partition(":")
+        if src not in reachable or dst not in reachable:
+            raise ValueError(f"flujo inválido '{item}'")
+        pairs.append((src, dst))
+    return pairs
+
+
+def passes(step: Dict[str, Any], max_loss: float, slo_ms: float) -> bool:
+    total = step["total"]
+    return total["loss"] <= max_loss and total.get("p99_ms", float("inf")) <= slo_ms
+
+
+def _print_step(step: Dict[str, Any], per_flow: bool) -> None:
+    t = step["total"]
+    lat = "/".join(f"{t.get(k, float('nan')):.1f}" for k in ("p50_ms", "p90_ms", "p99_ms", "max_ms"))
+    print(f"📈 {step['rate_per_flow']:g} msgs/s x {len(step['flows'])} flujos: ofrecido {t['offered_rate']:g}/s, "
+          f"entregado {t['delivered_rate']:.1f}/s, pérdida {t['loss'] * 100:.2f}%, p50/p90/p99/max {lat} ms")
+    if per_flow:
+        for f in step["flows"]:
+            lat = "/".join(f"{f.get(k, float('nan')):.1f}" for k in ("p50_ms", "p90_ms", "p99_ms", "max_ms"))
+            print(f"   {f['flow']:<12} {f['delivered_rate']:8.1f}/s  pérdida {f['loss'] * 100:6.2f}%  {lat} ms"
+                  + (f"  (emisor atrasado {f['sender_lag_ms']:.0f} ms)" if f["sender_lag_ms"] > 50 else ""))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Carga de punta a punta sobre routers reales y un Redis local")
+    ap.add_argument("topo", nargs="?", help="topo.json (o --gen)")
+    ap.add_argument("--gen", help="topología generada TIPO:TAMAÑO (ver topogen.py)")
+    ap.add_argument("--router", choices=ROUTER_KINDS, default="lsr")
+    ap.add_argument("--redis", choices=("inproc", "spawn", "env"), default="inproc")
+    ap.add_argument("--password", default="", help="clave del Redis inproc/spawn")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="demora fija del broker inproc")
+    ap.add_argument("--matrix", default="", help='"all", "random:K" (por defecto: all hasta 6 nodos, si no random:16)')
+    ap.add_argument("--flows", help="flujos explícitos A:D,B:C")
+    ap.add_argument("--rate", type=float, default=10.0, help="msgs/s por flujo")
+    ap.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="s por paso")
+    ap.add_argument("--drain", type=float, default=DEFAULT_DRAIN)
+    ap.add_argument("--size", type=int, default=32, help="caracteres de payload")
+    ap.add_argument("--sweep", help='tasas por flujo separadas por coma, o "auto" (duplicar desde --rate)')
+    ap.add_argument("--max-rate", type=float, default=10000.0, help="tope de --sweep auto")
+    ap.add_argument("--max-loss", type=float, default=MAX_LOSS)
+    ap.add_argument("--slo-ms", type=float, default=SLO_MS, help="p99 máximo aceptable")
+    ap.add_argument("--converge-timeout", type=float, default=60.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--per-flow", action="store_true", help="mostrar cada flujo")
+    ap.add_argument("--json", help="escribir los resultados en este JSON")
+    ap.add_argument("--log", default="warn", help="nivel de log de los routers")
+    args = ap.parse_args()
+
+    areas = None
+    if args.gen:
+        kind, _, size = args.gen.partition(":")
+        graph = topogen.generate(kind, size, args.seed)
+    elif args.topo:
+        graph = load_topology(args.topo)
+        areas = load_areas(args.topo)
+    else:
+        ap.error("falta topo.json o --gen")
+    router_log.set_level(args.log)
+
+    lg = LoadGen(graph, args.router, areas, args.size)
+    host, port = lg.start_redis(args.redis, args.password, args.latency_ms / 1000)
+    print(f"🧰 Redis {args.redis} en {host}:{port}; {len(graph)} routers {args.router}")
+    steps: List[Dict[str, Any]] = []
+    result: Dict[str, Any] = {"router": args.router, "nodes": len(graph), "redis": args.redis, "steps": steps}
+    try:
+        lg.start_routers()
+        converged = lg.wait_converged(args.converge_timeout)
+        result["converged_s"] = converged
+        if converged is None:
+            print(f"⚠️ Sin convergencia en {args.converge_timeout}s; se mide igual")
+        else:
+            print(f"✅ Convergencia en {converged:.1f}s")
+        spec = args.flows or args.matrix or ("all" if len(graph) <= 6 else "random:16")
+        lg.set_flows(traffic_matrix(lg.reachable, spec, args.seed))
+
+        if not args.sweep:
+            steps.append(lg.run_step(args.rate, args.duration, args.drain))
+            _print_step(steps[-1], True)
+        else:
+            rates = None if args.sweep == "auto" else [float(r) for r in args.sweep.split(",") if r]
+            rate = rates[0] if rates else args.rate
+            i = 0
+            while True:
+                step = lg.run_step(rate, args.duration, args.drain)
+                step["ok"] = passes(step, args.max_loss, args.slo_ms)
+                steps.append(step)
+                _print_step(step, args.per_flow)
+                if not step["ok"]:
+                    break
+                i += 1
+                if rates:
+                    if i >= len(rates):
+                        break
+                    rate = rates[i]
+                else:
+                    rate *= 2
+                    if rate > args.max_rate:
+                        break
+            ok = [s for s in steps if s["ok"]]
+            result["saturation"] = {
+                "last_ok_rate_per_flow": ok[-1]["rate_per_flow"] if ok else None,
+                "last_ok_delivered_rate": ok[-1]["total"]["delivered_rate"] if ok else None,
+                "first_failed_rate_per_flow": steps[-1]["rate_per_flow"] if not steps[-1]["ok"] else None}
+            sat = result["saturation"]
+            if sat["first_failed_rate_per_flow"] is None:
+                print(f"🏁 Sin saturar hasta {steps[-1]['rate_per_flow']:g} msgs/s por flujo")
+            else:
+                print(f"🏁 Saturación: último paso sano {sat['last_ok_rate_per_flow']} msgs/s por flujo "
+                      f"({sat['last_ok_delivered_rate'] or 0:.1f} msgs/s entregados en total); "
+                      f"falla a {sat['first_failed_rate_per_flow']:g}")
+    finally:
+        lg.stop()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=1, ensure_ascii=False)
+        print(f"📄 Resultados → {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# lsdb_checkpoint.py
+"""
+Checkpoint local de la LSDB para reinicios en caliente (warm restart).
+
+Guarda en un archivo sqlite compacto:
+- el fin del bloque de números de secuencia reservado por el router,
+- la LSDB (originador -> secuencia + vecinos/costos + resumen inter-área y
+  sus saltos, si el originador es un ABR),
+- la FIB vigente (destino -> next hop, costo, saltos),
+- los resúmenes recibidos por la frontera de vecinos de otra área, con la
+  hora en que llegaron (al restaurar vencen igual que en vivo, BORDER_TIMEOUT).
+
+El número de secuencia no se guarda cada CHECKPOINT_PERIOD sino por bloques:
+antes de usar el primer número de un bloque el router llama a reserve() con el
+fin del bloque (LSP_SEQ_BLOCK números). Al reiniciar, recarga el archivo,
+retoma la numeración de LSPs en ese fin (los vecinos vieron a lo sumo
+LSP-<nodo>-0..N con N por debajo) y sigue reenviando con la FIB restaurada
+mientras reconverge.
+
+Con los resúmenes restaurados el primer SPF tras el reinicio conserva las
+rutas a otras áreas, y con los saltos de cada ruta el TTL de los envíos se
+sigue dimensionando por el camino. Los archivos de versiones anteriores (sin
+esas columnas) se migran al abrirlos; sus filas viejas cargan sin resumen ni
+saltos.
+
+Variable de entorno:
+    LSDB_CHECKPOINT  ruta del archivo; admite "{node}". Vacía = deshabilitado
+                     (igual que checkpoint_path="" en LinkStateRouterRedis;
+                     netsim.py lo usa así). Por defecto: .lsdb_{node}.sqlite
+                     en el directorio actual (ignorado en .gitignore).
+"""
+from __future__ import annotations
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Mapping, Optional
+
+CHECKPOINT_PERIOD = 10.0   # s
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS lsdb (originator TEXT PRIMARY KEY, seq INTEGER NOT NULL, neighbors TEXT NOT NULL,
+                                 summary TEXT, summary_saltos TEXT);
+CREATE TABLE IF NOT EXISTS fib  (destino TEXT PRIMARY KEY, next_hop TEXT NOT NULL, costo REAL NOT NULL,
+                                 saltos INTEGER);
+CREATE TABLE IF NOT EXISTS border (neighbor TEXT PRIMARY KEY, ts REAL NOT NULL, routes TEXT NOT NULL,
+                                   saltos TEXT NOT NULL);
+"""
+
+# columnas agregadas después de la primera versión del archivo (tabla -> columnas)
+_ADDED_COLUMNS = {
+    "lsdb": (("summary", "TEXT"), ("summary_saltos", "TEXT")),
+    "fib": (("saltos", "INTEGER"),),
+}
+
+# el número guardado solo sube: un save() periódico con el número en uso no
+# pisa el fin de bloque que reserve() grabó antes
+_SEQ_UPSERT = (
+    "INSERT INTO meta(key, value) VALUES('sequence_number', ?) "
+    "ON CONFLICT(key) DO UPDATE SET value = "
+    "CAST(MAX(CAST(value AS INTEGER), CAST(excluded.value AS INTEGER)) AS TEXT)")
+
+
+def checkpoint_path_for(node_id: str) -> Optional[str]:
+    """Ruta del checkpoint para node_id según LSDB_CHECKPOINT (None si está deshabilitado)."""
+    tmpl = os.getenv("LSDB_CHECKPOINT", ".lsdb_{node}.sqlite")
+    if not tmpl:
+        return None
+    return tmpl.format(node=node_id)
+
+
+class LSDBCheckpoint:
+    def __init__(self, path: str, node_id: str):
+        self.path = path
+        self.node_id = node_id
+
+    def _connect(self) -> sqlite3.Connection:
+        # una conexión por operación: el checkpoint corre en un timer y el
+        # stop() en el hilo principal, y sqlite no comparte conexiones entre hilos
+        conn = sqlite3.connect(self.path, timeout=2.0)
+        conn.executescript(_SCHEMA)
+        for table, columns in _ADDED_COLUMNS.items():
+            have = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for name, kind in columns:
+                if name not in have:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {kind}")
+        return conn
+
+    def save(self, sequence_number: int,
+             lsdb: Mapping[str, Mapping[str, Any]],
+             routing_table: List[Mapping[str, Any]],
+             border_routes: Optional[Mapping[str, Any]] = None) -> None:
+        """border_routes: vecino -> (ts, {destino: costo}, {destino: saltos}), como en el router."""
+        conn = self._connect()
+        try:
+            with conn:  # una sola transacción: el archivo nunca queda a medias
+                conn.execute("DELETE FROM lsdb")
+                conn.execute("DELETE FROM fib")
+                conn.execute("DELETE FROM border")
+                conn.executemany(
+                    "INSERT INTO meta(key, value) VALUES(?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    [("node_id", self.node_id), ("saved_at", str(time.time()))])
+                conn.execute(_SEQ_UPSERT, (str(int(sequence_number)),))
+                conn.executemany(
+                    "INSERT INTO lsdb(originator, seq, neighbors, summary, summary_saltos) VALUES(?, ?, ?, ?, ?)",
+                    [(orig, int(rec.get("seq", -1)), json.dumps(dict(rec.get("neighbors", {}))),
+                      json.dumps(dict(rec["summary"])) if "summary" in rec else None,
+                      json.dumps(dict(rec.get("summary_saltos") or {})) if "summary" in rec else None)
+                     for orig, rec in lsdb.items()])
+                conn.executemany(
+                    "INSERT INTO fib(destino, next_hop, costo, saltos) VALUES(?, ?, ?, ?)",
+                    [(str(e["destino"]), str(e["next_hop"]), float(e["costo"]),
+                      int(e["saltos"]) if "saltos" in e else None)
+                     for e in routing_table])
+                conn.executemany(
+                    "INSERT INTO border(neighbor, ts, routes, saltos) VALUES(?, ?, ?, ?)",
+                    [(str(neigh), float(ts), json.dumps(dict(routes)), json.dumps(dict(hops)))
+                     for neigh, (ts, routes, hops) in (border_routes or {}).items()])
+        finally:
+            conn.close()
+
+    def reserve(self, sequence_number: int) -> None:
+        """Guarda el número de secuencia (fin de un bloque reservado; nunca lo baja) y el nodo dueño."""
+        conn = self._connect()
+        try:
+            with conn:
+                # con node_id, load() devuelve la reserva aunque todavía no haya un save() completo
+                conn.execute("INSERT INTO meta(key, value) VALUES('node_id', ?) "
+                             "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (self.node_id,))
+                conn.execute(_SEQ_UPSERT, (str(int(sequence_number)),))
+        finally:
+            conn.close()
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Devuelve {sequence_number, lsdb, routing_table, border_routes, saved_at} o None si no hay checkpoint válido.
+        Si solo hubo reserve() (sin save() todavía), lsdb/routing_table vienen vacías y saved_at en 0.
+        """
+        if not os.path.exists(self.path):
+            return None
+        conn = None
+        try:
+            conn = self._connect()   # un archivo corrupto falla ya al abrirlo
+            meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+            if meta.get("node_id") != self.node_id:
+                return None
+            lsdb = {}
+            for orig, seq, neigh, summary, summary_hops in conn.execute(
+                    "SELECT originator, seq, neighbors, summary, summary_saltos FROM lsdb"):
+                lsdb[orig] = {"seq": seq, "neighbors": json.loads(neigh)}
+                if summary is not None:
+                    lsdb[orig]["summary"] = json.loads(summary)
+                    lsdb[orig]["summary_saltos"] = json.loads(summary_hops or "{}")
+            table = []
+            for d, nh, c, hops in conn.execute("SELECT destino, next_hop, costo, saltos FROM fib"):
+                table.append({"destino": d, "next_hop": nh, "costo": c})
+                if hops is not None:
+                    table[-1]["saltos"] = hops
+            border = {neigh: (ts, json.loads(routes), json.loads(hops))
+                      for neigh, ts, routes, hops in conn.execute("SELECT neighbor, ts, routes, saltos FROM border")}
+            return {
+                "sequence_number": int(meta.get("sequence_number", "0")),
+                "saved_at": float(meta.get("saved_at", "0")),
+                "lsdb": lsdb,
+                "routing_table": table,
+                "border_routes": border,
+            }
+        except (sqlite3.DatabaseError, ValueError) as e:
+            print(f"[LSDBCheckpoint] ⚠️ Checkpoint ilegible en {self.path}: {e}")
+            return None
+        finally:
+            if conn is not None:
+                conn.close()
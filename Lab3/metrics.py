@@ -0,0 +1,289 @@
+# metrics.py
+"""
+Registro de métricas en proceso con exportador en formato Prometheus.
+
+Tres tipos, todos con etiquetas:
+- Counter: solo sube (paquetes, descartes, duplicados)
+- Gauge: valor actual; con `fn` se calcula al momento de exportar (colas)
+- Histogram: buckets fijos acumulativos + suma + cuenta (latencias, SPF)
+
+Cada combinación de etiquetas es un objeto hijo cacheado; en el data path
+solo se hace labels(...) (búsqueda en dict) e inc()/observe() bajo un lock
+propio del hijo.
+
+    PKTS = counter("lab3_packets_total", "Paquetes por tipo y sentido", ("node", "type", "dir"))
+    PKTS.labels("A", "lsp", "in").inc()
+
+Exportador: serve() levanta un HTTP local en METRICS_PORT (vacío = apagado)
+con GET /metrics en formato de texto de Prometheus 0.0.4.
+"""
+from __future__ import annotations
+import bisect
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+METRICS_PORT = os.getenv("METRICS_PORT", "")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# segundos: de 100µs (reenvío en memoria) a 2.5s (SPF en topologías grandes)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_value(v: float) -> str:
+    if v != v:
+        return "NaN"
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ("fn",)
+
+    def __init__(self):
+        super().__init__()
+        self.fn: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        self.fn = fn
+
+    def get(self) -> float:
+        if self.fn is not None:
+            try:
+                return float(self.fn())
+            except Exception:
+                return float("nan")
+        return self.value
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: se esperaban etiquetas {self.labelnames}, llegaron {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def items(self):
+        return list(self._children.items())
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(c.value)}" for k, c in self.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(c.get())}" for k, c in self.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _samples(self) -> List[str]:
+        out = []
+        for k, c in self.items():
+            with c._lock:
+                counts, total, n = list(c.counts), c.sum, c.count
+            acc = 0
+            for bound, cnt in zip(self.buckets + (float("inf"),), counts):
+                acc += cnt
+                le = 'le="' + _fmt_value(bound) + '"'
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, le)} {acc}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, k)} {_fmt_value(total)}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, k)} {n}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, doc: str, labelnames: Sequence[str], **kw) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, doc, labelnames, **kw)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Métrica {name} ya registrada como {metric.kind}")
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self, **match: str) -> Dict[str, float]:
+        """{nombre{etiquetas}: valor} de counters y gauges cuyas etiquetas coinciden con `match` (para la CLI)."""
+        out: Dict[str, float] = {}
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for m in metrics:
+            for key, child in m.items():
+                labels = dict(zip(m.labelnames, key))
+                if any(labels.get(n) != v for n, v in match.items()):
+                    continue
+                rest = {n: v for n, v in labels.items() if n not in match}
+                name = m.name + _fmt_labels(list(rest), list(rest.values()))
+                if isinstance(child, _HistogramChild):
+                    out[name + " (n)"] = child.count
+                    if child.count:
+                        out[name + " (media)"] = child.sum / child.count
+                elif isinstance(child, _GaugeChild):
+                    out[name] = child.get()
+                else:
+                    out[name] = child.value
+        return out
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, doc: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY._get(Counter, name, doc, labelnames)
+
+
+def gauge(name: str, doc: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY._get(Gauge, name, doc, labelnames)
+
+
+def histogram(name: str, doc: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY._get(Histogram, name, doc, labelnames, buckets=buckets)
+
+
+# ---------- métricas comunes de los routers ----------
+PACKETS = counter("lab3_packets_total", "Paquetes por tipo y sentido (in/out) en el transporte",
+                  ("node", "type", "dir"))
+DROPS = counter("lab3_drops_total", "Paquetes descartados por motivo", ("node", "reason"))
+DUPLICATES = counter("lab3_duplicates_total", "Paquetes repetidos detectados por el cache de vistos", ("node", "kind"))
+HANDLE_SECONDS = histogram("lab3_packet_handling_seconds",
+                           "Tiempo desde la recepción hasta terminar de reenviar/entregar", ("node", "type"))
+SPF_SECONDS = histogram("lab3_spf_seconds", "Duración del cálculo de la tabla (Dijkstra)", ("node",))
+QUEUE_DEPTH = gauge("lab3_queue_depth", "Profundidad de colas internas", ("node", "queue"))
+
+
+# ---------- exportador HTTP ----------
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # sin una línea por scrape
+
+
+def serve(port: Optional[int] = None, host: str = METRICS_HOST) -> Optional[int]:
+    """Levanta el exportador (una vez por proceso). Devuelve el puerto o None si está apagado."""
+    global _server
+    if port is None:
+        if not METRICS_PORT:
+            return None
+        port = int(METRICS_PORT)
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _Handler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            print(f"[metrics] 📈 Exportando en http://{host}:{_server.server_address[1]}/metrics")
+        return _server.server_address[1]
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# microbench.py
+"""
+Microbenchmarks del camino de un paquete: cuánto cuesta cada paso por salto.
+
+Operaciones (ns/op y asignaciones/op):
+- make_packet       uuid4 + marca de tiempo + dicts del paquete   (por tamaño de payload)
+- validate_packet, normalize_packet, get_packet_id, dec_hops        (por tamaño de payload)
+- encode_packet / decode_packet: el JSON de RedisTransport          (por tamaño de payload)
+- channel_to_node   canal -> nodo con un id_map de T nodos          (por tamaño de tabla)
+- dedup_insert      "ya lo vi?" + alta en el set de vistos de T ids (por tamaño de tabla)
+- next_hop          LinkStateRouterRedis._get_next_hop con T rutas  (por tamaño de tabla)
+
+Tiempo: cada operación corre sobre N entradas ya preparadas con
+deque(map(fn, entradas), maxlen=0), sin GC; se toma la mejor de --repeat
+pasadas y se descuenta el costo del bucle vacío (una función que no hace
+nada), así ns/op es el de la operación.
+
+Asignaciones: con tracemalloc, bloques y bytes por operación que quedan
+vivos con los resultados retenidos (lo que la operación crea y devuelve;
+los temporales que se liberan en la misma llamada no cuentan).
+
+Reproducible: semilla fija para payloads/ids, PYTHONHASHSEED=0 (el script se
+relanza con esa variable si falta) y sin Redis ni red: corre en cualquier
+máquina sin terminal.
+
+Uso:
+    python microbench.py
+    python microbench.py --ops encode_packet,decode_packet --payloads 64,65536
+    python microbench.py --out micro.json --baseline micro_anterior.json
+"""
+from __future__ import annotations
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import deque
+from functools import partial
+from typing import Any, Callable, Dict, List, Tuple
+
+import id_map
+import router_log
+from bench import compare, run_meta, THRESHOLD
+from id_map import channel_to_node
+from packets import (make_packet, validate_packet, normalize_packet, get_packet_id, dec_hops,
+                     encode_packet, decode_packet, DEFAULT_HOPS)
+
+DEFAULT_PAYLOADS = (0, 64, 1024, 16384)
+DEFAULT_TABLES   = (10, 1000, 100000)
+DEFAULT_OPS      = 20000   # entradas por pasada
+DEFAULT_REPEAT   = 5
+ALLOC_OPS        = 2000    # entradas en la pasada con tracemalloc (retiene los resultados)
+NOISE_FLOOR      = 5e-9    # s/op; diferencias menores no cuentan al comparar
+
+PAYLOAD_OPS = ("make_packet", "validate_packet", "normalize_packet", "get_packet_id", "dec_hops",
+               "encode_packet", "decode_packet")
+TABLE_OPS   = ("channel_to_node", "dedup_insert", "next_hop")
+
+# un caso arma (fn, entradas) nuevas por pasada: las operaciones que modifican el paquete no se contaminan
+Case = Callable[[int], Tuple[Callable[[Any], Any], List[Any]]]
+
+
+def _noop(x: Any) -> Any:
+    return x
+
+
+class _NullTransport:
+    def __init__(self, my_channel: str, on_packet: Callable[[Dict[str, Any]], None]):
+        self.my_channel = my_channel
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def publish(self, channel: str, packet: dict) -> None:
+        pass
+
+
+def _ids(rng: random.Random, n: int) -> List[str]:
+    """ids con la forma de los de make_packet (uuid4 en texto), deterministas."""
+    return [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(n)]
+
+
+def _channels(src: str = "A", dst: str = "B") -> Tuple[str, str]:
+    return id_map.NODE_TO_CHANNEL[src], id_map.NODE_TO_CHANNEL[dst]
+
+
+def payload_case(op: str, size: int, seed: int) -> Case:
+    ch_a, ch_b = _channels()
+    payload = "x" * size
+
+    def packets(n: int) -> List[Dict[str, Any]]:
+        rng = random.Random(seed)
+        return [make_packet("message", ch_a, ch_b, DEFAULT_HOPS, [{"id": i, "ts": 0}], payload)
+                for i in _ids(rng, n)]
+
+    def case(n: int):
+        if op == "make_packet":
+            return partial(make_packet, "message", ch_a, ch_b, DEFAULT_HOPS, None), [payload] * n
+        if op == "decode_packet":
+            return decode_packet, [encode_packet(p) for p in packets(n)]
+        fn = {"validate_packet": validate_packet, "normalize_packet": normalize_packet,
+              "get_packet_id": get_packet_id, "dec_hops": dec_hops, "encode_packet": encode_packet}[op]
+        return fn, packets(n)
+    return case
+
+
+def table_case(op: str, size: int, seed: int) -> Case:
+    rng = random.Random(seed)
+    if op == "channel_to_node":
+        names = [f"mb{i}" for i in range(size)]
+        missing = {n: n for n in names if n not in id_map.NODE_TO_CHANNEL}
+        if missing:
+            id_map.register_nodes(missing)
+        channels = [id_map.NODE_TO_CHANNEL[n] for n in names]
+        return lambda n: (channel_to_node, [channels[rng.randrange(size)] for _ in range(n)])
+
+    if op == "dedup_insert":
+        known = _ids(rng, size)
+
+        def case(n: int):
+            seen = set(known)
+
+            def insert(pkt_id: str) -> bool:
+                # lo mismo que hace el router de flooding por paquete
+                if pkt_id in seen:
+                    return True
+                seen.add(pkt_id)
+                return False
+            return insert, _ids(rng, n)
+        return case
+
+    if op == "next_hop":
+        from router_lsr_redis import LinkStateRouterRedis
+        router = LinkStateRouterRedis("A", {"A": {"B": 1.0}, "B": {"A": 1.0}},
+                                      checkpoint_path="", transport_factory=_NullTransport)
+        dests = [f"d{i}" for i in range(size)]
+        table = [{"destino": d, "next_hop": "B", "costo": 1.0, "saltos": 1} for d in dests]
+        router._state.update(lambda s: s.evolve(routing_table=table))
+        return lambda n: (router._get_next_hop, [dests[rng.randrange(size)] for _ in range(n)])
+    raise ValueError(f"operación desconocida: {op}")
+
+
+def time_per_op(case: Case, n: int, repeat: int) -> float:
+    """Mejor ns/op de `repeat` pasadas, descontado el bucle vacío."""
+    def best(fn_args: Callable[[], Tuple[Callable[[Any], Any], List[Any]]]) -> float:
+        out = float("inf")
+        for _ in range(repeat):
+            fn, args = fn_args()
+            gc.collect()
+            gc.disable()
+            try:
+                t0 = time.perf_counter_ns()
+                deque(map(fn, args), maxlen=0)
+                out = min(out, time.perf_counter_ns() - t0)
+            finally:
+                gc.enable()
+        return out / n
+    empty = best(lambda: (_noop, [None] * n))
+    return max(0.0, best(lambda: case(n)) - empty)
+
+
+def allocs_per_op(case: Case, n: int) -> Tuple[float, float]:
+    """(bloques, bytes) por op que siguen vivos con los resultados retenidos."""
+    fn, args = case(n)
+    gc.collect()
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot().filter_traces(filters)
+        out = list(map(fn, args))
+        after = tracemalloc.take_snapshot().filter_traces(filters)
+    finally:
+        tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    blocks = sum(s.count_diff for s in stats) - 1          # sin la lista `out`
+    size = sum(s.size_diff for s in stats) - sys.getsizeof(out)
+    del out
+    return max(0.0, blocks / n), max(0.0, size / n)
+
+
+def run(ops: List[str], payloads: List[int], tables: List[int], n: int = DEFAULT_OPS,
+        repeat: int = DEFAULT_REPEAT, alloc: bool = True, seed: int = 0,
+        verbose: bool = True) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    plan = [(op, "payload", p) for op in ops if op in PAYLOAD_OPS for p in payloads]
+    plan += [(op, "table", t) for op in ops if op in TABLE_OPS for t in sorted(tables)]
+    for op, dim, param in plan:
+        case = payload_case(op, param, seed) if dim == "payload" else table_case(op, param, seed)
+        ns = time_per_op(case, n, repeat)
+        row: Dict[str, Any] = {"bench": op, "topo": dim, "size": param, "ns_per_op": ns, "min_s": ns * 1e-9}
+        if alloc:
+            row["blocks_per_op"], row["bytes_per_op"] = allocs_per_op(case, min(n, ALLOC_OPS))
+        results.append(row)
+        if verbose:
+            extra = f"  {row['blocks_per_op']:6.2f} bloques  {row['bytes_per_op']:9.1f} B" if alloc else ""
+            print(f"  {op:<17} {dim:<7} {param:>7}  {ns:10.1f} ns/op{extra}", flush=True)
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Microbenchmarks del camino del paquete")
+    ap.add_argument("--ops", default=",".join(PAYLOAD_OPS + TABLE_OPS))
+    ap.add_argument("--payloads", default=",".join(str(p) for p in DEFAULT_PAYLOADS), help="caracteres de payload")
+    ap.add_argument("--tables", default=",".join(str(t) for t in DEFAULT_TABLES), help="nodos/ids/rutas en la tabla")
+    ap.add_argument("-n", type=int, default=DEFAULT_OPS, help="operaciones por pasada")
+    ap.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    ap.add_argument("--no-alloc", action="store_true", help="solo tiempos (sin tracemalloc)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="escribir los resultados en este JSON")
+    ap.add_argument("--baseline", help="comparar con un JSON de una corrida anterior")
+    ap.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = ap.parse_args()
+
+    if os.environ.get("PYTHONHASHSEED") != "0":
+        # mismo orden de sets/dicts de strings en cada corrida
+        os.environ["PYTHONHASHSEED"] = "0"
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    router_log.set_level("warn")
+    ops = [o for o in args.ops.split(",") if o]
+    unknown = [o for o in ops if o not in PAYLOAD_OPS + TABLE_OPS]
+    if unknown:
+        ap.error(f"operaciones desconocidas: {', '.join(unknown)}")
+    print(f"⏱️ {len(ops)} operaciones, {args.n} ops x {args.repeat} pasadas")
+    results = run(ops, [int(p) for p in args.payloads.split(",") if p],
+                  [int(t) for t in args.tables.split(",") if t],
+                  args.n, args.repeat, not args.no_alloc, args.seed)
+    doc: Dict[str, Any] = {"meta": run_meta(), "results": results}
+
+    worse = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline.get("results", []), args.threshold, noise_floor=NOISE_FLOOR)
+        doc["comparison"] = {"baseline": baseline.get("meta", {}), "threshold": args.threshold, "rows": rows}
+        print(f"\n📊 Contra {args.baseline}, umbral +{args.threshold:.0%}:")
+        for r in rows:
+            if r["status"] != "igual":
+                print(f"  {r['status']:<10} {r['bench']:<17} {r['size']:>7}  "
+                      f"{r['base_s'] * 1e9:.1f} → {r['new_s'] * 1e9:.1f} ns/op  (x{r['ratio']:.2f})")
+        worse = sum(r["status"] == "regresión" for r in rows)
+        print(f"  {len(rows)} comparadas: {worse} regresiones")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=1)
+        print(f"📄 Resultados → {args.out}")
+    sys.exit(1 if worse else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+# multipath.py
+"""
+Transferencias grandes repartidas en varios caminos disjuntos (striping).
+
+Con forwarding por camino más corto una transferencia grande queda limitada
+a una sola cadena de canales. Aquí el origen:
+- calcula hasta MULTIPATH_K caminos sin enlaces en común desde la LSDB
+  (dijkstra_rt.link_disjoint_paths),
+- parte el payload en trozos de MULTIPATH_CHUNK caracteres y los manda con
+  ruta de origen ("route") por cada camino,
+- reparte la ventana total (MULTIPATH_WINDOW trozos en vuelo) entre los
+  caminos en proporción inversa a su latencia de ACK (EWMA por camino), y
+  cada ACK libera un lugar en ese mismo camino: los caminos rápidos reciben
+  más trozos,
+- reenvía por otro camino los trozos sin ACK tras el timeout del camino
+  (3x su latencia, entre MIN_TIMEOUT y MAX_TIMEOUT); un camino que vence se
+  penaliza una sola vez por revisión, y un trozo se abandona tras
+  MAX_RETRIES reenvíos o CHUNK_DEADLINE s desde su primera copia.
+
+La latencia medida es del camino y sirve a todas las transferencias; la
+ventana, los trozos en vuelo y los contadores son de cada transferencia, así
+una transferencia abandonada no deja lugares ocupados para las siguientes.
+
+El destino confirma cada trozo ("mpack") que su fragment.Reassembler
+aceptó y reensambla en orden, sin importar por qué camino llegó cada trozo.
+Un trozo que no entra en el buffer no se confirma: el origen lo reintenta y
+termina abandonando la transferencia, nunca la da por completa sin entregarla.
+Una transferencia de más de REASSEMBLY_MAX_BYTES se rechaza en send_bulk.
+
+Necesita un router con LSDB y rutas de origen (LinkStateRouterRedis).
+
+Uso:
+    mp = Multipath(router)
+    mp.send_bulk("D", datos)
+
+ENV: MULTIPATH_K, MULTIPATH_CHUNK, MULTIPATH_WINDOW, REASSEMBLY_MAX_BYTES (ver fragment.py)
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from id_map import channel_to_node
+from dijkstra_rt import link_disjoint_paths
+from fragment import Reassembler, REASSEMBLY_MAX_BYTES
+from router_log import get_logger
+
+CHUNK_TYPE = "mpchunk"
+ACK_TYPE   = "mpack"
+
+MULTIPATH_K      = int(os.getenv("MULTIPATH_K", "3"))
+MULTIPATH_CHUNK  = int(os.getenv("MULTIPATH_CHUNK", "4096"))    # caracteres por trozo
+MULTIPATH_WINDOW = int(os.getenv("MULTIPATH_WINDOW", "16"))     # trozos en vuelo (todos los caminos)
+LATENCY_ALPHA    = 0.25       # peso de cada muestra en la EWMA de latencia
+MIN_TIMEOUT      = 1.0        # s
+MAX_TIMEOUT      = 8.0        # s, tope del timeout y de la latencia penalizada
+MAX_RETRIES      = 5          # por trozo
+CHUNK_DEADLINE   = MAX_RETRIES * MAX_TIMEOUT   # s desde la primera copia de un trozo
+TICK             = 0.5        # s, revisión de timeouts
+REASSEMBLY_TIMEOUT = 60.0     # s, una transferencia grande tarda más que un mensaje fragmentado
+
+
+class _Path:
+    def __init__(self, nodes: List[str]):
+        self.nodes = nodes                   # [origen, ..., destino]
+        self.latency: Optional[float] = None  # s, EWMA de la latencia de ACK
+        self.sent = 0                         # acumulados de todas las transferencias
+        self.acked = 0
+
+    def timeout(self) -> float:
+        if not self.latency:
+            return 2 * MIN_TIMEOUT
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, 3 * self.latency))
+
+    def penalize(self) -> None:
+        self.latency = min(MAX_TIMEOUT, 2 * (self.latency or MIN_TIMEOUT))
+
+    def __repr__(self) -> str:
+        lat = f"{self.latency * 1000:.0f}ms" if self.latency else "?"
+        return f"{'-'.join(self.nodes)} (lat {lat}, {self.acked}/{self.sent})"
+
+
+class _Transfer:
+    def __init__(self, tid: str, dst: str, chunks: List[str], paths: List[_Path], as_json: bool,
+                 started: float):
+        self.tid = tid
+        self.dst = dst
+        self.chunks = chunks
+        self.paths = paths
+        self.as_json = as_json
+        self.queue: Deque[int] = deque(range(len(chunks)))
+        self.inflight: Dict[int, Tuple[int, float]] = {}   # trozo -> (camino, enviado_en)
+        self.retries: Dict[int, int] = {}
+        self.first_sent: Dict[int, float] = {}             # trozo -> primera copia
+        self.acked: set = set()
+        self.started = started
+        # por camino (mismo índice que paths), solo de esta transferencia
+        self.window = [1] * len(paths)
+        self.path_inflight = [0] * len(paths)
+        self.path_sent = [0] * len(paths)
+        self.path_acked = [0] * len(paths)
+
+
+class Multipath:
+    def __init__(self, router, on_message: Optional[Callable[[str, Any], None]] = None,
+                 k: int = MULTIPATH_K, chunk_size: int = MULTIPATH_CHUNK, window: int = MULTIPATH_WINDOW,
+                 max_bytes: int = REASSEMBLY_MAX_BYTES):
+        self.router = router
+        self.node_id = router.node_id
+        self.clock = router.clock   # timeouts y latencias en el reloj del router (virtual en netsim.py)
+        self.log = get_logger(self.node_id)
+        self.on_message = on_message
+        self.k = max(1, k)
+        self.chunk_size = max(1, chunk_size)
+        self.window = max(1, window)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._transfers: Dict[str, _Transfer] = {}
+        self._paths: Dict[Tuple[str, ...], _Path] = {}   # la latencia medida sobrevive entre transferencias
+        self._timer: Optional[Any] = None                # clock.call_later(...)
+        # sin desalojo: un trozo confirmado no puede perderse por otra transferencia
+        self._reassembler = Reassembler(max_bytes=max_bytes, timeout=REASSEMBLY_TIMEOUT, evict=False,
+                                        now=self.clock.monotonic)
+        self._done: Deque[str] = deque(maxlen=256)       # transferencias ya entregadas (ignora duplicados tardíos)
+        self.completed: Dict[str, Dict[str, Any]] = {}
+        router.register_handler(CHUNK_TYPE, self._on_chunk)
+        router.register_handler(ACK_TYPE, self._on_ack)
+
+    # ---------- origen ----------
+    def send_bulk(self, dst_node: str, payload: Any) -> str:
+        """Reparte `payload` en trozos por caminos disjuntos hacia dst_node; devuelve el id de la transferencia."""
+        nodes = link_disjoint_paths(self.router.graph, self.node_id, dst_node, self.k)
+        if not nodes:
+            raise ValueError(f"Sin camino hacia {dst_node} en la LSDB")
+        as_json = not isinstance(payload, str)
+        data = json.dumps(payload, ensure_ascii=False) if as_json else payload
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            # el destino no podría reensamblarla (mismo límite, REASSEMBLY_MAX_BYTES)
+            raise ValueError(f"Transferencia de {size} bytes supera el buffer de reensamblado ({self.max_bytes})")
+        chunks = [data[i:i + self.chunk_size] for i in range(0, len(data), self.chunk_size)] or [""]
+        tid = uuid.uuid4().hex[:12]
+        with self._lock:
+            paths = [self._paths.setdefault(tuple(p), _Path(p)) for p in nodes]
+            tr = self._transfers[tid] = _Transfer(tid, dst_node, chunks, paths, as_json, self.clock.monotonic())
+            self._rebalance(tr)
+            out = self._fill(tr)
+        self.log.info("multipath", "🔀 Transferencia %s → %s: %d trozos por %d camino(s)", tid, dst_node, len(chunks), len(paths))
+        self._transmit(tr, out)
+        self._schedule_tick()
+        return tid
+
+    def paths(self) -> List[_Path]:
+        with self._lock:
+            return list(self._paths.values())
+
+    def active(self) -> Dict[str, str]:
+        """{id: "confirmados/total"} de las transferencias en curso."""
+        with self._lock:
+            return {t: f"{len(tr.acked)}/{len(tr.chunks)}" for t, tr in self._transfers.items()}
+
+    def _rebalance(self, tr: _Transfer) -> None:
+        """Ventana de cada camino ∝ 1/latencia; sin medición todavía, partes iguales."""
+        known = [p.latency for p in tr.paths if p.latency]
+        default = min(known) if known else 1.0
+        weights = [1.0 / (p.latency or default) for p in tr.paths]
+        total = sum(weights)
+        tr.window = [max(1, round(self.window * w / total)) for w in weights]
+
+    def _fill(self, tr: _Transfer) -> List[Tuple[int, int]]:
+        """Asigna trozos de la cola a los caminos con lugar en su ventana: [(trozo, camino)]."""
+        out = []
+        now = self.clock.monotonic()
+        progress = True
+        while tr.queue and progress:
+            progress = False
+            for pi, p in enumerate(tr.paths):
+                if tr.queue and tr.path_inflight[pi] < tr.window[pi]:
+                    idx = tr.queue.popleft()
+                    tr.inflight[idx] = (pi, now)
+                    tr.first_sent.setdefault(idx, now)
+                    tr.path_inflight[pi] += 1
+                    tr.path_sent[pi] += 1
+                    p.sent += 1
+                    out.append((idx, pi))
+                    progress = True
+        return out
+
+    def _transmit(self, tr: _Transfer, out: List[Tuple[int, int]]) -> None:
+        for idx, pi in out:
+            mp = {"id": tr.tid, "i": idx, "n": len(tr.chunks), "path": pi}
+            if tr.as_json:
+                mp["json"] = True
+            self.router.send(tr.dst, tr.chunks[idx], p_type=CHUNK_TYPE,
+                             extra={"mp": mp, "route": tr.paths[pi].nodes[1:]})
+
+    def _on_ack(self, packet: Dict[str, Any]) -> None:
+        info = packet.get("mp") or {}
+        now = self.clock.monotonic()
+        with self._lock:
+            tr = self._transfers.get(str(info.get("id", "")))
+            if tr is None:
+                return
+            try:
+                idx = int(info["i"])
+            except (KeyError, TypeError, ValueError):
+                return
+            if idx in tr.acked:
+                return  # ACK repetido
+            sent = tr.inflight.pop(idx, None)
+            if sent is None:
+                # ACK tardío de una copia que ya venció: el trozo llegó, no hace falta reenviarlo
+                if idx not in tr.queue:
+                    return
+                tr.queue.remove(idx)
+            else:
+                pi, sent_at = sent
+                p = tr.paths[pi]
+                tr.path_inflight[pi] -= 1
+                tr.path_acked[pi] += 1
+                p.acked += 1
+                if idx not in tr.retries:
+                    # solo trozos sin reenvíos: no se sabe a qué copia responde el ACK (Karn)
+                    sample = now - sent_at
+                    p.latency = sample if p.latency is None else (1 - LATENCY_ALPHA) * p.latency + LATENCY_ALPHA * sample
+            tr.acked.add(idx)
+            if len(tr.acked) == len(tr.chunks):
+                del self._transfers[tr.tid]
+                self._finish(tr, now)
+                return
+            self._rebalance(tr)
+            out = self._fill(tr)
+        self._transmit(tr, out)
+
+    def _finish(self, tr: _Transfer, now: float) -> None:
+        elapsed = now - tr.started
+        summary = {"dst": tr.dst, "chunks": len(tr.chunks), "seconds": round(elapsed, 3),
+                   "per_path": {"-".join(p.nodes): n for p, n in zip(tr.paths, tr.path_acked)}}
+        self.completed[tr.tid] = summary
+        self.log.info("multipath", "✅ Transferencia %s a %s completa en %.2fs: %s", tr.tid, tr.dst, elapsed, summary["per_path"])
+
+    def _schedule_tick(self) -> None:
+        with self._lock:
+            if self._timer is not None or not self._transfers:
+                return
+            self._timer = self.clock.call_later(TICK, self._tick)
+
+    def _tick(self) -> None:
+        now = self.clock.monotonic()
+        resend: List[Tuple[_Transfer, List[Tuple[int, int]]]] = []
+        with self._lock:
+            self._timer = None
+            # cada camino vencido se penaliza una sola vez, después de revisar todos sus trozos
+            penalized: Dict[int, _Path] = {}
+            for tr in list(self._transfers.values()):
+                for idx, (pi, sent_at) in list(tr.inflight.items()):
+                    p = tr.paths[pi]
+                    if now - sent_at < p.timeout():
+                        continue
+                    # el camino no respondió a tiempo: se penaliza y el trozo vuelve a la cola
+                    del tr.inflight[idx]
+                    tr.path_inflight[pi] -= 1
+                    penalized[id(p)] = p
+                    tr.retries[idx] = tr.retries.get(idx, 0) + 1
+                    if tr.retries[idx] > MAX_RETRIES or now - tr.first_sent[idx] >= CHUNK_DEADLINE:
+                        # los demás trozos en vuelo se olvidan con la transferencia (ventana propia)
+                        del self._transfers[tr.tid]
+                        self.log.warn("multipath", "❌ Transferencia %s a %s abandonada (trozo %d sin ACK)", tr.tid, tr.dst, idx)
+                        break
+                    tr.queue.appendleft(idx)
+            for p in penalized.values():
+                p.penalize()
+            for tr in self._transfers.values():
+                self._rebalance(tr)
+                resend.append((tr, self._fill(tr)))
+        for tr, out in resend:
+            self._transmit(tr, out)
+        self._schedule_tick()
+
+    # ---------- destino ----------
+    def _on_chunk(self, packet: Dict[str, Any]) -> None:
+        src = channel_to_node(packet.get("from", ""))
+        info = packet.get("mp") or {}
+        tid = str(info.get("id", ""))
+        if tid in self._done:
+            self._ack(src, info)   # duplicado tardío: el ACK original pudo perderse
+            return
+        accepted, whole = self._reassembler.offer({**packet, "frag": info})
+        if not accepted:
+            # sin ACK: el origen reintenta y, si el buffer sigue lleno, abandona
+            self.log.warn("multipath", "⚠️ Trozo %s de %s (%s) rechazado: buffer de reensamblado lleno",
+                          info.get("i"), tid, src)
+            return
+        self._ack(src, info)
+        if whole is None:
+            return
+        self._done.append(tid)
+        data = json.loads(whole["payload"]) if info.get("json") else whole["payload"]
+        if self.on_message:
+            self.on_message(src, data)
+        else:
+            self.log.info("multipath", "✅ Transferencia %s de %s: %d caracteres", tid, src, len(whole["payload"]))
+
+    def _ack(self, src: str, info: Dict[str, Any]) -> None:
+        # ACK por trozo, por la ruta normal (la latencia que importa es la del camino de ida)
+        self.router.send(src, "", p_type=ACK_TYPE, extra={"mp": {"id": info.get("id"), "i": info.get("i")}})
+
+    def close(self) -> None:
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# netsim.py
+"""
+Simulador de eventos discretos que corre las clases de router reales.
+
+En vez de un proceso y un Redis por nodo, todos los routers
+(LinkStateRouterRedis, DistanceVectorRouterRedis, FloodingRouterRedis)
+viven en un solo proceso con:
+- un reloj virtual (VirtualClock) que reemplaza a time.time() y a los
+  threading.Timer de HELLO/LSP/vectores: el tiempo salta de evento en evento,
+  así 60 s simulados no tardan 60 s;
+- un transporte simulado por nodo (SimTransport) que en lugar de publicar en
+  Redis entrega el paquete en el otro extremo del enlace con su demora,
+  pérdida y ancho de banda (cola FIFO por sentido: un paquete de B bytes
+  ocupa el enlace B/bandwidth s).
+
+Mide lo que importa para comparar diseños:
+- convergencia: primer instante en que todos los routers tienen ruta a todos
+  los nodos de su componente (LSR/DV),
+- mensajes por entrega: copias de datos transmitidas / mensajes entregados,
+- latencia de entrega (min/avg/p50/p99/max) y mensajes de control por tipo.
+
+Escala: flooding/gossip llega a 10k nodos (grilla 100x100: ~10 s por 5
+mensajes). RPF calcula en cada nodo un árbol por origen nuevo (N árboles de
+N nodos por origen). LSR guarda la LSDB completa en cada nodo y recalcula el
+SPF por LSP (N² copias de LSP): unos cientos de nodos. DV además no pasa de
+16 saltos del mayor peso (infinito escalado, como RIP; ver DV_INFINITY).
+
+Uso:
+    python netsim.py topo.json --router lsr --messages 100
+    python netsim.py topo_areas.json --router lsr      (LSR con las áreas del archivo)
+    python netsim.py --grid 100x100 --router flooding --mode rpf --messages 50
+    python netsim.py --gen scalefree:2000 --router flooding --messages 50
+ENV: las mismas de los routers (HELLO/LSP/FRAGMENT_SIZE...); el Redis no se usa.
+"""
+from __future__ import annotations
+import argparse
+import heapq
+import itertools
+import json
+import random
+import sys
+import time
+from collections import Counter
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import id_map
+import router_log
+import topogen
+from id_map import channel_to_node
+from dijkstra_rt import load_topology, load_areas
+from echo import percentile
+from packets import encode_packet, decode_packet
+
+DATA_TYPE = "simdata"
+SIM_EPOCH = 1_700_000_000.0   # time() virtual = época + segundos simulados
+CHECK_PERIOD = 0.1            # s virtuales entre verificaciones de convergencia
+ROUTER_KINDS = ("lsr", "dv", "flooding")
+
+
+class _Event:
+    __slots__ = ("fn", "cancelled")
+
+    def __init__(self, fn: Callable[[], None]):
+        self.fn = fn
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class VirtualClock:
+    """Reloj con la interfaz de clock.SystemClock, pero con cola de eventos."""
+
+    def __init__(self, epoch: float = SIM_EPOCH):
+        self.now = 0.0
+        self.epoch = epoch
+        self.events = 0
+        self._heap: List[Tuple[float, int, _Event]] = []
+        self._seq = itertools.count()
+
+    def time(self) -> float:
+        return self.epoch + self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def call_later(self, delay: float, fn: Callable[[], None]) -> _Event:
+        ev = _Event(fn)
+        heapq.heappush(self._heap, (self.now + max(0.0, delay), next(self._seq), ev))
+        return ev
+
+    def run(self, until: float) -> None:
+        """Procesa eventos hasta `until` (s virtuales) o hasta que no queden."""
+        heap = self._heap
+        while heap and heap[0][0] <= until:
+            t, _, ev = heapq.heappop(heap)
+            if ev.cancelled:
+                continue
+            self.now = t
+            self.events += 1
+            ev.fn()
+        self.now = max(self.now, until)
+
+    def pending(self) -> int:
+        return len(self._heap)
+
+
+class Link:
+    __slots__ = ("delay", "loss", "bandwidth", "busy_until", "up")
+
+    def __init__(self, delay: float, loss: float = 0.0, bandwidth: float = 0.0):
+        self.delay = delay          # s de propagación
+        self.loss = loss            # probabilidad de pérdida por paquete
+        self.bandwidth = bandwidth  # bytes/s (0 = infinito)
+        self.busy_until = 0.0
+        self.up = True
+
+
+class SimTransport:
+    """Misma interfaz que RedisTransport, sobre los enlaces de SimNetwork."""
+
+    def __init__(self, net: "SimNetwork", my_channel: str, on_packet: Callable[[Dict[str, Any]], None]):
+        self.net = net
+        self.my_channel = my_channel
+        self.node = channel_to_node(my_channel)
+        self.on_packet = on_packet
+
+    def start(self) -> None:
+        self.net.down.discard(self.node)
+
+    def stop(self) -> None:
+        self.net.down.add(self.node)
+
+    def publish(self, channel: str, packet: dict) -> None:
+        self.net.transmit(self.node, channel, packet)
+
+    def put_blob(self, key: str, data: str, ttl: int) -> None:
+        self.net.blobs.setdefault(key, data)
+
+    def get_blobs(self, keys: List[str]) -> List[Optional[str]]:
+        return [self.net.blobs.get(k) for k in keys]
+
+
+class SimNetwork:
+    def __init__(self, graph: Dict[str, Dict[str, float]], router: str = "lsr",
+                 delay_per_cost: float = 0.001, loss: float = 0.0, bandwidth: float = 0.0,
+                 seed: int = 0, start_jitter: float = 1.0,
+                 areas: Optional[Dict[str, str]] = None, **router_kwargs: Any):
+        if router not in ROUTER_KINDS:
+            raise ValueError(f"router debe ser uno de {ROUTER_KINDS}")
+        if areas and router != "lsr":
+            raise ValueError("areas solo aplica al router lsr")
+        self.graph = graph
+        self.kind = router
+        self.areas = dict(areas or {})       # nodo -> área (ver load_areas); vacío = red plana
+        self.clock = VirtualClock()
+        self.rng = random.Random(seed)
+        self.blobs: Dict[str, str] = {}
+        self.down: set = set()
+        self.paused = False                  # "Redis" caído: se pierde todo lo publicado
+        self.sent: Counter = Counter()       # transmisiones por tipo de paquete
+        self.dropped: Counter = Counter()    # por motivo
+        self.errors = 0
+        self.converged_at: Optional[float] = None
+        self._origin: Dict[int, Tuple[float, str]] = {}    # id de mensaje -> (enviado_en, destino)
+        self.latencies: List[float] = []
+        self._delivered: set = set()
+
+        # nodos de la topología que no están en names.json: usuario = id del nodo
+        missing = {n: n for n in graph if n not in id_map.NODE_TO_CHANNEL}
+        if missing:
+            id_map.register_nodes(missing)
+
+        self.links: Dict[Tuple[str, str], Link] = {}
+        for a, neighs in graph.items():
+            for b, w in neighs.items():
+                self.links[(a, b)] = Link(float(w) * delay_per_cost, loss, bandwidth)
+
+        self.components = self._components()
+        self.routers: Dict[str, Any] = {}
+        # handlers por tipo de datos, también para los routers que se reinician
+        self.handlers: Dict[str, Callable[[str, Dict[str, Any]], None]] = {DATA_TYPE: self._on_data}
+        self._seed = seed
+        self._router_kwargs = router_kwargs
+        self._index = {node: i for i, node in enumerate(graph)}
+        for node in graph:
+            r = self._build(node)
+            # arranques escalonados, como procesos que no levantan todos a la vez
+            self.clock.call_later(self.rng.uniform(0.0, start_jitter), r.start)
+
+    def _build(self, node: str) -> Any:
+        kwargs = dict(self._router_kwargs, clock=self.clock,
+                      transport_factory=lambda ch, cb: SimTransport(self, ch, cb))
+        if self.kind == "lsr":
+            kwargs.setdefault("checkpoint_path", "")   # sin sqlite por nodo
+            kwargs.setdefault("areas", self.areas)
+        elif self.kind == "flooding":
+            # gossip reproducible, distinto por nodo
+            kwargs.setdefault("seed", self._seed * 1_000_003 + self._index[node])
+        r = self._router_class()(node, self.graph, **kwargs)
+        for p_type, fn in self.handlers.items():
+            r.register_handler(p_type, partial(fn, node))
+        self.routers[node] = r
+        return r
+
+    def register_handler(self, p_type: str, fn: Callable[[str, Dict[str, Any]], None]) -> None:
+        """fn(nodo, paquete) para los paquetes `p_type` que llegan a destino, en todos los routers."""
+        self.handlers[p_type] = fn
+        for node, r in self.routers.items():
+            r.register_handler(p_type, partial(fn, node))
+
+    def _router_class(self):
+        if self.kind == "lsr":
+            from router_lsr_redis import LinkStateRouterRedis
+            return LinkStateRouterRedis
+        if self.kind == "dv":
+            from router_dv_redis import DistanceVectorRouterRedis
+            return DistanceVectorRouterRedis
+        from router_flooding_redis import FloodingRouterRedis
+        return FloodingRouterRedis
+
+    def _components(self) -> Dict[str, int]:
+        """Tamaño de la componente conexa de cada nodo (una ruta completa cubre size-1 destinos)."""
+        size: Dict[str, int] = {}
+        for start in self.graph:
+            if start in size:
+                continue
+            comp, stack = {start}, [start]
+            while stack:
+                for n in self.graph.get(stack.pop(), {}):
+                    if n not in comp and n in self.graph:
+                        comp.add(n)
+                        stack.append(n)
+            for n in comp:
+                size[n] = len(comp)
+        return size
+
+    # ---------- enlaces ----------
+    def transmit(self, src: str, channel: str, packet: Dict[str, Any]) -> None:
+        self.sent[packet.get("type", "?")] += 1
+        if self.paused:
+            self.dropped["redis_paused"] += 1
+            return
+        dst = channel_to_node(channel)
+        link = self.links.get((src, dst))
+        if link is None or not link.up:
+            self.dropped["no_link" if link is None else "link_down"] += 1
+            return
+        if link.loss and self.rng.random() < link.loss:
+            self.dropped["loss"] += 1
+            return
+        # copia serializada: el router puede seguir modificando su dict
+        data = encode_packet(packet)
+        now = self.clock.now
+        if link.bandwidth:
+            start = max(now, link.busy_until)
+            link.busy_until = start + len(data) / link.bandwidth
+            arrival = link.busy_until + link.delay
+        else:
+            arrival = now + link.delay
+        self.clock.call_later(arrival - now, partial(self._deliver, dst, data))
+
+    def _deliver(self, dst: str, data: str) -> None:
+        if dst in self.down:
+            self.dropped["node_down"] += 1
+            return
+        try:
+            self.routers[dst].transport.on_packet(decode_packet(data))
+        except Exception as e:
+            # como RedisTransport: un error del router no tumba el resto
+            self.errors += 1
+            if self.errors == 1:
+                print(f"[netsim] ⚠️ Error en {dst} (t={self.clock.now:.3f}s): {e!r}", file=sys.stderr)
+
+    def set_link(self, a: str, b: str, both: bool = True, **params: Any) -> None:
+        """Cambia delay/loss/bandwidth/up de un enlace en plena simulación."""
+        for key in ((a, b), (b, a)) if both else ((a, b),):
+            link = self.links[key]
+            for name, value in params.items():
+                setattr(link, name, value)
+
+    # ---------- nodos ----------
+    def kill(self, node: str) -> None:
+        """Corta el proceso del router: timers cancelados y nada entra ni sale."""
+        r = self.routers[node]
+        stop = getattr(r, "stop", None) or r.transport.stop   # flooding no tiene stop()
+        stop()
+
+    def restart(self, node: str) -> None:
+        """Router nuevo en el mismo nodo, con estado vacío (como relanzar el proceso)."""
+        if node not in self.down:
+            self.kill(node)
+        self._build(node).start()
+
+    # ---------- convergencia ----------
+    def converged(self) -> bool:
+        if self.kind == "flooding":
+            return True   # sin tablas: se puede enviar desde el arranque
+        return all(len(r._state.snapshot.fib) >= self.components[n] - 1
+                   for n, r in self.routers.items() if n not in self.down)
+
+    def run_until_converged(self, timeout: float = 120.0) -> Optional[float]:
+        """Avanza hasta que todas las tablas estén completas; devuelve el instante o None."""
+        deadline = self.clock.now + timeout
+        while self.clock.now < deadline:
+            self.clock.run(min(deadline, self.clock.now + CHECK_PERIOD))
+            if self.converged():
+                self.converged_at = self.clock.now
+                return self.converged_at
+        return None
+
+    def run(self, seconds: float) -> None:
+        self.clock.run(self.clock.now + seconds)
+
+    # ---------- tráfico ----------
+    def send_traffic(self, count: int, rate: float = 100.0, size: int = 64,
+                     pairs: Optional[List[Tuple[str, str]]] = None) -> None:
+        """Programa `count` mensajes entre pares al azar (misma componente), `rate` por segundo."""
+        nodes = list(self.graph)
+        base = len(self._origin)
+        for i in range(count):
+            if pairs:
+                src, dst = pairs[i % len(pairs)]
+            else:
+                src = self.rng.choice(nodes)
+                dst = self.rng.choice(nodes)
+                while dst == src and len(nodes) > 1:
+                    dst = self.rng.choice(nodes)
+            self.clock.call_later(i / rate if rate > 0 else 0.0, partial(self._send, base + i, src, dst, size))
+
+    def _send(self, msg_id: int, src: str, dst: str, size: int) -> None:
+        self._origin[msg_id] = (self.clock.now, dst)
+        self.routers[src].send(dst, "x" * size, p_type=DATA_TYPE, extra={"sim": {"id": msg_id}})
+
+    def _on_data(self, node: str, packet: Dict[str, Any]) -> None:
+        msg_id = (packet.get("sim") or {}).get("id")
+        origin = self._origin.get(msg_id)
+        if origin is None or origin[1] != node or msg_id in self._delivered:
+            return
+        self._delivered.add(msg_id)
+        self.latencies.append(self.clock.now - origin[0])
+
+    # ---------- resultados ----------
+    def report(self) -> Dict[str, Any]:
+        data_sent = self.sent.get(DATA_TYPE, 0)
+        delivered = len(self.latencies)
+        lat = sorted(self.latencies)
+        out: Dict[str, Any] = {
+            "router": self.kind,
+            "nodes": len(self.graph),
+            "links": len(self.links) // 2,
+            "virtual_seconds": round(self.clock.now, 3),
+            "events": self.clock.events,
+            "converged_at": self.converged_at,
+            "messages_sent": len(self._origin),
+            "delivered": delivered,
+            "delivery_ratio": delivered / len(self._origin) if self._origin else None,
+            "data_transmissions": data_sent,
+            "msgs_per_delivery": data_sent / delivered if delivered else None,
+            "control_transmissions": {t: n for t, n in self.sent.items() if t != DATA_TYPE},
+            "dropped": dict(self.dropped),
+            "router_errors": self.errors,
+        }
+        if lat:
+            out["latency_ms"] = {"min": lat[0] * 1000, "avg": sum(lat) / len(lat) * 1000,
+                                 "p50": percentile(lat, 50) * 1000, "p99": percentile(lat, 99) * 1000,
+                                 "max": lat[-1] * 1000}
+        return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Simulación de eventos discretos con los routers reales")
+    ap.add_argument("topo", nargs="?", help="topo.json (o usar --grid/--gen)")
+    ap.add_argument("--grid", help="grilla RxC generada con pesos 1, p.ej. 30x30")
+    ap.add_argument("--gen", help="topología generada TIPO:TAMAÑO (ver topogen.py), p.ej. erdos:500")
+    ap.add_argument("--router", choices=ROUTER_KINDS, default="lsr")
+    ap.add_argument("--mode", choices=("flood", "rpf", "gossip"), help="modo del router de flooding")
+    ap.add_argument("--delay-ms", type=float, default=1.0, help="demora por unidad de costo del enlace")
+    ap.add_argument("--loss", type=float, default=0.0, help="pérdida por paquete en cada enlace")
+    ap.add_argument("--bandwidth", type=float, default=0.0, help="bytes/s por enlace (0 = infinito)")
+    ap.add_argument("--messages", type=int, default=100)
+    ap.add_argument("--rate", type=float, default=100.0, help="mensajes/s de la carga")
+    ap.add_argument("--size", type=int, default=64, help="caracteres de payload")
+    ap.add_argument("--timeout", type=float, default=120.0, help="s virtuales máximos para converger")
+    ap.add_argument("--drain", type=float, default=10.0, help="s virtuales tras el último envío")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--log", default="warn", help="nivel de log de los routers")
+    ap.add_argument("--json", action="store_true", help="resultado en JSON")
+    args = ap.parse_args()
+
+    if args.grid:
+        graph = topogen.generate("grid", args.grid, args.seed, max_weight=1)
+    elif args.gen:
+        kind, _, size = args.gen.partition(":")
+        graph = topogen.generate(kind, size, args.seed)
+    elif args.topo:
+        graph = load_topology(args.topo)
+    else:
+        ap.error("falta topo.json, --grid o --gen")
+
+    router_log.set_level(args.log)
+    kwargs: Dict[str, Any] = {}
+    if args.router == "flooding" and args.mode:
+        kwargs["mode"] = args.mode
+    if args.router == "lsr" and args.topo and not (args.grid or args.gen):
+        kwargs["areas"] = load_areas(args.topo)   # clave "areas" del topo.json, si la hay
+
+    t0 = time.perf_counter()
+    net = SimNetwork(graph, router=args.router, delay_per_cost=args.delay_ms / 1000.0, loss=args.loss,
+                     bandwidth=args.bandwidth, seed=args.seed, **kwargs)
+    built = time.perf_counter() - t0
+    converged = net.run_until_converged(args.timeout)
+    if converged is None and args.router != "flooding":
+        print(f"[netsim] ⚠️ Sin convergencia en {args.timeout}s virtuales", file=sys.stderr)
+    net.send_traffic(args.messages, rate=args.rate, size=args.size)
+    net.run(args.messages / args.rate + args.drain if args.rate > 0 else args.drain)
+    result = net.report()
+    result["wall_seconds"] = round(time.perf_counter() - t0, 3)
+    result["build_seconds"] = round(built, 3)
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+    print(f"🧪 {result['router']}: {result['nodes']} nodos, {result['links']} enlaces, "
+          f"{result['virtual_seconds']}s simulados en {result['wall_seconds']}s ({result['events']} eventos)")
+    if result["converged_at"] is not None:
+        print(f"  Convergencia: {result['converged_at']:.2f}s")
+    print(f"  Entregados: {result['delivered']}/{result['messages_sent']}  "
+          f"mensajes/entrega: {result['msgs_per_delivery'] or 0:.2f}")
+    if "latency_ms" in result:
+        lat = result["latency_ms"]
+        print("  Latencia min/avg/p50/p99/max = " +
+              "/".join(f"{lat[k]:.2f}" for k in ("min", "avg", "p50", "p99", "max")) + " ms")
+    print(f"  Control: {result['control_transmissions']}")
+    if result["dropped"]:
+        print(f"  Descartes: {result['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
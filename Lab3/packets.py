@@ -2,11 +2,13 @@
 
 # packets.py
 from __future__ import annotations
+import json
 import uuid
 import time
 from typing import Any, Dict, List, Optional
 
 BROADCAST = "*"
+DEFAULT_HOPS = 8
 
 def _now_ms() -> int:
     return int(time.time() * 1000)
@@ -14,7 +16,7 @@ def _now_ms() -> int:
 def make_packet(p_type: str,
                 from_channel: str,
                 to_channel: str,
-                hops: int = 8,
+                hops: int = DEFAULT_HOPS,
                 headers: Optional[List[Dict[str, Any]]] = None,
                 payload: Any = "") -> Dict[str, Any]:
     if headers is None:
@@ -30,6 +32,14 @@ def make_packet(p_type: str,
         "payload": payload
     }
 
+def encode_packet(pkt: Dict[str, Any]) -> str:
+    """Paquete -> texto JSON para el cable (Redis Pub/Sub)."""
+    return json.dumps(pkt, ensure_ascii=False)
+
+def decode_packet(data: Any) -> Any:
+    """Texto JSON del cable -> paquete (lo que no es str/bytes se devuelve tal cual)."""
+    return json.loads(data) if isinstance(data, (str, bytes, bytearray)) else data
+
 def normalize_packet(pkt: Dict[str, Any]) -> Dict[str, Any]:
     return pkt
 
@@ -0,0 +1,102 @@
+# pending_queue.py
+"""
+Cola de espera por destino para paquetes sin ruta (store-and-forward).
+
+Mientras el SPF/DV todavía no instala una ruta hacia un destino, los paquetes
+se guardan aquí en orden de llegada en lugar de descartarse o inundarse. En
+cuanto aparece el next hop, el router drena la cola de ese destino en orden.
+
+Límites:
+- max_bytes por destino (tamaño JSON del paquete); si no cabe, se descarta
+  el paquete nuevo (tail drop) para no reordenar lo ya encolado.
+- ttl en segundos; los paquetes vencidos se descartan al encolar o drenar.
+
+NO_ROUTE_POLICY elige qué hace el router (LSR o DV) sin ruta: "buffer"
+(esta cola, por defecto), "flood" (a todos los vecinos vivos, con TTL y sin
+repetir el mismo paquete) o "drop".
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Tuple
+
+PENDING_MAX_BYTES = int(os.getenv("PENDING_MAX_BYTES", str(64 * 1024)))  # por destino
+PENDING_TTL       = float(os.getenv("PENDING_TTL", "30"))                 # s
+
+NO_ROUTE_POLICIES = ("buffer", "flood", "drop")
+NO_ROUTE_POLICY = os.getenv("NO_ROUTE_POLICY", "buffer")
+
+
+class PendingQueue:
+    def __init__(self, max_bytes: int = PENDING_MAX_BYTES, ttl: float = PENDING_TTL,
+                 now: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._now = now
+        self._lock = threading.Lock()
+        # destino -> deque[(encolado_en, bytes, paquete)]
+        self._queues: Dict[str, Deque[Tuple[float, int, Dict[str, Any]]]] = {}
+        self._bytes: Dict[str, int] = {}
+        self.stats: Dict[str, int] = {"queued": 0, "drained": 0, "dropped_full": 0, "dropped_expired": 0}
+
+    def push(self, dest: str, packet: Dict[str, Any]) -> bool:
+        """Encola `packet` para `dest`. False si no entra en el límite de bytes."""
+        size = len(json.dumps(packet, ensure_ascii=False))
+        now = self._now()
+        with self._lock:
+            self._expire_locked(dest, now)
+            used = self._bytes.get(dest, 0)
+            if used + size > self.max_bytes:
+                self.stats["dropped_full"] += 1
+                return False
+            self._queues.setdefault(dest, deque()).append((now, size, packet))
+            self._bytes[dest] = used + size
+            self.stats["queued"] += 1
+            return True
+
+    def drain(self, dest: str) -> List[Dict[str, Any]]:
+        """Saca (en orden) los paquetes vigentes de `dest`."""
+        with self._lock:
+            self._expire_locked(dest, self._now())
+            q = self._queues.pop(dest, None)
+            self._bytes.pop(dest, None)
+            if not q:
+                return []
+            self.stats["drained"] += len(q)
+            return [pkt for _, _, pkt in q]
+
+    def __contains__(self, dest: str) -> bool:
+        return dest in self._queues
+
+    def destinations(self) -> List[str]:
+        with self._lock:
+            return list(self._queues)
+
+    def expire(self) -> int:
+        """Descarta los paquetes vencidos de todas las colas; devuelve cuántos."""
+        before = self.stats["dropped_expired"]
+        now = self._now()
+        with self._lock:
+            for dest in list(self._queues):
+                self._expire_locked(dest, now)
+        return self.stats["dropped_expired"] - before
+
+    def depth(self) -> Dict[str, Tuple[int, int]]:
+        """{destino: (paquetes, bytes)} para mostrar en la CLI."""
+        with self._lock:
+            return {d: (len(q), self._bytes.get(d, 0)) for d, q in self._queues.items()}
+
+    def _expire_locked(self, dest: str, now: float) -> None:
+        q = self._queues.get(dest)
+        if not q:
+            return
+        while q and now - q[0][0] > self.ttl:
+            _, size, _ = q.popleft()
+            self._bytes[dest] -= size
+            self.stats["dropped_expired"] += 1
+        if not q:
+            del self._queues[dest]
+            self._bytes.pop(dest, None)
@@ -1,18 +1,26 @@
 # redis_transport.py
 import os
-import json
 import threading
 import time
 import redis
 
+from id_map import channel_to_node
+from packets import encode_packet, decode_packet
+from metrics import PACKETS, DROPS
+from router_log import get_logger
+from resp_broker import ensure_embedded
+
 class RedisTransport:
     """
     Transporte simple sobre Redis Pub/Sub.
     - Se suscribe a 'my_channel' y llama on_packet(packet_dict) al recibir mensajes JSON.
     - publish(channel, packet_dict) publica el paquete (JSON) al canal indicado.
+    - put_blob/get_blobs guardan y recuperan payloads grandes por clave (claim-check).
     Variables de entorno: REDIS_HOST, REDIS_PORT, REDIS_PWD
+    (REDIS_HOST=embedded: broker RESP en este proceso, ver resp_broker.py)
     """
     def __init__(self, my_channel: str, on_packet):
+        ensure_embedded()
         self.host = os.getenv("REDIS_HOST")
         self.port = int(os.getenv("REDIS_PORT", "6379"))
         self.pwd  = os.getenv("REDIS_PWD", "")
@@ -21,6 +29,8 @@ class RedisTransport:
             raise RuntimeError("Falta REDIS_HOST en el entorno. Configúralo antes de iniciar.")
 
         self.my_channel = my_channel
+        self.node = channel_to_node(my_channel) or my_channel
+        self.log = get_logger("RedisTransport")
         self.on_packet = on_packet
         self._stop = threading.Event()
         self._thread = None
@@ -31,7 +41,7 @@ class RedisTransport:
         # Conexión y suscripción
         self._r = redis.Redis(host=self.host, port=self.port, password=self.pwd, decode_responses=True)
         self._r.ping()
-        print(f"[RedisTransport] Conectado a {self.host}:{self.port}. Canal local: {self.my_channel}")
+        self.log.info("ctrl", "Conectado a %s:%s. Canal local: %s", self.host, self.port, self.my_channel)
 
         self._pubsub = self._r.pubsub()
         self._pubsub.subscribe(self.my_channel)
@@ -48,23 +58,40 @@ class RedisTransport:
                     continue
                 data = msg.get("data")
                 try:
-                    pkt = json.loads(data) if isinstance(data, str) else data
+                    pkt = decode_packet(data)
                 except Exception as e:
-                    print(f"[RedisTransport] ⚠️ Mensaje no-JSON en {self.my_channel}: {e} :: {data}")
+                    DROPS.labels(self.node, "not_json").inc()
+                    self.log.warn("pkt", "⚠️ Mensaje no-JSON en %s: %s :: %s", self.my_channel, e, data)
                     continue
+                if isinstance(pkt, dict):
+                    PACKETS.labels(self.node, str(pkt.get("type", "?")), "in").inc()
                 try:
                     self.on_packet(pkt)
                 except Exception as e:
-                    print(f"[RedisTransport] ⚠️ Error en callback on_packet: {e}")
+                    self.log.error("pkt", "⚠️ Error en callback on_packet: %s", e)
         except Exception as e:
-            print(f"[RedisTransport] ⚠️ Loop de escucha terminó con error: {e}")
+            if self._stop.is_set():
+                return   # stop() cerró el pubsub mientras escuchábamos
+            self.log.error("ctrl", "⚠️ Loop de escucha terminó con error: %s", e)
 
     def publish(self, channel: str, packet: dict):
         try:
-            payload = json.dumps(packet, ensure_ascii=False)
+            payload = encode_packet(packet)
         except Exception as e:
             raise ValueError(f"Paquete no serializable a JSON: {e}")
         self._r.publish(channel, payload)
+        PACKETS.labels(self.node, str(packet.get("type", "?")), "out").inc()
+
+    def put_blob(self, key: str, data: str, ttl: int):
+        # NX: si el mismo contenido ya está no se reescribe; EXPIRE renueva el TTL.
+        # Ambos en un pipeline: un solo viaje a Redis.
+        pipe = self._r.pipeline(transaction=False)
+        pipe.set(key, data, ex=ttl, nx=True)
+        pipe.expire(key, ttl)
+        pipe.execute()
+
+    def get_blobs(self, keys):
+        return self._r.mget(keys) if keys else []
 
     def stop(self):
         self._stop.set()
@@ -0,0 +1,282 @@
+# reliable.py
+"""
+Entrega confiable extremo a extremo sobre cualquiera de los routers.
+
+Los paquetes "message" no tienen confirmación. Esta capa agrega, por par
+(origen, destino):
+- números de secuencia ("seq") dentro de una sesión ("sid", aleatoria por
+  destino, con una época creciente "epoch" tomada del reloj: si el emisor
+  reinicia o abandona un destino y vuelve a empezar desde seq 0, el receptor
+  ve una época mayor y reinicia su estado; un paquete tardío de una época
+  menor es de una sesión ya terminada y se descarta sin tocar la actual),
+- ACKs ("rack") enrutados de vuelta con el acumulado ("ack" = próximo seq
+  esperado), los selectivos ("sack" = seqs recibidos fuera de orden) y el
+  seq que lo provocó ("echo", de ahí sale la muestra de RTT),
+- ventana deslizante de RELIABLE_WINDOW paquetes en vuelo; lo que no entra
+  espera en un backlog y sale a medida que llegan ACKs,
+- retransmisión por temporizador con RTO estilo TCP (SRTT/RTTVAR, algoritmo
+  de Karn, backoff exponencial) y retransmisión rápida con 3 ACKs duplicados,
+- entrega al receptor en orden y sin duplicados.
+
+Uso:
+    rel = ReliableChannel(router, on_message=lambda src, data: print(src, data))
+    rel.send_reliable("D", "hola")
+
+El router solo necesita register_handler(tipo, fn) y
+send(dst, payload, p_type=..., extra=...). Los temporizadores y las muestras
+de RTT usan router.clock si existe (en netsim.py, el reloj virtual).
+
+ENV: RELIABLE_WINDOW, RELIABLE_MAX_RETRIES
+"""
+from __future__ import annotations
+import os
+import threading
+import uuid
+from collections import deque
+from functools import partial
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from id_map import channel_to_node
+from router_log import get_logger
+from clock import SYSTEM_CLOCK
+
+DATA_TYPE = "rdata"
+ACK_TYPE  = "rack"
+
+RELIABLE_WINDOW      = int(os.getenv("RELIABLE_WINDOW", "16"))      # paquetes en vuelo por destino
+RELIABLE_MAX_RETRIES = int(os.getenv("RELIABLE_MAX_RETRIES", "8"))  # luego se abandona el destino
+RTO_INITIAL = 1.0    # s, antes de la primera muestra de RTT
+RTO_MIN     = 0.2    # s
+RTO_MAX     = 30.0   # s
+DUP_ACK_THRESHOLD = 3
+SACK_MAX    = 32     # seqs selectivos por ACK
+TIMER_SLACK = 1e-6   # s, el timer puede vencer un pelo antes del deadline (redondeo del reloj virtual)
+
+
+class _SendState:
+    def __init__(self, epoch: int):
+        self.sid = uuid.uuid4().hex[:8]
+        self.epoch = epoch
+        self.next_seq = 0
+        self.backlog: Deque[Tuple[int, Any]] = deque()       # (seq, payload) esperando ventana
+        self.unacked: Dict[int, List[Any]] = {}              # seq -> [payload, enviado_en, reintentos]
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.rto = RTO_INITIAL
+        self.last_ack = -1
+        self.dup_acks = 0
+        self.timer: Optional[Any] = None                     # clock.call_later(...)
+
+    def base(self) -> int:
+        if self.unacked:
+            return min(self.unacked)
+        return self.backlog[0][0] if self.backlog else self.next_seq
+
+    def sample_rtt(self, rtt: float) -> None:
+        # RFC 6298
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.reset_rto()
+
+    def reset_rto(self) -> None:
+        """RTO desde SRTT/RTTVAR, descartando el backoff acumulado."""
+        if self.srtt is not None:
+            self.rto = min(RTO_MAX, max(RTO_MIN, self.srtt + 4 * self.rttvar))
+
+
+class _RecvState:
+    def __init__(self, sid: str, epoch: int):
+        self.sid = sid
+        self.epoch = epoch
+        self.expected = 0
+        self.buffer: Dict[int, Any] = {}
+
+
+class ReliableChannel:
+    def __init__(self, router, on_message: Optional[Callable[[str, Any], None]] = None,
+                 window: int = RELIABLE_WINDOW, max_retries: int = RELIABLE_MAX_RETRIES):
+        self.router = router
+        self.node_id = router.node_id
+        self.clock = getattr(router, "clock", SYSTEM_CLOCK)
+        self.log = get_logger(self.node_id)
+        self.on_message = on_message
+        self.window = max(1, int(window))
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._send: Dict[str, _SendState] = {}
+        self._recv: Dict[str, _RecvState] = {}
+        self._epoch = 0   # última época asignada (ms del reloj, estrictamente creciente)
+        self.stats: Dict[str, int] = {"sent": 0, "retransmitted": 0, "acked": 0,
+                                      "delivered": 0, "duplicates": 0, "stale": 0, "failed": 0}
+        router.register_handler(DATA_TYPE, self._on_data)
+        router.register_handler(ACK_TYPE, self._on_ack)
+
+    # ---------- emisor ----------
+    def send_reliable(self, dst_node: str, payload: Any) -> int:
+        """Encola `payload` hacia dst_node; devuelve su número de secuencia."""
+        with self._lock:
+            st = self._send.get(dst_node)
+            if st is None:
+                st = self._send[dst_node] = _SendState(self._next_epoch())
+            seq = st.next_seq
+            st.next_seq += 1
+            st.backlog.append((seq, payload))
+            out = self._fill_window(st)
+        self._transmit(dst_node, st, out)
+        self._arm(dst_node)
+        return seq
+
+    def outstanding(self) -> Dict[str, Tuple[int, int]]:
+        """{destino: (en_vuelo, en_backlog)} para la CLI."""
+        with self._lock:
+            return {d: (len(st.unacked), len(st.backlog)) for d, st in self._send.items()
+                    if st.unacked or st.backlog}
+
+    def rto(self, dst_node: str) -> float:
+        st = self._send.get(dst_node)
+        return st.rto if st else RTO_INITIAL
+
+    def _next_epoch(self) -> int:
+        """Época de una sesión nueva: de la hora del reloj, para seguir creciendo si el proceso reinicia. Requiere _lock."""
+        self._epoch = max(self._epoch + 1, int(self.clock.time() * 1000))
+        return self._epoch
+
+    def _fill_window(self, st: _SendState) -> List[Tuple[int, Any]]:
+        out = []
+        limit = st.base() + self.window
+        now = self.clock.monotonic()
+        while st.backlog and st.backlog[0][0] < limit:
+            seq, payload = st.backlog.popleft()
+            st.unacked[seq] = [payload, now, 0]
+            out.append((seq, payload))
+        return out
+
+    def _transmit(self, dst_node: str, st: _SendState, items: List[Tuple[int, Any]], retransmit: bool = False) -> None:
+        for seq, payload in items:
+            self.router.send(dst_node, payload, p_type=DATA_TYPE, extra={"seq": seq, "sid": st.sid, "epoch": st.epoch})
+            self.stats["retransmitted" if retransmit else "sent"] += 1
+
+    def _on_ack(self, packet: Dict[str, Any]) -> None:
+        dst = channel_to_node(packet.get("from", ""))
+        try:
+            ack = int(packet.get("ack", 0))
+            sack = {int(s) for s in packet.get("sack", [])}
+            echo = int(packet.get("echo", -1))
+        except (TypeError, ValueError):
+            return
+        now = self.clock.monotonic()
+        fast: List[Tuple[int, Any]] = []
+        with self._lock:
+            st = self._send.get(dst)
+            if st is None or packet.get("sid") != st.sid:
+                return  # ACK de una sesión anterior (o abandonada)
+            acked = [s for s in st.unacked if s < ack or s in sack]
+            # la muestra sale solo del seq que provocó este ACK, y (Karn) solo
+            # si no fue retransmitido: un ACK acumulado tras otro perdido mediría de más
+            entry = st.unacked.get(echo)
+            if entry is not None and echo in acked and entry[2] == 0:
+                st.sample_rtt(now - entry[1])
+            elif acked:
+                st.reset_rto()
+            for s in acked:
+                del st.unacked[s]
+            self.stats["acked"] += len(acked)
+
+            if ack == st.last_ack and ack in st.unacked:
+                st.dup_acks += 1
+                if st.dup_acks == DUP_ACK_THRESHOLD:
+                    entry = st.unacked[ack]
+                    entry[1], entry[2] = now, entry[2] + 1
+                    fast.append((ack, entry[0]))
+            else:
+                st.last_ack, st.dup_acks = ack, 0
+            out = self._fill_window(st)
+        self._transmit(dst, st, fast, retransmit=True)
+        self._transmit(dst, st, out)
+        if acked or fast:
+            self._arm(dst)
+
+    def _arm(self, dst_node: str) -> None:
+        """(Re)programa el temporizador con el vencimiento más próximo del destino."""
+        with self._lock:
+            st = self._send.get(dst_node)
+            if st is None:
+                return
+            if st.timer:
+                st.timer.cancel()
+                st.timer = None
+            if not st.unacked:
+                return
+            deadline = min(e[1] for e in st.unacked.values()) + st.rto
+            delay = max(0.0, deadline - self.clock.monotonic())
+            st.timer = self.clock.call_later(delay, partial(self._on_timeout, dst_node))
+
+    def _on_timeout(self, dst_node: str) -> None:
+        now = self.clock.monotonic()
+        resend: List[Tuple[int, Any]] = []
+        with self._lock:
+            st = self._send.get(dst_node)
+            if st is None or not st.unacked:
+                return
+            expired = sorted(s for s, e in st.unacked.items() if now - e[1] >= st.rto - TIMER_SLACK)
+            if any(st.unacked[s][2] >= self.max_retries for s in expired):
+                lost = len(st.unacked) + len(st.backlog)
+                st.timer = None
+                del self._send[dst_node]   # el próximo envío abre otra sesión (sid nuevo) desde seq 0
+                self.stats["failed"] += lost
+                self.log.warn("reliable", "❌ Entrega confiable a %s abandonada: %d mensaje(s) sin ACK", dst_node, lost)
+                return
+            if expired:
+                st.rto = min(RTO_MAX, st.rto * 2)  # backoff
+                for s in expired:
+                    entry = st.unacked[s]
+                    entry[1], entry[2] = now, entry[2] + 1
+                    resend.append((s, entry[0]))
+        if resend:
+            self.log.debug("reliable", "🔁 Retransmitiendo %d mensaje(s) a %s (RTO %.2fs)", len(resend), dst_node, self.rto(dst_node))
+        self._transmit(dst_node, st, resend, retransmit=True)
+        self._arm(dst_node)
+
+    # ---------- receptor ----------
+    def _on_data(self, packet: Dict[str, Any]) -> None:
+        src = channel_to_node(packet.get("from", ""))
+        sid = str(packet.get("sid", ""))
+        try:
+            seq = int(packet["seq"])
+            epoch = int(packet.get("epoch", 0))
+        except (KeyError, TypeError, ValueError):
+            return
+        ready: List[Any] = []
+        with self._lock:
+            st = self._recv.get(src)
+            if st is not None and epoch < st.epoch:
+                # sesión ya reemplazada (p.ej. liberado tarde de la cola de espera): sin ACK ni reinicio
+                self.stats["stale"] += 1
+                return
+            if st is None or epoch > st.epoch or st.sid != sid:
+                st = self._recv[src] = _RecvState(sid, epoch)
+            if seq < st.expected or seq in st.buffer:
+                self.stats["duplicates"] += 1
+            elif seq < st.expected + 2 * self.window:
+                st.buffer[seq] = packet.get("payload")
+            while st.expected in st.buffer:
+                ready.append(st.buffer.pop(st.expected))
+                st.expected += 1
+            ack, sack = st.expected, sorted(st.buffer)[:SACK_MAX]
+        # el ACK se manda siempre (también para duplicados: el anterior pudo perderse)
+        self.router.send(src, "", p_type=ACK_TYPE, extra={"sid": sid, "ack": ack, "sack": sack, "echo": seq})
+        for payload in ready:
+            self.stats["delivered"] += 1
+            if self.on_message:
+                self.on_message(src, payload)
+            else:
+                self.log.info("data", "✅ Mensaje confiable de %s: %s", src, payload)
+
+    def close(self) -> None:
+        with self._lock:
+            for st in self._send.values():
+                if st.timer:
+                    st.timer.cancel()
@@ -0,0 +1,641 @@
+#!/usr/bin/env python3
+# resp_broker.py
+"""
+Broker RESP2 mínimo en asyncio: un Redis de mentira para correr los routers,
+las pruebas y los benchmarks sin el Redis remoto.
+
+Alcanza con lo que usan RedisTransport y redis-py:
+    PING, AUTH, HELLO, CLIENT (SETINFO...), SELECT, QUIT, MULTI/EXEC/DISCARD,
+    PUBLISH, SUBSCRIBE, UNSUBSCRIBE, PSUBSCRIBE, PUNSUBSCRIBE,
+    SET (EX/PX/NX/XX), GET, MGET, EXPIRE, DEL,
+    XADD (MAXLEN), XREAD (COUNT/BLOCK), XLEN, XRANGE
+Todo vive en memoria en un solo event loop (sin persistencia). Los
+comandos desconocidos responden -ERR, como Redis. Habla RESP2; si el
+cliente pide RESP3 con HELLO 3 (redis-py 8 lo hace por defecto) cambian solo
+el nil ("_"), los mapas (HELLO, XREAD) y los mensajes de pub/sub (push ">").
+
+Demora inyectada (latency, o RESP_BROKER_LATENCY_MS): cada respuesta y cada
+mensaje de pub/sub sale `latency` segundos después, como un enlace con esa
+demora de ida; un pipeline paga una sola demora. Es fija: los tiempos no
+dependen de la red de la máquina.
+
+Desde el entorno: con REDIS_HOST=embedded, ensure_embedded() (la llama
+RedisTransport y las pruebas test_redis_*.py) arranca un broker por proceso en
+un puerto efímero y deja REDIS_HOST/REDIS_PORT apuntando a él.
+
+En el mismo proceso (hilo aparte con su event loop):
+    broker = RespBroker()
+    host, port = broker.start_in_thread()     # puerto efímero
+    ...
+    broker.stop()
+Como proceso:
+    python resp_broker.py [--port 6379] [--password ...] [--latency-ms 5]
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import bisect
+import fnmatch
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Pattern, Set, Tuple
+
+OK = b"+OK\r\n"
+NIL = b"$-1\r\n"
+EMBEDDED = "embedded"   # valor de REDIS_HOST que pide el broker en proceso
+
+StreamId = Tuple[int, int]
+
+
+def encode(value: Any, resp3: bool = False) -> bytes:
+    """Respuesta RESP: None → nil, int → :n, bytes/str → bulk, list → array, dict → mapa (RESP3), Exception → -ERR."""
+    if value is None:
+        return b"_\r\n" if resp3 else NIL
+    if isinstance(value, Exception):
+        return b"-" + str(value).encode() + b"\r\n"
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, (bytes, bytearray)):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, (list, tuple)):
+        return b"*%d\r\n" % len(value) + b"".join(encode(v, resp3) for v in value)
+    if isinstance(value, dict):
+        if not resp3:
+            return encode([x for kv in value.items() for x in kv])
+        return b"%%%d\r\n" % len(value) + b"".join(encode(k, True) + encode(v, True) for k, v in value.items())
+    raise TypeError(f"tipo no codificable: {type(value)!r}")
+
+
+class RespError(Exception):
+    pass
+
+
+def _glob(pattern: bytes) -> Pattern:
+    """Patrón de PSUBSCRIBE (*, ?, [...], [^...]) a regex; latin-1 para no perder bytes."""
+    text = pattern.decode("latin-1").replace("[^", "[!")
+    return re.compile(fnmatch.translate(text), re.DOTALL)
+
+
+def _parse_id(raw: bytes, seq_default: int = 0) -> StreamId:
+    ms, _, seq = raw.partition(b"-")
+    try:
+        return int(ms), int(seq) if seq else seq_default
+    except ValueError:
+        raise RespError("ERR Invalid stream ID specified as stream command argument")
+
+
+def _fmt_id(sid: StreamId) -> bytes:
+    return b"%d-%d" % sid
+
+
+class _Client:
+    __slots__ = ("writer", "channels", "patterns", "authed", "resp3", "queue")
+
+    def __init__(self, writer: asyncio.StreamWriter, authed: bool):
+        self.writer = writer
+        self.channels: Set[bytes] = set()
+        self.patterns: Set[bytes] = set()
+        self.authed = authed
+        self.resp3 = False
+        self.queue: Optional[List[List[bytes]]] = None   # comandos entre MULTI y EXEC
+
+    @property
+    def subscriptions(self) -> int:
+        return len(self.channels) + len(self.patterns)
+
+    def push(self, items: List[Any]) -> bytes:
+        """Mensaje de pub/sub: array en RESP2, push (">") en RESP3."""
+        frame = encode(items, self.resp3)
+        return b">" + frame[1:] if self.resp3 else frame
+
+
+class RespBroker:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, password: str = "",
+                 latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.password = password.encode()
+        self.latency = latency
+        self._data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}   # clave -> (valor, vence_en monotonic)
+        self._channels: Dict[bytes, Set[_Client]] = {}
+        self._patterns: Dict[bytes, Tuple[Pattern, Set[_Client]]] = {}
+        self._streams: Dict[bytes, Tuple[List[StreamId], List[List[bytes]]]] = {}   # clave -> (ids, campos)
+        self._last_id: Dict[bytes, StreamId] = {}
+        self._xadded: Optional[asyncio.Event] = None   # se dispara en cada XADD (XREAD BLOCK)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._tasks: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self.stats: Dict[str, int] = {"connections": 0, "commands": 0, "published": 0, "delivered": 0}
+
+    # ---------- ciclo de vida ----------
+    async def start(self) -> Tuple[str, int]:
+        self._loop = asyncio.get_running_loop()
+        self._xadded = asyncio.Event()
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.host, self.port
+
+    def start_in_thread(self) -> Tuple[str, int]:
+        """Arranca el broker en un hilo daemon con su propio event loop; devuelve (host, puerto)."""
+        ready = threading.Event()
+        errors: List[BaseException] = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self.start())
+            except BaseException as e:
+                errors.append(e)
+                ready.set()
+                return
+            ready.set()
+            loop.run_forever()
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name="resp-broker", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        return self.host, self.port
+
+    def stop(self) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+
+        async def shutdown():
+            if self._server:
+                self._server.close()
+            # cerrar los sockets (no cancelar): cada _serve ve EOF y termina solo
+            for task, writer in list(self._tasks.items()):
+                writer.close()
+            if self._tasks:
+                await asyncio.wait(list(self._tasks), timeout=2)
+            loop.stop()
+        if self._thread and threading.current_thread() is not self._thread:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop)
+            self._thread.join(timeout=5)
+        elif self._server:
+            self._server.close()
+
+    # ---------- conexión ----------
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client = _Client(writer, authed=not self.password)
+        self.stats["connections"] += 1
+        task = asyncio.current_task()
+        self._tasks[task] = writer
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                self.stats["commands"] += 1
+                try:
+                    reply = self._dispatch(client, args)
+                    if asyncio.iscoroutine(reply):
+                        reply = await reply
+                except RespError as e:
+                    reply = encode(e)
+                except (IndexError, ValueError):
+                    reply = encode(RespError("ERR syntax error"))
+                if args[0].upper() == b"QUIT":
+                    writer.write(reply)
+                    await writer.drain()
+                    break
+                if reply:
+                    self._send(writer, reply)
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self._drop_subscriptions(client, list(client.channels), list(client.patterns))
+            self._tasks.pop(task, None)
+            writer.close()
+
+    def _send(self, writer: asyncio.StreamWriter, data: bytes) -> None:
+        """Escribe ya, o dentro de `latency` s; el orden por conexión se mantiene (mismo retardo)."""
+        if not self.latency:
+            writer.write(data)
+        else:
+            self._loop.call_later(self.latency, self._write_later, writer, data)
+
+    @staticmethod
+    def _write_later(writer: asyncio.StreamWriter, data: bytes) -> None:
+        if not writer.is_closing():
+            writer.write(data)
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if line[:1] != b"*":
+            return line.split()   # comando inline (telnet/redis-cli viejo)
+        args = []
+        for _ in range(int(line[1:])):
+            head = await reader.readline()
+            if head[:1] != b"$":
+                raise ConnectionError("protocolo inválido")
+            size = int(head[1:])
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    # ---------- comandos ----------
+    def _dispatch(self, client: _Client, args: List[bytes]) -> bytes:
+        cmd = args[0].upper().decode(errors="replace")
+        if cmd == "AUTH":
+            return self._auth(client, args)
+        if cmd == "HELLO":
+            return self._hello(client, args[1:])
+        if not client.authed:
+            raise RespError("NOAUTH Authentication required.")
+        handler = getattr(self, "_cmd_" + cmd.lower(), None)
+        if handler is None:
+            raise RespError(f"ERR unknown command '{cmd}'")
+        if client.subscriptions and cmd not in ("SUBSCRIBE", "UNSUBSCRIBE", "PSUBSCRIBE", "PUNSUBSCRIBE",
+                                                "PING", "QUIT"):
+            raise RespError(f"ERR Can't execute '{cmd.lower()}': only (P)SUBSCRIBE / (P)UNSUBSCRIBE / PING / QUIT are allowed in this context")
+        if client.queue is not None and cmd not in ("MULTI", "EXEC", "DISCARD", "QUIT"):
+            client.queue.append(args)
+            return b"+QUEUED\r\n"
+        return handler(client, args[1:])
+
+    def _auth(self, client: _Client, args: List[bytes]) -> bytes:
+        if not self.password:
+            raise RespError("ERR AUTH <password> called without any password configured for the default user.")
+        if args[-1] != self.password:
+            raise RespError("WRONGPASS invalid username-password pair or user is disabled.")
+        client.authed = True
+        return OK
+
+    def _hello(self, client: _Client, args: List[bytes]) -> bytes:
+        """HELLO [2|3] [AUTH usuario clave] [SETNAME nombre]."""
+        if args:
+            if args[0] not in (b"2", b"3"):
+                raise RespError("NOPROTO unsupported protocol version")
+            i = 1
+            while i < len(args):
+                opt = args[i].upper()
+                if opt == b"AUTH" and i + 2 < len(args):
+                    self._auth(client, [b"AUTH", args[i + 1], args[i + 2]])
+                    i += 3
+                elif opt == b"SETNAME" and i + 1 < len(args):
+                    i += 2
+                else:
+                    raise RespError("ERR syntax error in HELLO option")
+            if not client.authed:
+                raise RespError("NOAUTH HELLO must be called with the client already authenticated")
+            client.resp3 = args[0] == b"3"
+        elif not client.authed:
+            raise RespError("NOAUTH Authentication required.")
+        return encode({"server": "redis", "version": "7.0.0", "proto": 3 if client.resp3 else 2,
+                       "id": self.stats["connections"], "mode": "standalone", "role": "master",
+                       "modules": []}, client.resp3)
+
+    def _cmd_ping(self, client: _Client, args: List[bytes]) -> bytes:
+        if client.subscriptions:
+            return client.push([b"pong", args[0] if args else b""])
+        return encode(args[0], client.resp3) if args else b"+PONG\r\n"
+
+    def _cmd_client(self, client: _Client, args: List[bytes]) -> bytes:
+        return OK
+
+    def _cmd_select(self, client: _Client, args: List[bytes]) -> bytes:
+        return OK
+
+    def _cmd_quit(self, client: _Client, args: List[bytes]) -> bytes:
+        return OK
+
+    # transacciones: un solo event loop, así que EXEC ya es atómico
+    def _cmd_multi(self, client: _Client, args: List[bytes]) -> bytes:
+        if client.queue is not None:
+            raise RespError("ERR MULTI calls can not be nested")
+        client.queue = []
+        return OK
+
+    def _cmd_discard(self, client: _Client, args: List[bytes]) -> bytes:
+        if client.queue is None:
+            raise RespError("ERR DISCARD without MULTI")
+        client.queue = None
+        return OK
+
+    def _cmd_exec(self, client: _Client, args: List[bytes]) -> bytes:
+        if client.queue is None:
+            raise RespError("ERR EXEC without MULTI")
+        queued, client.queue = client.queue, None
+        replies = []
+        for cmd in queued:
+            try:
+                reply = self._dispatch(client, cmd)
+                if asyncio.iscoroutine(reply):   # XREAD BLOCK dentro de MULTI no bloquea
+                    reply.close()
+                    reply = encode(None, client.resp3)
+            except RespError as e:
+                reply = encode(e)
+            except (IndexError, ValueError):
+                reply = encode(RespError("ERR syntax error"))
+            replies.append(reply)
+        return b"*%d\r\n" % len(replies) + b"".join(replies)
+
+    # pub/sub
+    def _cmd_publish(self, client: _Client, args: List[bytes]) -> bytes:
+        if len(args) != 2:
+            raise RespError("ERR wrong number of arguments for 'publish' command")
+        channel, message = args
+        receivers = 0
+        subs = self._channels.get(channel, ())
+        if subs:
+            frames: Dict[bool, bytes] = {}
+            for sub in subs:
+                frame = frames.get(sub.resp3)
+                if frame is None:
+                    frame = frames[sub.resp3] = sub.push([b"message", channel, message])
+                self._send(sub.writer, frame)
+            receivers += len(subs)
+        if self._patterns:
+            name = channel.decode("latin-1")
+            for pattern, (regex, psubs) in self._patterns.items():
+                if regex.match(name):
+                    for sub in psubs:
+                        self._send(sub.writer, sub.push([b"pmessage", pattern, channel, message]))
+                    receivers += len(psubs)
+        self.stats["published"] += 1
+        self.stats["delivered"] += receivers
+        return encode(receivers)
+
+    def _cmd_subscribe(self, client: _Client, args: List[bytes]) -> bytes:
+        out = []
+        for ch in args:
+            client.channels.add(ch)
+            self._channels.setdefault(ch, set()).add(client)
+            out.append(client.push([b"subscribe", ch, client.subscriptions]))
+        return b"".join(out)
+
+    def _cmd_psubscribe(self, client: _Client, args: List[bytes]) -> bytes:
+        out = []
+        for pattern in args:
+            client.patterns.add(pattern)
+            if pattern not in self._patterns:
+                self._patterns[pattern] = (_glob(pattern), set())
+            self._patterns[pattern][1].add(client)
+            out.append(client.push([b"psubscribe", pattern, client.subscriptions]))
+        return b"".join(out)
+
+    def _drop_subscriptions(self, client: _Client, channels: List[bytes], patterns: List[bytes],
+                            reply: bool = False) -> bytes:
+        out = []
+        for ch in channels:
+            client.channels.discard(ch)
+            subs = self._channels.get(ch)
+            if subs:
+                subs.discard(client)
+                if not subs:
+                    del self._channels[ch]
+            if reply:
+                out.append(client.push([b"unsubscribe", ch, client.subscriptions]))
+        for pattern in patterns:
+            client.patterns.discard(pattern)
+            entry = self._patterns.get(pattern)
+            if entry:
+                entry[1].discard(client)
+                if not entry[1]:
+                    del self._patterns[pattern]
+            if reply:
+                out.append(client.push([b"punsubscribe", pattern, client.subscriptions]))
+        return b"".join(out)
+
+    def _cmd_unsubscribe(self, client: _Client, args: List[bytes]) -> bytes:
+        return (self._drop_subscriptions(client, args or list(client.channels), [], reply=True)
+                or client.push([b"unsubscribe", None, client.subscriptions]))
+
+    def _cmd_punsubscribe(self, client: _Client, args: List[bytes]) -> bytes:
+        return (self._drop_subscriptions(client, [], args or list(client.patterns), reply=True)
+                or client.push([b"punsubscribe", None, client.subscriptions]))
+
+    # claves
+    def _get(self, key: bytes) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and time.monotonic() >= expires:
+            del self._data[key]
+            return None
+        return value
+
+    def _cmd_set(self, client: _Client, args: List[bytes]) -> bytes:
+        if len(args) < 2:
+            raise RespError("ERR wrong number of arguments for 'set' command")
+        key, value, opts = args[0], args[1], [a.upper() for a in args[2:]]
+        expires = None
+        i = 0
+        while i < len(opts):
+            if opts[i] in (b"EX", b"PX") and i + 1 < len(opts):
+                secs = int(opts[i + 1]) / (1 if opts[i] == b"EX" else 1000)
+                expires = time.monotonic() + secs
+                i += 2
+            elif opts[i] in (b"NX", b"XX"):
+                exists = self._get(key) is not None
+                if (opts[i] == b"NX") == exists:
+                    return encode(None, client.resp3)
+                i += 1
+            else:
+                raise RespError("ERR syntax error")
+        self._data[key] = (value, expires)
+        return OK
+
+    def _cmd_get(self, client: _Client, args: List[bytes]) -> bytes:
+        return encode(self._get(args[0]), client.resp3)
+
+    def _cmd_mget(self, client: _Client, args: List[bytes]) -> bytes:
+        return encode([self._get(k) for k in args], client.resp3)
+
+    def _cmd_expire(self, client: _Client, args: List[bytes]) -> bytes:
+        value = self._get(args[0])
+        if value is None:
+            return encode(0)
+        self._data[args[0]] = (value, time.monotonic() + int(args[1]))
+        return encode(1)
+
+    def _cmd_del(self, client: _Client, args: List[bytes]) -> bytes:
+        removed = 0
+        for k in args:
+            removed += self._data.pop(k, None) is not None
+            if self._streams.pop(k, None) is not None:
+                self._last_id.pop(k, None)
+                removed += 1
+        return encode(removed)
+
+    # streams
+    def _cmd_xadd(self, client: _Client, args: List[bytes]) -> bytes:
+        """XADD clave [NOMKSTREAM] [MAXLEN [=|~] n] *|ms-*|id campo valor [campo valor ...]"""
+        if len(args) < 4:
+            raise RespError("ERR wrong number of arguments for 'xadd' command")
+        key, i, maxlen, mkstream = args[0], 1, None, True
+        while True:
+            opt = args[i].upper()
+            if opt == b"NOMKSTREAM":
+                mkstream, i = False, i + 1
+            elif opt == b"MAXLEN":
+                i += 1
+                if args[i] in (b"=", b"~"):
+                    i += 1
+                maxlen, i = int(args[i]), i + 1
+            else:
+                break
+        fields = args[i + 1:]
+        if not fields or len(fields) % 2:
+            raise RespError("ERR wrong number of arguments for 'xadd' command")
+        if key not in self._streams and not mkstream:
+            return encode(None, client.resp3)
+        last = self._last_id.get(key, (0, 0))
+        if args[i] == b"*":
+            ms = int(time.time() * 1000)
+            sid = (ms, 0) if ms > last[0] else (last[0], last[1] + 1)
+        elif args[i].endswith(b"-*"):
+            ms = _parse_id(args[i][:-2])[0]
+            sid = (ms, last[1] + 1 if ms == last[0] else 0)
+        else:
+            sid = _parse_id(args[i])
+        if args[i] != b"*" and sid <= last:
+            raise RespError("ERR The ID specified in XADD is equal or smaller than the target stream top item")
+        ids, entries = self._streams.setdefault(key, ([], []))
+        ids.append(sid)
+        entries.append(fields)
+        if maxlen is not None and len(ids) > maxlen:
+            del ids[:len(ids) - maxlen], entries[:len(entries) - maxlen]
+        self._last_id[key] = sid
+        self._xadded.set()
+        self._xadded = asyncio.Event()
+        return encode(_fmt_id(sid))
+
+    def _cmd_xlen(self, client: _Client, args: List[bytes]) -> bytes:
+        return encode(len(self._streams.get(args[0], ((), ()))[0]))
+
+    def _entries(self, key: bytes, after: StreamId, until: Optional[StreamId] = None,
+                 count: Optional[int] = None) -> List[List[Any]]:
+        ids, entries = self._streams.get(key, ([], []))
+        lo = bisect.bisect_right(ids, after)
+        hi = bisect.bisect_right(ids, until) if until is not None else len(ids)
+        if count is not None:
+            hi = min(hi, lo + count)
+        return [[_fmt_id(ids[j]), entries[j]] for j in range(lo, hi)]
+
+    def _cmd_xrange(self, client: _Client, args: List[bytes]) -> bytes:
+        """XRANGE clave inicio fin [COUNT n]; - y + son los extremos."""
+        if len(args) not in (3, 5):
+            raise RespError("ERR wrong number of arguments for 'xrange' command")
+        start = (0, 0) if args[1] == b"-" else _parse_id(args[1])
+        end = None if args[2] == b"+" else _parse_id(args[2], seq_default=2 ** 64 - 1)
+        count = int(args[4]) if len(args) == 5 else None
+        # _entries es exclusivo por abajo: un paso antes del inicio
+        after = (start[0], start[1] - 1) if start[1] else (start[0] - 1, 2 ** 64 - 1)
+        return encode(self._entries(args[0], after, end, count), client.resp3)
+
+    def _cmd_xread(self, client: _Client, args: List[bytes]):
+        """XREAD [COUNT n] [BLOCK ms] STREAMS clave [clave ...] id [id ...]; $ = solo lo nuevo."""
+        count, block, i = None, None, 0
+        while i < len(args) and args[i].upper() != b"STREAMS":
+            opt = args[i].upper()
+            if opt == b"COUNT" and i + 1 < len(args):
+                count = int(args[i + 1])
+            elif opt == b"BLOCK" and i + 1 < len(args):
+                block = int(args[i + 1])
+            else:
+                raise RespError("ERR syntax error")
+            i += 2
+        rest = args[i + 1:]
+        if i >= len(args) or not rest or len(rest) % 2:
+            raise RespError("ERR Unbalanced 'xread' list of streams: for each stream key an ID or '$' must be specified.")
+        half = len(rest) // 2
+        keys = rest[:half]
+        after = [self._last_id.get(k, (0, 0)) if raw == b"$" else _parse_id(raw)
+                 for k, raw in zip(keys, rest[half:])]
+
+        def collect() -> bytes:
+            found = [(k, e) for k, a in zip(keys, after) for e in [self._entries(k, a, count=count)] if e]
+            if not found:
+                return None
+            if client.resp3:
+                return encode(dict(found), True)
+            return encode([[k, e] for k, e in found])
+
+        reply = collect()
+        if reply is not None or block is None:
+            return reply or encode(None, client.resp3)
+
+        async def wait() -> bytes:
+            deadline = None if block == 0 else self._loop.time() + block / 1000
+            while True:
+                event = self._xadded
+                timeout = None if deadline is None else deadline - self._loop.time()
+                if timeout is not None and timeout <= 0:
+                    return encode(None, client.resp3)
+                try:
+                    await asyncio.wait_for(event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    return encode(None, client.resp3)
+                reply = collect()
+                if reply is not None:
+                    return reply
+        return wait()
+
+
+_embedded: Optional[RespBroker] = None
+_embedded_lock = threading.Lock()
+
+
+def ensure_embedded() -> Optional[Tuple[str, int]]:
+    """
+    Si REDIS_HOST=embedded arranca (una vez por proceso) un broker en un puerto
+    efímero y deja REDIS_HOST/REDIS_PORT apuntando a él; devuelve (host, puerto).
+    Con cualquier otro REDIS_HOST no hace nada y devuelve None.
+    Usa REDIS_PWD como clave y RESP_BROKER_LATENCY_MS como demora inyectada.
+    """
+    global _embedded
+    with _embedded_lock:
+        if os.getenv("REDIS_HOST") != EMBEDDED:
+            return None
+        if _embedded is None:
+            _embedded = RespBroker(password=os.getenv("REDIS_PWD", ""),
+                                   latency=float(os.getenv("RESP_BROKER_LATENCY_MS", "0")) / 1000)
+            _embedded.start_in_thread()
+        os.environ["REDIS_HOST"] = _embedded.host
+        os.environ["REDIS_PORT"] = str(_embedded.port)
+        return _embedded.host, _embedded.port
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Broker RESP2 en memoria (pub/sub, claves y streams)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=6379, help="0 = puerto efímero")
+    ap.add_argument("--password", default="")
+    ap.add_argument("--latency-ms", type=float, default=float(os.getenv("RESP_BROKER_LATENCY_MS", "0")),
+                    help="demora fija de cada respuesta y mensaje")
+    args = ap.parse_args()
+
+    async def serve():
+        broker = RespBroker(args.host, args.port, args.password, args.latency_ms / 1000)
+        host, port = await broker.start()
+        print(f"📡 Broker RESP en {host}:{port}", flush=True)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,552 @@
+# router_dv_redis.py
+"""
+Router de Distance Vector (DV) usando Redis Pub/Sub.
+- Cada nodo solo conoce el costo a sus vecinos (pesos de topo.json) y los
+  vectores de distancia que ellos le envían en paquetes "info".
+- Bellman-Ford incremental: al llegar un vector solo se recalculan los
+  destinos afectados (O(grado) por destino).
+- Triggered updates parciales: solo viajan las entradas que cambiaron; el
+  vector completo se envía cada UPDATE_PERIOD como refresco.
+- Cada vector viaja con los saltos de cada ruta ("saltos"), así el TTL de
+  los paquetes nuevos sale del camino que el DV eligió y no del de menos
+  saltos (con pesos pueden diferir).
+- Split horizon con poison reverse: a un vecino se le anuncia costo infinito
+  para los destinos cuyo next hop es él. El infinito es INFINITY_HOPS veces el
+  mayor peso de topo.json (16 como RIP con pesos 1) o DV_INFINITY si se
+  define; todos los nodos lo derivan del mismo archivo y coinciden.
+- Hold-down: un destino que se vuelve inalcanzable ignora anuncios que no
+  mejoren su último costo conocido durante HOLDDOWN_TIME.
+- send("*") es broadcast a un salto: sale a cada vecino vivo y ellos lo
+  entregan sin reenviarlo (como broadcast del LSR interactivo).
+- Paquetes sin ruta esperan en una cola por destino (pending_queue.py) y se
+  liberan en orden cuando el DV instala la ruta. Política configurable en
+  NO_ROUTE_POLICY: buffer (por defecto) | flood | drop
+- Payloads de más de FRAGMENT_SIZE caracteres salen en fragmentos que el
+  destino reensambla (ver fragment.py); con claim_check=True solo viaja una
+  referencia al payload guardado en Redis (ver claim_check.py).
+
+Uso:
+  python router_dv_redis.py topo.json A
+ENV:
+  REDIS_HOST, REDIS_PORT, REDIS_PWD, SECTION, GROUP, NAMES_FILE
+  DV_INFINITY (costo "inalcanzable"; por defecto según los pesos)
+  NO_ROUTE_POLICY, PENDING_MAX_BYTES, PENDING_TTL
+  LOG_LEVEL, LOG_SAMPLE, LOG_RATE, LOG_QUEUE (ver router_log.py)
+  TRACE (traza por salto en todos los envíos, ver hop_trace.py)
+"""
+from __future__ import annotations
+import os
+import sys
+import time
+import threading
+from typing import Callable, Dict, Any, List, Optional, Set, Tuple
+
+from redis_transport import RedisTransport
+from id_map import NODE_TO_CHANNEL, get_channel, channel_to_node
+from packets import (make_packet, validate_packet, normalize_packet, get_packet_id, dec_hops, is_deliver_to_me,
+                     BROADCAST, DEFAULT_HOPS)
+from dijkstra_rt import load_topology, ttl_for
+from router_state import RouterState, RouterSnapshot
+from pending_queue import PendingQueue, NO_ROUTE_POLICIES, NO_ROUTE_POLICY
+from fragment import Reassembler, fragment_packet
+from claim_check import ClaimCheck
+import hop_trace
+from router_log import get_logger, DEBUG
+from clock import SYSTEM_CLOCK
+import metrics
+from metrics import DROPS, DUPLICATES
+
+INFINITY_HOPS  = 16    # "inalcanzable" en saltos (como en RIP), se escala con los pesos
+UPDATE_PERIOD  = 10.0  # s, vector completo periódico
+ROUTE_TIMEOUT  = 3 * UPDATE_PERIOD  # s, vecino sin noticias = vecino caído
+HOLDDOWN_TIME  = 2 * UPDATE_PERIOD  # s
+TRIGGER_DELAY  = 0.2   # s, agrupa cambios en un solo triggered update
+
+
+def infinity_for(graph: Dict[str, Dict[str, float]]) -> float:
+    """Costo "inalcanzable" para `graph`: DV_INFINITY o INFINITY_HOPS × el mayor peso."""
+    env = os.getenv("DV_INFINITY")
+    if env:
+        return float(env)
+    weights = [float(w) for neighs in graph.values() for w in neighs.values()]
+    return INFINITY_HOPS * max([1.0] + weights)
+
+
+class DistanceVectorRouterRedis:
+    def __init__(self, node_id: str, graph: Dict[str, Dict[str, float]],
+                 clock=None, transport_factory: Optional[Callable[..., Any]] = None,
+                 no_route_policy: Optional[str] = None):
+        if node_id not in NODE_TO_CHANNEL:
+            raise ValueError(f"Nodo '{node_id}' no está en NODE_TO_CHANNEL")
+
+        self.node_id = node_id
+        self.log = get_logger(node_id)
+        self.channel_local: str = NODE_TO_CHANNEL[node_id]
+        # reloj y transporte inyectables (netsim.py usa reloj virtual y enlaces simulados)
+        self.clock = clock or SYSTEM_CLOCK
+
+        # costo de enlace hacia cada vecino (pesos del topo.json)
+        self.link_cost: Dict[str, float] = {n: float(c) for n, c in graph.get(node_id, {}).items()}
+        self.infinity = infinity_for(graph)
+        # último vector recibido de cada vecino (y sus saltos por destino) y cuándo
+        self.neighbor_vectors: Dict[str, Dict[str, float]] = {}
+        self.neighbor_hops: Dict[str, Dict[str, int]] = {}
+        self.last_heard: Dict[str, float] = {}
+        self.dead_neighbors: Set[str] = set()
+        # tabla DV: destino -> (costo, next_hop)
+        self.table: Dict[str, Tuple[float, str]] = {}
+        # hold-down: destino -> (hasta, costo previo a la caída)
+        self.holddown: Dict[str, Tuple[float, float]] = {}
+
+        # la FIB se publica como snapshot inmutable (lecturas sin lock en forwarding)
+        self._state = RouterState(neighbors=self.link_cost.keys())
+        self._dv_lock = threading.Lock()  # serializa el plano de control DV
+        self._pending: Set[str] = set()   # destinos cambiados aún no anunciados
+        self.no_route_policy = no_route_policy or NO_ROUTE_POLICY
+        if self.no_route_policy not in NO_ROUTE_POLICIES:
+            raise ValueError(f"NO_ROUTE_POLICY inválida: {self.no_route_policy}")
+        self.pending = PendingQueue(now=self.clock.monotonic)  # paquetes de datos esperando ruta
+        self._drain_lock = threading.Lock()  # un solo drenado a la vez: conserva el orden por destino
+        self._flooded: Set[str] = set()   # ids ya inundados por la política "flood"
+        # tipos de datos extra (p.ej. reliable.py): se enrutan como "message"
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], None]] = {}
+        self.reassembler = Reassembler(now=self.clock.monotonic)
+        self.claims = ClaimCheck()
+
+        self.transport = (transport_factory or RedisTransport)(self.channel_local, self._on_packet)
+
+        self._stop = threading.Event()
+        self._t_update = None
+        self._t_trigger = None
+        self._trigger_armed = False
+
+        self.log.info("ctrl", "Iniciado (DV). Canal=%s Vecinos=%s", self.channel_local, self.neighbors)
+
+    def start(self) -> None:
+        with self._dv_lock:
+            # el reloj de ROUTE_TIMEOUT corre desde el arranque: un vecino que
+            # nunca manda su vector también vence y deja de usarse como next hop
+            now = self.clock.time()
+            for n in self.link_cost:
+                self.last_heard.setdefault(n, now)
+        self.transport.start()
+        metrics.serve()
+        self._emit_update()  # anuncia el vector inicial y programa el periódico
+        self.log.info("ctrl", "Escuchando en Redis... (Ctrl+C para salir)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        for t in (self._t_update, self._t_trigger):
+            if t:
+                t.cancel()
+        try:
+            self.transport.stop()
+        except Exception:
+            pass
+
+    # ---------- estado (solo lectura) ----------
+    @property
+    def state(self) -> RouterSnapshot:
+        return self._state.snapshot
+
+    @property
+    def neighbors(self) -> List[str]:
+        return list(self._state.snapshot.neighbors)
+
+    @property
+    def routing_table(self) -> List[Dict[str, Any]]:
+        return self._state.routing_table()
+
+    # ---------- timers ----------
+    def _schedule_update(self):
+        if self._stop.is_set(): return
+        self._t_update = self.clock.call_later(UPDATE_PERIOD, self._emit_update)
+
+    def _emit_update(self):
+        try:
+            with self._dv_lock:
+                changed = self._expire_neighbors()
+                changed |= self._recompute(set(self.table) | self._known_destinations())
+                self._pending.clear()
+                self._publish_fib()
+            self._send_vector(full=True)
+            if changed:
+                if self.log.enabled(DEBUG, "route"):  # routing_table copia la tabla entera
+                    self.log.debug("route", "Tabla DV: %s", self.routing_table)
+                self._drain_pending()
+            self.pending.expire()
+        finally:
+            self._schedule_update()
+
+    def _schedule_trigger(self):
+        # llamado con _dv_lock tomado
+        if self._stop.is_set() or self._trigger_armed:
+            return
+        self._trigger_armed = True
+        self._t_trigger = self.clock.call_later(TRIGGER_DELAY, self._emit_triggered)
+
+    def _emit_triggered(self):
+        with self._dv_lock:
+            self._trigger_armed = False
+            dests, self._pending = self._pending, set()
+        if dests:
+            self._send_vector(full=False, only=dests)
+
+    # ---------- Bellman-Ford incremental ----------
+    def _known_destinations(self) -> Set[str]:
+        dests: Set[str] = set(self.link_cost)
+        for vec in self.neighbor_vectors.values():
+            dests.update(vec)
+        dests.discard(self.node_id)
+        return dests
+
+    def _best_route(self, dest: str) -> Tuple[float, str]:
+        best_cost, best_nh = self.infinity, ""
+        for neigh, link in self.link_cost.items():
+            if neigh in self.dead_neighbors:
+                continue
+            if neigh == dest:
+                cost = link
+            else:
+                vec = self.neighbor_vectors.get(neigh)
+                if vec is None or dest not in vec:
+                    continue
+                cost = link + vec[dest]
+            if cost < best_cost or (cost == best_cost and best_nh and neigh < best_nh):
+                best_cost, best_nh = cost, neigh
+        return min(best_cost, self.infinity), best_nh
+
+    def _recompute(self, dests: Set[str]) -> bool:
+        """Recalcula solo `dests`; marca en _pending los que cambiaron. Requiere _dv_lock."""
+        now = self.clock.time()
+        changed = False
+        for dest in dests:
+            if dest == self.node_id:
+                continue
+            old_cost, old_nh = self.table.get(dest, (self.infinity, ""))
+            cost, nh = self._best_route(dest)
+
+            hold = self.holddown.get(dest)
+            if hold and now < hold[0] and cost >= hold[1] and cost < self.infinity:
+                # en hold-down: no aceptar rutas que no mejoren la que se perdió
+                cost, nh = self.infinity, ""
+            elif hold and (now >= hold[0] or cost < hold[1]):
+                del self.holddown[dest]
+
+            if cost >= self.infinity and old_cost < self.infinity and dest not in self.holddown:
+                self.holddown[dest] = (now + HOLDDOWN_TIME, old_cost)
+
+            if cost >= self.infinity and old_cost >= self.infinity:
+                # sigue inalcanzable: se olvida al terminar el hold-down
+                if dest not in self.holddown:
+                    self.table.pop(dest, None)
+                continue
+            if (cost, nh) != (old_cost, old_nh):
+                self.table[dest] = (cost, nh)
+                self._pending.add(dest)
+                changed = True
+        return changed
+
+    def _expire_neighbors(self) -> bool:
+        """Descarta vectores de vecinos que no se escuchan hace ROUTE_TIMEOUT. Requiere _dv_lock."""
+        now = self.clock.time()
+        dead = [n for n, ts in self.last_heard.items() if now - ts > ROUTE_TIMEOUT]
+        affected: Set[str] = set()
+        for n in dead:
+            self.log.warn("route", "⚠️ Vecino %s sin noticias, descartando su vector", n)
+            affected.update(self.neighbor_vectors.pop(n, {}))
+            self.neighbor_hops.pop(n, None)
+            del self.last_heard[n]
+            self.dead_neighbors.add(n)
+            affected.add(n)
+            affected.update(d for d, (_, nh) in self.table.items() if nh == n)
+        return self._recompute(affected) if affected else False
+
+    def _hops_via(self, dest: str, nh: str) -> Optional[int]:
+        """Saltos hasta `dest` por `nh` según lo que `nh` anunció; None si no lo sabemos."""
+        if nh == dest:
+            return 1
+        h = self.neighbor_hops.get(nh, {}).get(dest)
+        return None if h is None else h + 1
+
+    def _publish_fib(self) -> None:
+        # requiere _dv_lock; una sola escritura de referencia para el data path
+        table = []
+        for d, (c, nh) in sorted(self.table.items()):
+            if c >= self.infinity:
+                continue
+            entry = {"destino": d, "next_hop": nh, "costo": c}
+            hops = self._hops_via(d, nh)
+            if hops is not None:
+                entry["saltos"] = hops  # sin dato (vecino viejo): el TTL cae en DEFAULT_HOPS
+            table.append(entry)
+        self._state.update(lambda s: s.evolve(neighbors=self.link_cost.keys(), routing_table=table))
+
+    # ---------- envío de vectores ----------
+    def _vector_for(self, neigh: str, dests: Optional[Set[str]] = None) -> Dict[str, float]:
+        """Vector a anunciar a `neigh` con split horizon + poison reverse."""
+        items = self.table.items() if dests is None else (
+            (d, self.table.get(d, (self.infinity, ""))) for d in dests)
+        vec = {self.node_id: 0.0}
+        for dest, (cost, nh) in items:
+            vec[dest] = self.infinity if nh == neigh else cost
+        return vec
+
+    def _hop_vector(self, dests: Optional[Set[str]] = None) -> Dict[str, int]:
+        """Saltos de cada ruta anunciada; igual para todos los vecinos (las envenenadas no se usan)."""
+        hops = {self.node_id: 0}
+        for dest in (self.table if dests is None else dests):
+            cost, nh = self.table.get(dest, (self.infinity, ""))
+            h = self._hops_via(dest, nh) if cost < self.infinity else None
+            if h is not None:
+                hops[dest] = h
+        return hops
+
+    def _send_vector(self, full: bool, only: Optional[Set[str]] = None) -> None:
+        with self._dv_lock:
+            vectors = {n: self._vector_for(n, None if full else only) for n in self.link_cost}
+            hops = self._hop_vector(None if full else only)
+        for neigh, vec in vectors.items():
+            try:
+                ch = get_channel(neigh)
+                pkt = make_packet("info", self.channel_local, ch, hops=1, payload="")
+                pkt["vector"] = vec
+                pkt["saltos"] = hops
+                pkt["full"] = full
+                self.transport.publish(ch, pkt)
+                self.log.debug("info", "📤 Vector %s (%d entradas) → %s", "completo" if full else "parcial", len(vec) - 1, neigh)
+            except Exception as e:
+                self.log.error("info", "⚠️ Error enviando vector a %s: %s", neigh, e)
+
+    # ---------- recepción ----------
+    def _on_packet(self, packet: Dict[str, Any]) -> None:
+        packet = normalize_packet(packet)
+        if not validate_packet(packet):
+            return
+        if "trace" in packet:
+            hop_trace.on_receive(packet, self.node_id, self.clock)
+
+        if packet["type"] == "info":
+            self._handle_info(packet)
+        else:
+            # "message" y demás tipos de datos: en el destino decide el handler
+            self._handle_data_packet(packet)
+
+    def register_handler(self, p_type: str, fn: Callable[[Dict[str, Any]], None]) -> None:
+        """Entrega a `fn` los paquetes `p_type` dirigidos a este nodo."""
+        self.handlers[p_type] = fn
+
+    def set_link_cost(self, neighbor: str, cost: float) -> None:
+        """Cambia el costo del enlace hacia `neighbor` y anuncia lo que cambie (p.ej. faults.py)."""
+        with self._dv_lock:
+            self.link_cost[neighbor] = float(cost)
+            changed = self._recompute(set(self.table) | self._known_destinations())
+            if changed:
+                self._publish_fib()
+                self._schedule_trigger()
+        if changed:
+            self.log.info("route", "📏 Costo hacia %s → %s", neighbor, cost)
+            self._drain_pending()
+
+    def _handle_info(self, packet: Dict[str, Any]) -> None:
+        sender = channel_to_node(packet.get("from", ""))
+        vec = packet.get("vector")
+        if not sender or not isinstance(vec, dict):
+            return
+        try:
+            incoming = {str(d): min(float(c), self.infinity) for d, c in vec.items()}
+            incoming_hops = {str(d): int(h) for d, h in (packet.get("saltos") or {}).items()}
+        except (TypeError, ValueError, AttributeError):
+            return
+
+        with self._dv_lock:
+            if sender not in self.link_cost:
+                # vecino no configurado que nos habla: enlace de costo 1
+                self.link_cost[sender] = 1.0
+                self.log.info("info", "✨ Nuevo vecino descubierto: %s", sender)
+            self.last_heard[sender] = self.clock.time()
+
+            old = self.neighbor_vectors.get(sender, {})
+            new = dict(incoming) if packet.get("full") else {**old, **incoming}
+            self.neighbor_vectors[sender] = new
+            old_hops = self.neighbor_hops.get(sender, {})
+            new_hops = dict(incoming_hops) if packet.get("full") else {**old_hops, **incoming_hops}
+            self.neighbor_hops[sender] = new_hops
+
+            affected = {d for d in set(old) | set(new) if old.get(d) != new.get(d)}
+            if sender in self.dead_neighbors:
+                self.dead_neighbors.discard(sender)
+                affected.add(sender)
+            changed = self._recompute(affected)
+            if changed or new_hops != old_hops:
+                # un cambio solo de saltos no se reanuncia (llega con el refresco
+                # periódico), pero sí se publica para el TTL de los envíos locales
+                self._publish_fib()
+            if changed:
+                self._schedule_trigger()
+        if changed:
+            if self.log.enabled(DEBUG, "route"):
+                self.log.debug("route", "Tabla DV actualizada: %s", self.routing_table)
+            self._drain_pending()
+
+    def _handle_data_packet(self, packet: Dict[str, Any]) -> None:
+        if is_deliver_to_me(packet, self.channel_local):
+            if packet.get("flooded"):
+                # copias de la política "flood": solo se entrega la primera
+                pkt_id = get_packet_id(packet)
+                if pkt_id in self._flooded:
+                    DUPLICATES.labels(self.node_id, "flood").inc()
+                    return
+                self._flooded.add(pkt_id)
+            if "trace" in packet:
+                hop_trace.observe(self.node_id, packet["trace"])
+            if "frag" in packet:
+                packet = self.reassembler.add(packet)
+                if packet is None:
+                    return  # faltan fragmentos
+            if "claim" in packet:
+                packet = self.claims.resolve(self.transport, packet)
+                if packet is None:
+                    self.log.warn("data", "⚠️ Payload por referencia no encontrado (¿TTL vencido?)")
+                    return
+            handler = self.handlers.get(packet["type"])
+            if handler:
+                handler(packet)
+            else:
+                self.log.info("data", "✅ Mensaje entregado: %s", packet.get("payload"))
+            return
+
+        dst_node = channel_to_node(packet.get("to", ""))
+        if not dst_node:
+            self.log.warn("fwd", "Destino desconocido: %s", packet.get("to", ""))
+            return
+
+        self._route_or_hold(packet, dst_node)
+
+    # ---------- forwarding ----------
+    def _forward_packet(self, packet: Dict[str, Any], next_hop_node: str) -> None:
+        if dec_hops(packet) <= 0:
+            return
+        hop_trace.on_send(packet, self.clock)
+        self.transport.publish(get_channel(next_hop_node), packet)
+        self.log.debug("fwd", "Datos → %s", next_hop_node)
+
+    def _get_next_hop(self, destination_node: str) -> str:
+        return self._state.snapshot.fib.get(destination_node, "")
+
+    def _route_or_hold(self, packet: Dict[str, Any], dst_node: str) -> None:
+        """Reenvía si hay ruta; si no, aplica la política sin ruta. Mantiene el orden por destino."""
+        nh = self._get_next_hop(dst_node)
+        if nh and dst_node not in self.pending:
+            self._forward_packet(packet, nh)
+            return
+        if nh:
+            # todavía hay paquetes viejos en la cola: este va detrás de ellos
+            self.pending.push(dst_node, packet)
+            self._drain_pending()
+            return
+
+        if self.no_route_policy == "buffer":
+            if self.pending.push(dst_node, packet):
+                self.log.debug("queue", "⏸️ Sin ruta para %s, paquete en espera", dst_node)
+            else:
+                DROPS.labels(self.node_id, "queue_full").inc()
+                self.log.warn("queue", "Sin ruta para %s y cola llena, descartado", dst_node)
+        elif self.no_route_policy == "flood":
+            self._flood_no_route(packet)
+        else:
+            DROPS.labels(self.node_id, "no_route").inc()
+            self.log.warn("fwd", "Sin ruta para %s", dst_node)
+
+    def _flood_no_route(self, packet: Dict[str, Any]) -> None:
+        """Política "flood": a cada vecino vivo, una vez por paquete y gastando TTL."""
+        pkt_id = get_packet_id(packet)
+        if pkt_id in self._flooded:
+            DUPLICATES.labels(self.node_id, "flood").inc()
+            return  # la copia volvió por otro vecino sin ruta
+        self._flooded.add(pkt_id)
+        packet["flooded"] = True  # el destino descarta las otras copias
+        if dec_hops(packet) <= 0:
+            DROPS.labels(self.node_id, "ttl").inc()
+            return
+        with self._dv_lock:
+            neighbors = [n for n in self.link_cost if n not in self.dead_neighbors]
+        for neigh in neighbors:
+            hop_trace.on_send(packet, self.clock)
+            self.transport.publish(get_channel(neigh), packet)
+        self.log.debug("fwd", "(respaldo) mensaje por flooding → %s", neighbors)
+
+    def _drain_pending(self) -> None:
+        if not self.pending.destinations():
+            return
+        with self._drain_lock:
+            for dest in self.pending.destinations():
+                nh = self._get_next_hop(dest)
+                if nh:
+                    for pkt in self.pending.drain(dest):
+                        self._forward_packet(pkt, nh)
+
+    # ---------- API de envío ----------
+    def send(self, dst_node: str, payload: Any, hops: Optional[int] = None,
+             p_type: str = "message", extra: Optional[Dict[str, Any]] = None,
+             claim_check: bool = False, trace: Optional[bool] = None) -> None:
+        if hops is None:
+            # saltos del camino elegido por el DV (anunciados en los vectores) + margen
+            hops = ttl_for(self._state.snapshot.hop_counts, dst_node, fallback=DEFAULT_HOPS)
+        claim = None
+        if claim_check or self.claims.wants(payload):
+            claim, payload = self.claims.store(self.transport, payload), ""
+        pkt = make_packet(p_type, self.channel_local, get_channel(dst_node), hops=hops, payload=payload)
+        if extra:
+            pkt.update(extra)
+        if claim:
+            pkt["claim"] = claim
+        if trace or (trace is None and hop_trace.TRACE_ALL):
+            hop_trace.open_trace(pkt, self.node_id, self.clock)
+        for frag in fragment_packet(pkt):
+            if dst_node == BROADCAST:
+                self._broadcast(frag)
+            else:
+                self._route_or_hold(frag, dst_node)
+
+    def _broadcast(self, packet: Dict[str, Any]) -> None:
+        # "*" no tiene ruta en la FIB: a cada vecino vivo, que lo entrega sin reenviar
+        with self._dv_lock:
+            neighbors = [n for n in self.link_cost if n not in self.dead_neighbors]
+        for neigh in neighbors:
+            hop_trace.on_send(packet, self.clock)
+            self.transport.publish(get_channel(neigh), packet)
+        self.log.debug("fwd", "📡 Broadcast → %s", neighbors)
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Uso: python router_dv_redis.py <topo.json> <Nodo>")
+        sys.exit(1)
+
+    topo_path = sys.argv[1]
+    node = sys.argv[2]
+
+    try:
+        graph = load_topology(topo_path)
+    except Exception as e:
+        print(f"Error cargando topología '{topo_path}': {e}")
+        sys.exit(2)
+
+    router = DistanceVectorRouterRedis(node, graph)
+
+    try:
+        router.start()
+        if node == "A":
+            time.sleep(3.0)
+            router.send("D", "Hola desde A (DV+Redis)!")
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\nSaliendo...")
+    finally:
+        router.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,28 @@
 Router de Flooding usando Redis Pub/Sub como red.
 - Escucha su canal propio y reenvía paquetes a todos sus vecinos (según topo.json).
 - Evita duplicados con headers[0].id
-- Decrementa 'hops' y descarta al llegar a 0
+- Decrementa 'hops' y descarta al llegar a 0; el TTL inicial se calcula con
+  los saltos hasta el destino por el árbol de caminos más cortos (ponderado)
+  de topo.json (o su profundidad para broadcast) más TTL_MARGIN, en vez de
+  un 8 fijo
 - Entrega payload si el destino coincide con su canal o si el paquete es broadcast
+- Modos de reenvío (FLOOD_MODE o parámetro `mode`):
+    flood : a todos los vecinos salvo al que nos lo pasó (campo "via")
+    rpf   : reverse-path forwarding sobre el árbol de caminos más cortos del
+            origen (calculado desde topo.json); cada nodo recibe ~1 copia,
+            O(N) mensajes por broadcast en vez de O(E)
+    gossip: cada nodo reenvía con probabilidad GOSSIP_PROB a GOSSIP_FANOUT
+            vecinos al azar; con GOSSIP_ADAPTIVE=1 el fanout se ajusta según
+            la tasa de duplicados observada en el cache de vistos
+- Aprendizaje de destinos (FLOOD_LEARNING, activo por defecto): como un switch,
+  al recibir un paquete de X a través del vecino N se anota X -> (N, distancia)
+  con envejecimiento (LEARN_AGING s). Los paquetes unicast hacia X salen solo
+  por N; si no hay entrada o expiró se vuelve a inundar según el modo.
+- Payloads de más de FRAGMENT_SIZE caracteres salen en fragmentos que el
+  destino reensambla (ver fragment.py); con claim_check=True solo viaja una
+  referencia al payload guardado en Redis (ver claim_check.py).
+- Con send(..., trace=True) o TRACE=1 cada router anota (nodo, rx, tx) en
+  el paquete y el destino descompone la latencia por salto (ver hop_trace.py).
 
 Requisitos:
     pip install redis
@@ -17,113 +37,377 @@ Ejecución (ejemplo):
 """
 
 from __future__ import annotations
+import os
 import sys
 import json
 import time
-from typing import Dict, Set, Any, List
+import random
+from typing import Callable, Dict, Set, Any, List, Optional
 
 # Utilidades locales
 from redis_transport import RedisTransport
-from id_map import NODE_TO_CHANNEL, get_channel
-from packets import make_packet, validate_packet, normalize_packet, get_packet_id, dec_hops, is_deliver_to_me
+from id_map import NODE_TO_CHANNEL, get_channel, channel_to_node
+from packets import make_packet, validate_packet, normalize_packet, get_packet_id, dec_hops, is_deliver_to_me, BROADCAST, DEFAULT_HOPS
 
 # Reutilizamos el loader de topología 
-from dijkstra_rt import load_topology
+from dijkstra_rt import load_topology, shortest_path_tree, tree_hop_counts, ttl_for
+from fragment import Reassembler, fragment_packet
+from claim_check import ClaimCheck
+import hop_trace
+from router_log import get_logger
+from clock import SYSTEM_CLOCK
+import metrics
+from metrics import DROPS, DUPLICATES, HANDLE_SECONDS, QUEUE_DEPTH
+
+FLOOD_MODES = ("flood", "rpf", "gossip")
+
+GOSSIP_FANOUT   = int(os.getenv("GOSSIP_FANOUT", "2"))
+GOSSIP_PROB     = float(os.getenv("GOSSIP_PROB", "1.0"))
+GOSSIP_ADAPTIVE = os.getenv("GOSSIP_ADAPTIVE", "0") == "1"
+ADAPT_WINDOW    = 50          # recepciones entre ajustes del fanout
+DUP_RATE_HIGH   = 0.6         # demasiados duplicados: bajar fanout
+DUP_RATE_LOW    = 0.2         # casi sin duplicados: subir fanout (menos riesgo de pérdida)
+
+FLOOD_LEARNING  = os.getenv("FLOOD_LEARNING", "1") == "1"
+LEARN_AGING     = float(os.getenv("LEARN_AGING", "30"))  # s
+
+
+def estimate_gossip(graph: Dict[str, Dict[str, float]], source: str, fanout: int,
+                    forward_prob: float = 1.0, trials: int = 200,
+                    seed: Optional[int] = None) -> Dict[str, float]:
+    """
+    Estima sobre la topología cuánto entrega el gossip y cuánto cuesta, frente
+    al flooding simple: fracción media de nodos alcanzados, probabilidad de
+    alcanzar a todos y mensajes por broadcast.
+    """
+    rng = random.Random(seed)
+    nodes = len(graph)
+    reached_total, full, msgs_total = 0, 0, 0
+    for _ in range(trials):
+        seen = {source}
+        frontier = [(source, None)]
+        while frontier:
+            nxt = []
+            for u, came in frontier:
+                cands = [v for v in graph.get(u, {}) if v != came]
+                if u != source and rng.random() >= forward_prob:
+                    continue
+                for v in rng.sample(cands, min(fanout, len(cands))):
+                    msgs_total += 1
+                    if v not in seen:
+                        seen.add(v)
+                        nxt.append((v, u))
+            frontier = nxt
+        reached_total += len(seen)
+        full += len(seen) == nodes
+    flood_msgs = sum(len(n) for n in graph.values()) - (nodes - 1)
+    return {
+        "delivery_ratio": reached_total / (trials * nodes) if nodes else 0.0,
+        "full_delivery_prob": full / trials if trials else 0.0,
+        "msgs_per_broadcast": msgs_total / trials if trials else 0.0,
+        "flood_msgs_per_broadcast": float(flood_msgs),
+    }
 
 
 class FloodingRouterRedis:
-    def __init__(self, node_id: str, graph: Dict[str, Dict[str, float]]):
+    def __init__(self, node_id: str, graph: Dict[str, Dict[str, float]], mode: Optional[str] = None,
+                 fanout: Optional[int] = None, forward_prob: Optional[float] = None,
+                 adaptive: Optional[bool] = None, seed: Optional[int] = None,
+                 learning: Optional[bool] = None, clock=None,
+                 transport_factory: Optional[Callable[..., Any]] = None):
         if node_id not in NODE_TO_CHANNEL:
             raise ValueError(f"Nodo '{node_id}' no está en NODE_TO_CHANNEL")
 
         self.node_id = node_id
+        self.log = get_logger(node_id)
         self.channel_local: str = NODE_TO_CHANNEL[node_id]
+        # reloj y transporte inyectables (netsim.py usa reloj virtual y enlaces simulados)
+        self.clock = clock or SYSTEM_CLOCK
 
         # vecinos lógicos (claves del grafo para node_id)
+        self.graph = graph
         self.neighbors: List[str] = list(graph.get(node_id, {}).keys())
+        self._topo_hops: Optional[Dict[str, int]] = None   # perezoso (ver topo_hops)
 
         # control de duplicados
         self.seen: Set[str] = set()
 
+        # modo de reenvío y árboles RPF ya calculados: {origen: [mis hijos en su árbol]}
+        self.mode = "flood"
+        self.set_mode(mode or os.getenv("FLOOD_MODE", "flood"))
+        self._rpf_children: Dict[str, List[str]] = {}
+        self.stats: Dict[str, int] = {"forwarded": 0, "duplicates": 0, "delivered": 0, "received": 0,
+                                      "unicast": 0}
+
+        # aprendizaje de destinos: canal origen -> (vecino, distancia en saltos, visto_en)
+        self.learning = FLOOD_LEARNING if learning is None else bool(learning)
+        self.learned: Dict[str, Any] = {}
+
+        # gossip
+        self.fanout = GOSSIP_FANOUT if fanout is None else int(fanout)
+        self.forward_prob = GOSSIP_PROB if forward_prob is None else float(forward_prob)
+        self.adaptive = GOSSIP_ADAPTIVE if adaptive is None else bool(adaptive)
+        self._rng = random.Random(seed)
+        self._window = {"received": 0, "duplicates": 0}
+
+        # tipos de datos extra (p.ej. reliable.py): se entregan a su handler
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], None]] = {}
+        self.reassembler = Reassembler(now=self.clock.monotonic)
+        self.claims = ClaimCheck()
+        QUEUE_DEPTH.labels(node_id, "seen").set_function(lambda: len(self.seen))
+        QUEUE_DEPTH.labels(node_id, "reassembly").set_function(lambda: len(self.reassembler.pending()))
+
         # transporte redis (callback en _on_packet)
-        self.transport = RedisTransport(self.channel_local, self._on_packet)
+        self.transport = (transport_factory or RedisTransport)(self.channel_local, self._on_packet)
 
-        print(f"[{self.node_id}] Iniciado. Canal={self.channel_local} Vecinos={self.neighbors}")
+        self.log.info("ctrl", "Iniciado. Canal=%s Vecinos=%s", self.channel_local, self.neighbors)
 
     def start(self) -> None:
         self.transport.start()
-        print(f"[{self.node_id}] Escuchando en Redis... (Ctrl+C para salir)")
+        metrics.serve()
+        self.log.info("ctrl", "Escuchando en Redis... (Ctrl+C para salir)")
+
+    def register_handler(self, p_type: str, fn: Callable[[Dict[str, Any]], None]) -> None:
+        """Entrega a `fn` los paquetes `p_type` dirigidos a este nodo."""
+        self.handlers[p_type] = fn
+
+    def set_mode(self, mode: str) -> None:
+        if mode not in FLOOD_MODES:
+            raise ValueError(f"Modo '{mode}' inválido; opciones: {', '.join(FLOOD_MODES)}")
+        self.mode = mode
 
     # ======== Recepción ========
 
     def _on_packet(self, packet: Dict[str, Any]) -> None:
+        t0 = time.perf_counter()
         # Normalizamos y validamos
         packet = normalize_packet(packet)
         if not validate_packet(packet):
+            DROPS.labels(self.node_id, "malformed").inc()
             return  # ignorar malformados
+        if "trace" in packet:
+            hop_trace.on_receive(packet, self.node_id, self.clock)
+        self._handle(packet)
+        HANDLE_SECONDS.labels(self.node_id, packet["type"]).observe(time.perf_counter() - t0)
 
+    def _handle(self, packet: Dict[str, Any]) -> None:
         # Evitar loops/duplicados
         pkt_id = get_packet_id(packet)
-        if not pkt_id or pkt_id in self.seen:
+        if not pkt_id:
+            return
+        duplicate = pkt_id in self.seen
+        self._note_reception(duplicate)
+        if duplicate:
+            DUPLICATES.labels(self.node_id, "data").inc()
             return
         self.seen.add(pkt_id)
+        if self.learning:
+            self._learn(packet)
 
-        # ¿Es para mí (o broadcast)?
+        # ¿Es para mí (o broadcast)? El broadcast además se sigue propagando.
         if is_deliver_to_me(packet, self.channel_local):
-            pld = packet.get("payload", "")
-            print(f"[{self.node_id}] ✅ Mensaje recibido: {pld}")
-            return
+            self._deliver(packet)
+            if packet.get("to") != BROADCAST:
+                return
 
         # Forwarding: decrementar hops
         if dec_hops(packet) <= 0:
             # TTL/Hops agotado
+            DROPS.labels(self.node_id, "ttl").inc()
             return
 
         # Reenviar a todos los vecinos
         self._flood_forward(packet)
 
+    def _deliver(self, packet: Dict[str, Any]) -> None:
+        if "trace" in packet:
+            hop_trace.observe(self.node_id, packet["trace"])
+        if "frag" in packet:
+            # copia: el fragmento original se sigue propagando si es broadcast
+            packet = self.reassembler.add(dict(packet))
+            if packet is None:
+                return
+        if "claim" in packet:
+            packet = self.claims.resolve(self.transport, packet)
+            if packet is None:
+                DROPS.labels(self.node_id, "claim_missing").inc()
+                self.log.warn("data", "⚠️ Payload por referencia no encontrado (¿TTL vencido?)")
+                return
+        self.stats["delivered"] += 1
+        handler = self.handlers.get(packet["type"])
+        if handler and packet.get("to") != BROADCAST:
+            handler(packet)
+        else:
+            self.log.info("data", "✅ Mensaje recibido: %s", packet.get("payload", ""))
+
     def _flood_forward(self, packet: Dict[str, Any]) -> None:
-        for neigh in self.neighbors:
+        came_from = packet.get("via", "")
+        packet["via"] = self.channel_local
+        for neigh in self._forward_targets(packet, came_from):
             try:
                 ch = get_channel(neigh)
+                hop_trace.on_send(packet, self.clock)
                 self.transport.publish(ch, packet)
-                print(f"[{self.node_id}] ↪️ reenviando {get_packet_id(packet)} a {neigh} ({ch})")
+                self.stats["forwarded"] += 1
+                self.log.debug("fwd", "↪️ reenviando %s a %s (%s)", get_packet_id(packet), neigh, ch)
             except Exception as e:
-                print(f"[{self.node_id}] ⚠️ Error reenviando a {neigh}: {e}")
+                self.log.error("fwd", "⚠️ Error reenviando a %s: %s", neigh, e)
+
+    def _forward_targets(self, packet: Dict[str, Any], came_from: str = "") -> List[str]:
+        """Vecinos a los que se reenvía según el modo (nunca al que nos lo pasó)."""
+        dst = packet.get("to", "")
+        if self.learning and dst != BROADCAST:
+            nh = self._learned_next_hop(dst)
+            if nh and NODE_TO_CHANNEL.get(nh) != came_from:
+                self.stats["unicast"] += 1
+                return [nh]
+        if self.mode == "rpf":
+            source = channel_to_node(packet.get("from", ""))
+            if source in self.graph:
+                return self._rpf_targets(source)
+        candidates = [n for n in self.neighbors if not came_from or NODE_TO_CHANNEL.get(n) != came_from]
+        if self.mode == "gossip":
+            originated = packet.get("from") == self.channel_local
+            return self._gossip_targets(candidates, originated)
+        return candidates
+
+    # ======== Aprendizaje de destinos ========
+
+    def _learn(self, packet: Dict[str, Any]) -> None:
+        src = packet.get("from", "")
+        neigh = channel_to_node(packet.get("via", ""))
+        if not src or src == self.channel_local or neigh not in self.neighbors:
+            return
+        hops = int(packet.get("hops", 0))
+        # con "ttl0" (TTL inicial) la distancia es exacta; si no, menos hops restantes = más lejos
+        dist = int(packet["ttl0"]) - hops + 1 if "ttl0" in packet else -hops
+        now = self.clock.monotonic()
+        cur = self.learned.get(src)
+        if (cur is None or now - cur[2] > LEARN_AGING
+                or cur[0] == neigh or dist <= cur[1]):
+            self.learned[src] = (neigh, dist, now)
+
+    def _learned_next_hop(self, dst_channel: str) -> str:
+        entry = self.learned.get(dst_channel)
+        if entry is None:
+            return ""
+        if self.clock.monotonic() - entry[2] > LEARN_AGING:
+            del self.learned[dst_channel]  # expiró: de vuelta a inundar
+            return ""
+        return entry[0]
+
+    def _gossip_targets(self, candidates: List[str], originated: bool) -> List[str]:
+        # el origen siempre emite; los demás reenvían con probabilidad forward_prob
+        if not originated and self._rng.random() >= self.forward_prob:
+            return []
+        return self._rng.sample(candidates, min(max(self.fanout, 1), len(candidates)))
+
+    def _note_reception(self, duplicate: bool) -> None:
+        self.stats["received"] += 1
+        if duplicate:
+            self.stats["duplicates"] += 1
+        if not (self.adaptive and self.mode == "gossip"):
+            return
+        w = self._window
+        w["received"] += 1
+        w["duplicates"] += duplicate
+        if w["received"] < ADAPT_WINDOW:
+            return
+        rate = w["duplicates"] / w["received"]
+        if rate > DUP_RATE_HIGH and self.fanout > 1:
+            self.fanout -= 1
+        elif rate < DUP_RATE_LOW and self.fanout < len(self.neighbors):
+            self.fanout += 1
+        w["received"] = w["duplicates"] = 0
+        self.log.info("gossip", "🎲 gossip: tasa de duplicados %.2f → fanout %d", rate, self.fanout)
+
+    def gossip_report(self, trials: int = 200) -> Dict[str, float]:
+        """Entrega estimada vs costo del gossip con los parámetros actuales, con este nodo como origen."""
+        report = estimate_gossip(self.graph, self.node_id, self.fanout, self.forward_prob, trials)
+        received = self.stats["received"]
+        report["observed_dup_rate"] = self.stats["duplicates"] / received if received else 0.0
+        return report
+
+    @property
+    def topo_hops(self) -> Dict[str, int]:
+        """
+        Saltos por mi árbol de caminos más cortos en topo.json (TTL de paquetes
+        nuevos); se calcula al primer envío. Es el árbol que recorre rpf, y con
+        retardo proporcional al costo también la primera copia en flood: la que
+        llega por menos saltos pero más tarde muere en el cache de vistos.
+        """
+        if self._topo_hops is None:
+            self._topo_hops = tree_hop_counts(self.graph, self.node_id)
+        return self._topo_hops
+
+    def _rpf_targets(self, source: str) -> List[str]:
+        """Mis hijos en el árbol de caminos más cortos con raíz en `source`."""
+        children = self._rpf_children.get(source)
+        if children is None:
+            parent = shortest_path_tree(self.graph, source)
+            children = [n for n in self.neighbors if parent.get(n) == self.node_id]
+            self._rpf_children[source] = children
+        return children
 
     # ======== Envío inicial ========
 
-    def send(self, dst_node: str, payload: str, hops: int = 8) -> None:
+    def send(self, dst_node: str, payload: Any, hops: Optional[int] = None,
+             p_type: str = "message", extra: Optional[Dict[str, Any]] = None,
+             claim_check: bool = False, trace: Optional[bool] = None) -> None:
         """Envía un paquete inicial hacia dst_node (flooding a todos los vecinos)."""
         try:
             dst_channel = get_channel(dst_node)
         except Exception as e:
-            print(f"[{self.node_id}] Error: {e}")
+            self.log.error("ctrl", "Error: %s", e)
             return
 
-        pkt = make_packet("message", self.channel_local, dst_channel, hops=hops, payload=payload)
+        if hops is None:
+            hops = ttl_for(self.topo_hops, dst_node, fallback=DEFAULT_HOPS)
+            entry = self.learned.get(dst_channel) if self.learning else None
+            if entry and entry[1] > 0:
+                # unicast por lo aprendido: ese camino puede ser más largo que el árbol
+                hops = max(hops, ttl_for({dst_node: entry[1]}, dst_node))
+        claim = None
+        if claim_check or self.claims.wants(payload):
+            claim, payload = self.claims.store(self.transport, payload), ""
+        pkt = make_packet(p_type, self.channel_local, dst_channel, hops=hops, payload=payload)
+        if extra:
+            pkt.update(extra)
+        if claim:
+            pkt["claim"] = claim
+        pkt["via"] = self.channel_local
+        pkt["ttl0"] = int(hops)
+        if trace or (trace is None and hop_trace.TRACE_ALL):
+            hop_trace.open_trace(pkt, self.node_id, self.clock)
+        for frag in fragment_packet(pkt):
+            self._originate(frag)
+
+    def _originate(self, pkt: Dict[str, Any]) -> None:
         # Marca este paquete como visto para que no se vuelva a reenviar
         pkt_id = get_packet_id(pkt)
         if pkt_id:
             self.seen.add(pkt_id)
 
-        # Inunda a todos los vecinos
-        for neigh in self.neighbors:
+        # Inunda a los vecinos (todos, o mis hijos en mi propio árbol si el modo es rpf)
+        for neigh in self._forward_targets(pkt):
             try:
                 ch = get_channel(neigh)
+                hop_trace.on_send(pkt, self.clock)
                 self.transport.publish(ch, pkt)
-                print(f"[{self.node_id}] 🚀 enviando inicial a {neigh} ({ch})")
+                self.stats["forwarded"] += 1
+                self.log.debug("fwd", "🚀 enviando inicial a %s (%s)", neigh, ch)
             except Exception as e:
-                print(f"[{self.node_id}] ⚠️ No pude publicar a {neigh}: {e}")
+                self.log.error("fwd", "⚠️ No pude publicar a %s: %s", neigh, e)
 
 
 def main():
     if len(sys.argv) < 3:
-        print("Uso: python router_flooding_redis.py <topo.json> <Nodo>")
+        print("Uso: python router_flooding_redis.py <topo.json> <Nodo> [flood|rpf|gossip]")
         sys.exit(1)
 
     topo_path = sys.argv[1]
     node = sys.argv[2]
+    mode = sys.argv[3] if len(sys.argv) > 3 else None
 
     try:
         graph = load_topology(topo_path)
@@ -131,7 +415,7 @@ def main():
         print(f"Error cargando topología '{topo_path}': {e}")
         sys.exit(2)
 
-    router = FloodingRouterRedis(node, graph)
+    router = FloodingRouterRedis(node, graph, mode=mode)
 
     try:
         router.start()
@@ -139,7 +423,7 @@ def main():
         # prueba rápida automática desde A:
         if node == "A":
             time.sleep(1.5)
-            router.send("D", "Hola desde A con Flooding+Redis!", hops=6)
+            router.send("D", "Hola desde A con Flooding+Redis!")
 
         # Mantener vivo el proceso; se puede leer el input si se desea
         while True:
@@ -0,0 +1,215 @@
+# router_log.py
+"""
+Logging asíncrono, por niveles y con muestreo/límite por categoría.
+
+Los routers ya no hacen print() en el hilo que escucha Redis: cada línea va
+a una cola acotada que vacía un hilo escritor. Si la cola está llena la
+línea se descarta (nunca se bloquea el forwarding) y se cuenta; el escritor
+avisa cada tanto cuántas se perdieron.
+
+Niveles: debug < info < warn < error. Cada llamada lleva una categoría
+("pkt", "fwd", "lsp", "hello", "route", "data", ...) que permite:
+- nivel propio por categoría (set_level("debug", "lsp")),
+- muestreo (LOG_SAMPLE="fwd=0.01,pkt=0.1": fracción de líneas que pasan),
+- límite de líneas/s por nodo y categoría (LOG_RATE, token bucket).
+
+El formateo ("%s" con args) se hace en el hilo escritor, así que una línea
+filtrada no cuesta más que una comparación.
+
+    log = get_logger("A")
+    log.debug("fwd", "Dados → %s", next_hop)
+
+ENV: LOG_LEVEL (debug|info|warn|error|off), LOG_SAMPLE, LOG_RATE, LOG_QUEUE
+"""
+from __future__ import annotations
+import atexit
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from metrics import counter
+
+LEVELS = {"debug": 10, "info": 20, "warn": 30, "error": 40, "off": 100}
+DEBUG, INFO, WARN, ERROR = 10, 20, 30, 40
+
+LOG_LEVEL  = os.getenv("LOG_LEVEL", "info")
+LOG_RATE   = float(os.getenv("LOG_RATE", "50"))      # líneas/s por nodo y categoría (0 = sin límite)
+LOG_QUEUE  = int(os.getenv("LOG_QUEUE", "10000"))
+LOG_SAMPLE = os.getenv("LOG_SAMPLE", "")             # "cat=p,cat=p"
+DROP_REPORT_PERIOD = 5.0   # s
+
+LOG_DROPS = counter("lab3_log_dropped_total", "Líneas de log descartadas (límite de tasa o cola llena)", ("reason",))
+
+
+def _parse_sample(spec: str) -> Dict[str, float]:
+    out = {}
+    for part in spec.split(","):
+        if "=" in part:
+            cat, p = part.split("=", 1)
+            try:
+                out[cat.strip()] = max(0.0, min(1.0, float(p)))
+            except ValueError:
+                pass
+    return out
+
+
+class _Config:
+    def __init__(self):
+        self.level = LEVELS.get(LOG_LEVEL.lower(), INFO)
+        self.categories: Dict[str, int] = {}
+        self.sample = _parse_sample(LOG_SAMPLE)
+        self.rate = LOG_RATE
+        self.buckets: Dict[Tuple[str, str], list] = {}   # (nodo, categoría) -> [tokens, último]
+        self.dropped = {"rate": 0, "queue": 0}
+
+
+_cfg = _Config()
+_queue: "queue.Queue[Optional[Tuple[str, int, str, str, tuple]]]" = queue.Queue(maxsize=LOG_QUEUE)
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+_dropped_lock = threading.Lock()   # _cfg.dropped lo incrementan los hilos de todos los nodos
+_LEVEL_TAG = {DEBUG: "DBG ", INFO: "", WARN: "", ERROR: ""}
+
+
+def set_level(level: str, category: Optional[str] = None) -> None:
+    """Cambia el nivel global o el de una categoría (en caliente, desde la CLI)."""
+    value = LEVELS[level.lower()]
+    if category:
+        _cfg.categories[category] = value
+    else:
+        _cfg.level = value
+        _cfg.categories.clear()
+
+
+def get_level(category: Optional[str] = None) -> str:
+    value = _cfg.categories.get(category, _cfg.level) if category else _cfg.level
+    return next(name for name, v in LEVELS.items() if v == value)
+
+
+def set_sample(category: str, fraction: float) -> None:
+    _cfg.sample[category] = max(0.0, min(1.0, fraction))
+
+
+def dropped() -> Dict[str, int]:
+    with _dropped_lock:
+        return dict(_cfg.dropped)
+
+
+def _count_drop(reason: str) -> None:
+    with _dropped_lock:
+        _cfg.dropped[reason] += 1
+    LOG_DROPS.labels(reason).inc()
+
+
+def _start_writer() -> None:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, name="router-log", daemon=True)
+            _writer.start()
+            atexit.register(_flush_at_exit)
+
+
+def _write_loop() -> None:
+    out = sys.stdout
+    reported = dict(_cfg.dropped)
+    last_report = time.monotonic()
+    while True:
+        try:
+            item = _queue.get(timeout=1.0)
+        except queue.Empty:
+            item = False
+        if item is None:
+            break
+        if item:
+            node, level, cat, msg, args = item
+            try:
+                text = msg % args if args else msg
+            except (TypeError, ValueError):
+                text = f"{msg} {args}"
+            out.write(f"[{node}] {_LEVEL_TAG.get(level, '')}{text}\n")
+        now = time.monotonic()
+        if now - last_report >= DROP_REPORT_PERIOD:
+            lost = {k: v - reported[k] for k, v in _cfg.dropped.items() if v > reported[k]}
+            if lost:
+                out.write(f"[log] ⚠️ líneas omitidas: {lost}\n")
+                reported = dict(_cfg.dropped)
+            last_report = now
+        if _queue.empty():
+            out.flush()
+
+
+def _flush_at_exit() -> None:
+    try:
+        _queue.put_nowait(None)
+    except queue.Full:
+        return
+    if _writer is not None:
+        _writer.join(timeout=1.0)
+
+
+class Logger:
+    __slots__ = ("node", "_lock")
+
+    def __init__(self, node: str):
+        self.node = node
+        # los buckets de LOG_RATE de este nodo: los usan el listener y los timers a la vez
+        self._lock = threading.Lock()
+        _start_writer()
+
+    def enabled(self, level: int, category: str) -> bool:
+        return level >= _cfg.categories.get(category, _cfg.level)
+
+    def debug(self, category: str, msg: str, *args: Any) -> None:
+        self._log(DEBUG, category, msg, args)
+
+    def info(self, category: str, msg: str, *args: Any) -> None:
+        self._log(INFO, category, msg, args)
+
+    def warn(self, category: str, msg: str, *args: Any) -> None:
+        self._log(WARN, category, msg, args)
+
+    def error(self, category: str, msg: str, *args: Any) -> None:
+        self._log(ERROR, category, msg, args)
+
+    def _log(self, level: int, category: str, msg: str, args: tuple) -> None:
+        if level < _cfg.categories.get(category, _cfg.level):
+            return
+        p = _cfg.sample.get(category)
+        if p is not None and random.random() >= p:
+            return
+        if _cfg.rate > 0 and level < ERROR and not self._take_token(category):
+            _count_drop("rate")
+            return
+        try:
+            _queue.put_nowait((self.node, level, category, msg, args))
+        except queue.Full:
+            _count_drop("queue")
+
+    def _take_token(self, category: str) -> bool:
+        key = (self.node, category)
+        with self._lock:
+            now = time.monotonic()
+            bucket = _cfg.buckets.get(key)
+            if bucket is None:
+                bucket = _cfg.buckets[key] = [_cfg.rate, now]
+            bucket[0] = min(_cfg.rate, bucket[0] + (now - bucket[1]) * _cfg.rate)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                return False
+            bucket[0] -= 1.0
+            return True
+
+
+_loggers: Dict[str, Logger] = {}
+
+
+def get_logger(node: str) -> Logger:
+    logger = _loggers.get(node)
+    if logger is None:
+        logger = _loggers.setdefault(node, Logger(node))
+    return logger
@@ -1,102 +1,336 @@
 # router_lsr_redis.py
 """
 Router de Link State Routing (LSR) usando Redis Pub/Sub.
-- Descobre vizinhos com HELLO (periódico)
-- Inunda LSPs com sua vizinhança (periódico)
+- Descobre vizinhos com HELLO (periódico); um vizinho que não responde
+  DEAD_HELLOS HELLOs seguidos é dado como caído: sai do LSP e do SPF (e seu
+  RTT medido é esquecido) até voltar a responder
+- Inunda LSPs com sua vizinhança (periódico); o custo de cada enlace vem do
+  RTT medido com HELLO/HELLO_ACK (EWMA + histerese, ver link_cost.py)
 - Monta LSDB, calcula tabela com Dijkstra, faz forwarding por next-hop
+- Áreas opcionais (chave "areas" no topo.json): LSPs só inundam dentro da
+  área; os ABRs trocam resumos ("summary") entre áreas e os injetam no seu LSP
+- Rota de origem estrita: um pacote com cabeçalho "route" (lista de nós
+  ainda por percorrer) vai para route[0], sem consultar a FIB. A origem monta
+  a rota pela árvore SPF (cache por destino, SOURCE_ROUTE=1 ou
+  send(..., source_route=True)) ou recebe um caminho fixo (p.ex. um de
+  paths_to(dst, k), k caminhos mais curtos)
+- Sem rota para o destino: o pacote espera numa fila por destino
+  (pending_queue.py) e sai em ordem assim que o SPF instala a rota. Política
+  configurável em NO_ROUTE_POLICY: buffer (padrão) | flood | drop
 
 Uso:
   python router_lsr_redis.py topo.json A
 ENV:
   REDIS_HOST, REDIS_PORT, REDIS_PWD, SECTION, GROUP, NAMES_FILE
+  LSDB_CHECKPOINT, LSP_SEQ_BLOCK (checkpoint p/ warm restart, ver lsdb_checkpoint.py)
+  NO_ROUTE_POLICY, PENDING_MAX_BYTES, PENDING_TTL, SOURCE_ROUTE
+  METRICS_PORT (exportador Prometheus, ver metrics.py)
+  TRACE (traza por salto en todos os envios, ver hop_trace.py)
+  LOG_LEVEL, LOG_SAMPLE, LOG_RATE, LOG_QUEUE (ver router_log.py)
+  FRAGMENT_SIZE, REASSEMBLY_MAX_BYTES, REASSEMBLY_TIMEOUT (ver fragment.py)
+  CLAIM_CHECK_TTL, CLAIM_CHECK_MIN_BYTES, CLAIM_CACHE_BYTES (ver claim_check.py)
 """
 from __future__ import annotations
+import os
 import sys
 import time
-from typing import Dict, Set, Any, List
+from typing import Callable, Dict, Set, Any, List, Optional, Sequence, Tuple, Union
 import threading
 
 from redis_transport import RedisTransport
 from id_map import NODE_TO_CHANNEL, get_channel, channel_to_node
-from packets import make_packet, validate_packet, normalize_packet, get_packet_id, dec_hops, is_deliver_to_me
-from dijkstra_rt import load_topology, routing_table_for
+from packets import make_packet, validate_packet, normalize_packet, get_packet_id, dec_hops, is_deliver_to_me, DEFAULT_HOPS
+from dijkstra_rt import (load_topology, load_areas, routing_table_for, ttl_for, shortest_path_tree,
+                         k_shortest_paths, DEFAULT_AREA)
+from router_state import RouterState, RouterSnapshot
+from lsdb_checkpoint import LSDBCheckpoint, CHECKPOINT_PERIOD, checkpoint_path_for
+from link_cost import LinkCostEstimator
+from clock import SYSTEM_CLOCK
+from pending_queue import PendingQueue, NO_ROUTE_POLICIES, NO_ROUTE_POLICY
+from fragment import Reassembler, fragment_packet
+from claim_check import ClaimCheck
+import hop_trace
+from router_log import get_logger, DEBUG
+import metrics
+from metrics import DROPS, DUPLICATES, HANDLE_SECONDS, SPF_SECONDS, QUEUE_DEPTH
 
 HELLO_PERIOD = 5.0   # s
+DEAD_HELLOS  = 4     # HELLOs seguidos sem HELLO_ACK = vizinho caído (dead interval do OSPF)
 LSP_PERIOD   = 7.5   # s
+WARM_LSP_DELAY = 0.5 # s, primeiro LSP após um warm restart
+LSP_TRIGGER_DELAY = 0.5  # s, LSP antecipado quando um custo medido muda
+BORDER_TIMEOUT = 3 * LSP_PERIOD  # s, validade de um resumo recebido de outra área
+SUMMARY_MAX_COST = 64.0          # resumos acima disso são "infinito" (evita contagem ao infinito)
+
+SOURCE_ROUTE = os.getenv("SOURCE_ROUTE", "0") == "1"   # rota de origem em todos os envios
+
+# números de sequência reservados no checkpoint de uma vez: o arquivo guarda o
+# fim do bloco ANTES de usá-lo, então um reinício nunca reutiliza um id que os
+# vizinhos já viram, por mais LSPs antecipados que saiam entre dois checkpoints
+SEQ_BLOCK = int(os.getenv("LSP_SEQ_BLOCK", "32"))
+
+
+def lsp_sequence(packet: Dict[str, Any]) -> int:
+    """Número de sequência de um LSP (campo 'seq' ou sufixo de 'LSP-<nó>-<seq>')."""
+    if "seq" in packet:
+        try:
+            return int(packet["seq"])
+        except (TypeError, ValueError):
+            return -1
+    try:
+        return int(get_packet_id(packet).rsplit("-", 1)[1])
+    except (IndexError, ValueError):
+        return -1
 
 class LinkStateRouterRedis:
-    def __init__(self, node_id: str, graph: Dict[str, Dict[str, float]]):
+    def __init__(self, node_id: str, graph: Dict[str, Dict[str, float]],
+                 checkpoint_path: Optional[str] = None,
+                 areas: Optional[Dict[str, str]] = None,
+                 no_route_policy: Optional[str] = None,
+                 clock=None, transport_factory: Optional[Callable[..., Any]] = None):
         if node_id not in NODE_TO_CHANNEL:
             raise ValueError(f"Nodo '{node_id}' não está em NODE_TO_CHANNEL")
 
         self.node_id = node_id
+        self.log = get_logger(node_id)
         self.channel_local: str = NODE_TO_CHANNEL[node_id]
-        self.neighbors: List[str] = list(graph.get(node_id, {}).keys())  # IDs dos vizinhos
+        # relógio e transporte injetáveis (netsim.py usa relógio virtual e enlaces simulados)
+        self.clock = clock or SYSTEM_CLOCK
 
-        self.lsdb: Dict[str, Dict[str, Any]] = {}
+        # LSDB, vizinhos e FIB vivem num snapshot imutável (copy-on-write):
+        # o listener e os timers publicam snapshots novos, o forwarding só lê.
+        self._state = RouterState(neighbors=graph.get(node_id, {}).keys())
         self.sequence_number = 0
+        self._seq_reserved = 0   # primeiro número fora do bloco salvo no checkpoint
         self.seen_lsp_ids: Set[str] = set()
-        self.routing_table: List[Dict[str, Any]] = []
-
-        self.transport = RedisTransport(self.channel_local, self._on_packet)
+        self._lsp_lock = threading.Lock()
+
+        # custos de enlace: pesos do topo.json até chegarem medições de RTT
+        self.link_costs = LinkCostEstimator(graph.get(node_id, {}))
+        # HELLOs sem resposta por vizinho; os caídos continuam recebendo HELLO para voltar
+        self._hello_lock = threading.Lock()
+        self._missed_hellos: Dict[str, int] = {}
+        self._down_neighbors: Set[str] = set()
+
+        # pacotes à espera de rota (store-and-forward)
+        self.no_route_policy = no_route_policy or NO_ROUTE_POLICY
+        if self.no_route_policy not in NO_ROUTE_POLICIES:
+            raise ValueError(f"NO_ROUTE_POLICY inválida: {self.no_route_policy}")
+        self.pending = PendingQueue(now=self.clock.monotonic)
+        self._drain_lock = threading.Lock()
+        self._flooded: Set[str] = set()   # ids já inundados pela política "flood"
+
+        # tipos de dados extra (p.ex. reliable.py): roteados como "message" e
+        # entregues ao handler registrado quando chegam ao destino
+        self.handlers: Dict[str, Callable[[Dict[str, Any]], None]] = {}
+        self.reassembler = Reassembler(now=self.clock.monotonic)
+
+        # rotas de origem: árvore SPF e caminhos já montados, válidos para uma versão do snapshot
+        self.source_route = SOURCE_ROUTE
+        self._path_cache: Any = (-1, {}, {})
+
+        # profundidades de filas: calculadas na hora do scrape, nada no data path
+        QUEUE_DEPTH.labels(node_id, "pending").set_function(lambda: sum(n for n, _ in self.pending.depth().values()))
+        QUEUE_DEPTH.labels(node_id, "pending_bytes").set_function(lambda: sum(b for _, b in self.pending.depth().values()))
+        QUEUE_DEPTH.labels(node_id, "reassembly").set_function(lambda: len(self.reassembler.pending()))
+        QUEUE_DEPTH.labels(node_id, "lsdb").set_function(lambda: len(self._state.snapshot.lsdb))
+        self.claims = ClaimCheck()
+
+        # áreas: sem "areas" no topo.json todos ficam na DEFAULT_AREA (rede plana)
+        self.areas: Dict[str, str] = dict(areas or {})
+        self.area: str = self.areas.get(node_id, DEFAULT_AREA)
+        # resumos recebidos de vizinhos de outra área: {vizinho: (recebido_em, {destino: custo})}
+        self._border_routes: Dict[str, Any] = {}
+
+        self.transport = (transport_factory or RedisTransport)(self.channel_local, self._on_packet)
 
         self._stop = threading.Event()
         self._t_hello = None
         self._t_lsp = None
+        self._t_checkpoint = None
 
-        print(f"[{self.node_id}] Iniciado. Canal={self.channel_local} Vizinhos={self.neighbors}")
+        # checkpoint_path="" desliga o checkpoint (None = LSDB_CHECKPOINT / padrão)
+        path = checkpoint_path_for(node_id) if checkpoint_path is None else checkpoint_path
+        self._checkpoint = LSDBCheckpoint(path, node_id) if path else None
+        self.warm_restart = self._restore_checkpoint()
+
+        self.log.info("ctrl", "Iniciado. Canal=%s Vizinhos=%s", self.channel_local, self.neighbors)
 
     def start(self) -> None:
         self.transport.start()
+        metrics.serve()
         self._schedule_hello()
-        self._schedule_lsp()
-        print(f"[{self.node_id}] Escutando em Redis... (Ctrl+C para sair)")
+        # warm restart: anuncia o novo seq logo, sem esperar um LSP_PERIOD inteiro
+        self._schedule_lsp(WARM_LSP_DELAY if self.warm_restart else LSP_PERIOD)
+        self._schedule_checkpoint()
+        self.log.info("ctrl", "Escutando em Redis... (Ctrl+C para sair)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        for t in (self._t_hello, self._t_lsp, self._t_checkpoint):
+            if t:
+                t.cancel()
+        self._save_checkpoint()
+        try:
+            self.transport.stop()
+        except Exception:
+            pass
+
+    # ---------- estado (somente leitura) ----------
+    @property
+    def state(self) -> RouterSnapshot:
+        return self._state.snapshot
+
+    @property
+    def neighbors(self) -> List[str]:
+        return list(self._state.snapshot.neighbors)
+
+    @property
+    def lsdb(self) -> Dict[str, Dict[str, Any]]:
+        return {n: {"seq": rec.get("seq", -1), "neighbors": dict(rec.get("neighbors", {}))}
+                for n, rec in self._state.snapshot.lsdb.items()}
+
+    @property
+    def routing_table(self) -> List[Dict[str, Any]]:
+        return self._state.routing_table()
+
+    @property
+    def is_abr(self) -> bool:
+        return bool(self._inter_area_neighbors(self._state.snapshot))
+
+    def _area_of(self, node: str) -> str:
+        return self.areas.get(node, DEFAULT_AREA)
+
+    def _intra_area_neighbors(self, snap: RouterSnapshot) -> List[str]:
+        return [n for n in snap.neighbors if self._area_of(n) == self.area]
+
+    def _inter_area_neighbors(self, snap: RouterSnapshot) -> List[str]:
+        return [n for n in snap.neighbors if self._area_of(n) != self.area]
+
+    def _learn_area(self, node: str, packet: Dict[str, Any]) -> None:
+        if node and "area" in packet:
+            self.areas[node] = str(packet["area"])
+
+    def _add_neighbor(self, node: str) -> bool:
+        _, changed = self._state.update(lambda s: s.with_neighbor(node))
+        if changed:
+            with self._hello_lock:
+                revived = node in self._down_neighbors
+                self._down_neighbors.discard(node)
+            if revived:
+                # enlace de volta: anuncia já, sem esperar o LSP periódico
+                self.log.info("hello", "🔌 Vizinho %s voltou a responder", node)
+                self._calculate_routing_table()
+                self._trigger_lsp()
+        return changed
+
+    def _expire_neighbors(self) -> None:
+        """Tira do snapshot os vizinhos com DEAD_HELLOS HELLOs sem HELLO_ACK e reanuncia."""
+        with self._hello_lock:
+            dead = [n for n, missed in self._missed_hellos.items() if missed >= DEAD_HELLOS]
+            for n in dead:
+                del self._missed_hellos[n]
+                self._down_neighbors.add(n)
+        if not dead:
+            return
+        for n in dead:
+            self.link_costs.forget(n)   # ao voltar, recomeça do peso configurado
+            self._state.update(lambda s, n=n: s.without_neighbor(n))
+            self.log.warn("hello", "⚠️ Vizinho %s sem HELLO_ACK há %d HELLOs: enlace retirado", n, DEAD_HELLOS)
+        self._calculate_routing_table()
+        self._trigger_lsp()
 
     # ---------- timers ----------
     def _schedule_hello(self):
         if self._stop.is_set(): return
-        self._t_hello = threading.Timer(HELLO_PERIOD, self._emit_hello)
-        self._t_hello.daemon = True
-        self._t_hello.start()
+        self._t_hello = self.clock.call_later(HELLO_PERIOD, self._emit_hello)
 
-    def _schedule_lsp(self):
+    def _schedule_lsp(self, delay: float = LSP_PERIOD):
         if self._stop.is_set(): return
-        self._t_lsp = threading.Timer(LSP_PERIOD, self._emit_lsp)
-        self._t_lsp.daemon = True
-        self._t_lsp.start()
+        self._t_lsp = self.clock.call_later(delay, self._emit_lsp)
+
+    def _schedule_checkpoint(self):
+        if self._stop.is_set() or not self._checkpoint: return
+        self._t_checkpoint = self.clock.call_later(CHECKPOINT_PERIOD, self._emit_checkpoint)
+
+    def _emit_checkpoint(self):
+        try:
+            self._save_checkpoint()
+        finally:
+            self._schedule_checkpoint()
 
     def _emit_hello(self):
         try:
-            print(f"[{self.node_id}] 📡 Enviando HELLO a vecinos: {self.neighbors}")
-            for neigh in self.neighbors:
+            expired = self.pending.expire()
+            if expired:
+                self.log.warn("queue", "⌛ %d pacote(s) expiraram sem rota", expired)
+            self._expire_neighbors()
+            snap = self._state.snapshot
+            with self._hello_lock:
+                for n in snap.neighbors:
+                    self._missed_hellos[n] = self._missed_hellos.get(n, 0) + 1
+                neighbors = list(snap.neighbors) + sorted(self._down_neighbors - set(snap.neighbors))
+            self.log.debug("hello", "📡 Enviando HELLO a vecinos: %s", neighbors)
+            for neigh in neighbors:
                 ch = get_channel(neigh)
                 pkt = make_packet("hello", self.channel_local, ch, hops=1, payload="HELLO")
+                pkt["area"] = self.area
+                pkt["ts"] = self.clock.time() * 1000.0
                 self.transport.publish(ch, pkt)
-                print(f"[{self.node_id}] 📤 HELLO → {neigh} ({ch})")
+                self.log.debug("hello", "📤 HELLO → %s (%s)", neigh, ch)
         finally:
             self._schedule_hello()
 
     def _emit_lsp(self):
         try:
-            # LSP com a vizinhança do MEU nó (IDs)
-            neighbors_costs = {n: 1 for n in self.neighbors}
-            lsp = make_packet("lsp", self.channel_local, "*", hops=8,
-                              headers=[{"id": f"LSP-{self.node_id}-{self.sequence_number}"}],
-                              payload="")
-            lsp["originator"] = self.node_id
-            lsp["neighbors"] = neighbors_costs
-            self.sequence_number += 1
+            with self._lsp_lock:
+                if self._checkpoint and self.sequence_number >= self._seq_reserved:
+                    self._reserve_seq()
+                # LSP com a vizinhança do MEU nó (IDs), só dentro da minha área
+                snap = self._state.snapshot
+                neighbors_costs = self.link_costs.costs_for(self._intra_area_neighbors(snap))
+                # LSPs morrem pelo dedup, não pelo TTL: nunca abaixo de DEFAULT_HOPS
+                # para alcançar nós que ainda não estão na minha LSDB
+                lsp_ttl = max(DEFAULT_HOPS, ttl_for(snap.hop_counts, "*"))
+                lsp = make_packet("lsp", self.channel_local, "*", hops=lsp_ttl,
+                                  headers=[{"id": f"LSP-{self.node_id}-{self.sequence_number}"}],
+                                  payload="")
+                lsp["originator"] = self.node_id
+                lsp["seq"] = self.sequence_number
+                lsp["area"] = self.area
+                lsp["neighbors"] = neighbors_costs
+                if self._inter_area_neighbors(snap):
+                    lsp["summary"], lsp["summary_saltos"] = self._area_summary(snap)
+                    self._emit_border_summaries(snap)
+                self.sequence_number += 1
             self._flood_lsp(lsp)
         finally:
             self._schedule_lsp()
 
+    def _trigger_lsp(self):
+        """Antecipa o próximo LSP (p.ex. custo medido saiu da banda de histerese)."""
+        if self._t_lsp:
+            self._t_lsp.cancel()
+        self._schedule_lsp(LSP_TRIGGER_DELAY)
+
     # ---------- recepção ----------
     def _on_packet(self, packet: Dict[str, Any]) -> None:
+        t0 = time.perf_counter()
         packet = normalize_packet(packet)
         if not validate_packet(packet):
+            DROPS.labels(self.node_id, "malformed").inc()
+            return
+        if "trace" in packet:
+            hop_trace.on_receive(packet, self.node_id, self.clock)
+        self._dispatch(packet)
+        HANDLE_SECONDS.labels(self.node_id, packet["type"]).observe(time.perf_counter() - t0)
+
+    def _dispatch(self, packet: Dict[str, Any]) -> None:
+        # trânsito com rota de origem: só tirar o próximo nó e publicar
+        if packet.get("route") and self._source_forward(packet):
             return
 
-        print(f"[{self.node_id}] 📨 Recibido: {packet['type']} de {channel_to_node(packet.get('from', ''))}")
+        self.log.debug("pkt", "📨 Recibido: %s de %s", packet["type"], packet.get("from", ""))
 
         if packet["type"] == "hello":
             self._handle_hello(packet)
@@ -104,112 +338,462 @@ class LinkStateRouterRedis:
             self._handle_hello_ack(packet)
         elif packet["type"] == "lsp":
             self._handle_lsp(packet)
-        elif packet["type"] == "message":
+        elif packet["type"] == "summary":
+            self._handle_summary(packet)
+        else:
+            # "message" e qualquer outro tipo de dados: os roteadores do meio
+            # só encaminham, o handler registrado atua no destino
             self._handle_data_packet(packet)
 
+    def register_handler(self, p_type: str, fn: Callable[[Dict[str, Any]], None]) -> None:
+        """Entrega a `fn` os pacotes `p_type` destinados a este nó."""
+        self.handlers[p_type] = fn
+
     def _handle_hello(self, packet: Dict[str, Any]) -> None:
         sender_ch = packet.get("from", "")
         sender_node = channel_to_node(sender_ch)
         
-        print(f"[{self.node_id}] 👋 HELLO recibido de {sender_node}")
+        self.log.debug("hello", "👋 HELLO recibido de %s", sender_node)
         
-        if sender_node and sender_node not in self.neighbors:
-            self.neighbors.append(sender_node)
-            print(f"[{self.node_id}] ✨ Novo vizinho descoberto: {sender_node}")
+        self._learn_area(sender_node, packet)
+        if self._add_neighbor(sender_node):
+            self.log.info("hello", "✨ Novo vizinho descoberto: %s", sender_node)
 
         ack = make_packet("hello_ack", self.channel_local, sender_ch, hops=1, payload="HELLO_ACK")
+        ack["area"] = self.area
+        if "ts" in packet:
+            ack["echo_ts"] = packet["ts"]  # devolvido intacto: o RTT se mede no relógio do emissor
         self.transport.publish(sender_ch, ack)
-        print(f"[{self.node_id}] 📤 HELLO_ACK enviado a {sender_node}")
+        self.log.debug("hello", "📤 HELLO_ACK enviado a %s", sender_node)
 
     def _handle_hello_ack(self, packet: Dict[str, Any]) -> None:
         sender_ch = packet.get("from", "")
         sender_node = channel_to_node(sender_ch)
-        print(f"[{self.node_id}] ✅ HELLO_ACK recibido de {sender_node}")
+        self.log.debug("hello", "✅ HELLO_ACK recibido de %s", sender_node)
         
-        if sender_node and sender_node not in self.neighbors:
-            self.neighbors.append(sender_node)
-            print(f"[{self.node_id}] ✨ Novo vizinho descoberto via ACK: {sender_node}")
+        self._learn_area(sender_node, packet)
+        if self._add_neighbor(sender_node):
+            self.log.info("hello", "✨ Novo vizinho descoberto via ACK: %s", sender_node)
+        if sender_node:
+            with self._hello_lock:
+                self._missed_hellos[sender_node] = 0
+
+        if sender_node and "echo_ts" in packet:
+            try:
+                rtt = self.clock.time() * 1000.0 - float(packet["echo_ts"])
+            except (TypeError, ValueError):
+                return
+            cost, changed = self.link_costs.sample(sender_node, rtt)
+            if changed:
+                self.log.info("cost", "📏 Custo para %s → %s (RTT %.1f ms)", sender_node, cost, rtt)
+                self._calculate_routing_table()
+                self._trigger_lsp()
 
     def _handle_lsp(self, packet: Dict[str, Any]) -> None:
         lsp_id = get_packet_id(packet)
         if not lsp_id or lsp_id in self.seen_lsp_ids:
+            DUPLICATES.labels(self.node_id, "lsp").inc()
+            if lsp_id:
+                self._answer_stale_lsp(packet)  # id repetido: o originador pode ter reiniciado do zero
             return
         self.seen_lsp_ids.add(lsp_id)
 
         originator = packet.get("originator", "")
         if not originator:
             return
-
-        self.lsdb[originator] = {
-            "neighbors": dict(packet.get("neighbors", {}))
-        }
-        print(f"[{self.node_id}] LSP recebido de {originator}")
+        if str(packet.get("area", DEFAULT_AREA)) != self.area:
+            return  # LSP de outra área: não entra na LSDB nem é reinundado
+
+        seq = lsp_sequence(packet)
+        if originator == self.node_id:
+            # a inundação nunca devolve um LSP ao originador: só chega aqui a cópia
+            # que um vizinho nos manda em _answer_stale_lsp. A rede lembra de um LSP
+            # nosso mais novo (reinício sem checkpoint): pulamos acima dele e
+            # reanunciamos já. Sob _lsp_lock: _emit_lsp lê e incrementa o número no timer
+            with self._lsp_lock:
+                behind = seq >= self.sequence_number
+                if behind:
+                    self.sequence_number = seq + 1
+            if behind:
+                self.log.warn("lsp", "♻️ A rede lembra do nosso LSP %d: numeração retomada em %d", seq, seq + 1)
+                self._trigger_lsp()
+            return
+        current = self._state.snapshot.lsdb.get(originator)
+        if current is not None and seq <= current.get("seq", -1):
+            DUPLICATES.labels(self.node_id, "lsp_seq").inc()
+            self._answer_stale_lsp(packet)
+            return  # LSP antigo ou repetido: não sobrescreve o mais novo
+
+        record = {"seq": seq, "neighbors": dict(packet.get("neighbors", {}))}
+        if "summary" in packet:
+            record["summary"] = dict(packet["summary"])
+            record["summary_saltos"] = dict(packet.get("summary_saltos") or {})
+        self.log.debug("lsp", "LSP recebido de %s", originator)
 
         exclude = packet.get("from", "")
         self._flood_lsp(packet, exclude=exclude)
 
+        # LSDB + FIB novos publicados juntos: nenhum leitor vê um sem o outro
+        self._state.update(lambda s: self._with_routes(s.with_lsdb_record(originator, record)))
+        if self.log.enabled(DEBUG, "route"):  # routing_table copia a tabela inteira
+            self.log.debug("route", "Tabela recalculada: %s", self.routing_table)
+        self._drain_pending()
+
+    def _answer_stale_lsp(self, packet: Dict[str, Any]) -> None:
+        """LSP de um vizinho com número abaixo do que a LSDB guarda dele: ele reiniciou
+        sem checkpoint e recomeçou do zero. Devolve a cópia mais nova (como o OSPF)
+        para ele retomar a numeração acima dela; senão seus LSPs novos morreriam
+        no dedup até passar o número antigo."""
+        originator = str(packet.get("originator", ""))
+        snap = self._state.snapshot
+        current = snap.lsdb.get(originator)
+        if current is None or originator not in snap.neighbors:
+            return  # só o vizinho direto responde: a cópia viaja um salto
+        if lsp_sequence(packet) >= current.get("seq", -1):
+            return  # repetição normal da inundação
+        ch = get_channel(originator)
+        lsp = make_packet("lsp", ch, ch, hops=1,
+                          headers=[{"id": f"LSP-{originator}-{current['seq']}"}], payload="")
+        lsp["originator"] = originator
+        lsp["seq"] = current["seq"]
+        lsp["area"] = self.area
+        lsp["neighbors"] = dict(current.get("neighbors", {}))
+        self.transport.publish(ch, lsp)
+        self.log.debug("lsp", "LSP velho de %s: devolvida a cópia %s", originator, current["seq"])
+
+    def _handle_summary(self, packet: Dict[str, Any]) -> None:
+        """Resumo de um ABR vizinho de outra área: destinos que ele alcança e a que custo."""
+        sender = channel_to_node(packet.get("from", ""))
+        if not sender:
+            return
+        self._learn_area(sender, packet)
+        routes = {str(d): float(c) for d, c in dict(packet.get("routes", {})).items()}
+        hops = {str(d): int(h) for d, h in dict(packet.get("saltos") or {}).items()}
+        border = dict(self._border_routes)
+        border[sender] = (self.clock.time(), routes, hops)
+        self._border_routes = border  # troca de referência: o SPF lê uma cópia consistente
+        self.log.debug("summary", "🧭 Resumo de %s (área %s): %d destinos", sender, self._area_of(sender), len(routes))
         self._calculate_routing_table()
 
     def _handle_data_packet(self, packet: Dict[str, Any]) -> None:
         if is_deliver_to_me(packet, self.channel_local):
-            print(f"[{self.node_id}] ✅ Mensagem entregue: {packet.get('payload')}")
+            if packet.get("flooded"):
+                # cópias da política "flood": só a primeira é entregue
+                pkt_id = get_packet_id(packet)
+                if pkt_id in self._flooded:
+                    DUPLICATES.labels(self.node_id, "flood").inc()
+                    return
+                self._flooded.add(pkt_id)
+            if "trace" in packet:
+                hop_trace.observe(self.node_id, packet["trace"])
+            if "frag" in packet:
+                packet = self.reassembler.add(packet)
+                if packet is None:
+                    return  # faltam fragmentos
+            if "claim" in packet:
+                packet = self.claims.resolve(self.transport, packet)
+                if packet is None:
+                    DROPS.labels(self.node_id, "claim_missing").inc()
+                    self.log.warn("data", "⚠️ Payload por referência não encontrado (TTL vencido?)")
+                    return
+            handler = self.handlers.get(packet["type"])
+            if handler:
+                handler(packet)
+            else:
+                self.log.info("data", "✅ Mensagem entregue: %s", packet.get("payload"))
+            return
+
+        if self._source_forward(packet):
             return
 
         dst_ch = packet.get("to", "")
         dst_node = channel_to_node(dst_ch)
         if not dst_node:
-            print(f"[{self.node_id}] Destino desconhecido: {dst_ch}")
+            DROPS.labels(self.node_id, "unknown_destination").inc()
+            self.log.warn("fwd", "Destino desconhecido: %s", dst_ch)
             return
 
-        next_hop = self._get_next_hop(dst_node)
-        if next_hop:
-            self._forward_packet(packet, next_hop)
-        else:
-            print(f"[{self.node_id}] Sem rota para {dst_node}")
+        self._route_or_hold(packet, dst_node)
 
     # ---------- flooding & forwarding ----------
     def _flood_lsp(self, packet: Dict[str, Any], exclude: str = None) -> None:
-        for neigh in self.neighbors:
+        for neigh in self._intra_area_neighbors(self._state.snapshot):
             ch = get_channel(neigh)
             if exclude and ch == exclude:
                 continue
             self.transport.publish(ch, packet)
-            print(f"[{self.node_id}] LSP → {neigh} ({ch})")
+            self.log.debug("lsp", "LSP → %s (%s)", neigh, ch)
+
+    def _source_forward(self, packet: Dict[str, Any]) -> bool:
+        """Rota de origem: tira o próximo nó de "route" e encaminha. False se não há rota no pacote."""
+        route = packet.get("route")
+        if not route:
+            return False
+        nxt = str(route[0])
+        packet["route"] = route[1:]
+        if nxt not in self._state.snapshot.neighbors:
+            # estrita: não se desvia por outro caminho
+            DROPS.labels(self.node_id, "bad_source_route").inc()
+            self.log.warn("fwd", "Rota de origem inválida: %s não é vizinho, descartado", nxt)
+            return True
+        self._forward_packet(packet, nxt)
+        return True
 
     def _forward_packet(self, packet: Dict[str, Any], next_hop_node: str) -> None:
         if dec_hops(packet) <= 0:
+            DROPS.labels(self.node_id, "ttl").inc()
             return
+        hop_trace.on_send(packet, self.clock)
         self.transport.publish(get_channel(next_hop_node), packet)
-        print(f"[{self.node_id}] Dados → {next_hop_node}")
+        self.log.debug("fwd", "Dados → %s", next_hop_node)
 
     # ---------- tabela de rotas ----------
+    @property
+    def graph(self) -> Dict[str, Dict[str, float]]:
+        """Grafo da área vindo da LSDB, com os meus enlaces nos custos medidos atuais."""
+        return self._graph_of(self._state.snapshot)
+
+    def _graph_of(self, snap: RouterSnapshot) -> Dict[str, Dict[str, float]]:
+        graph = snap.graph()
+        # minhas arestas sempre com os custos medidos atuais e só para vizinhos vivos
+        # (o meu LSP na LSDB pode estar velho e ainda listar um vizinho caído)
+        graph[self.node_id] = self.link_costs.costs_for(snap.neighbors)
+        for n in snap.neighbors:
+            graph.setdefault(n, {})
+        return graph
+
+    def _with_routes(self, snap: RouterSnapshot) -> RouterSnapshot:
+        """Snapshot derivado de `snap` com a tabela recalculada (Dijkstra sobre a LSDB)."""
+        graph = self._graph_of(snap)
+
+        # resumos inter-área: os injetados pelos ABRs da área (LSDB) e os
+        # recebidos diretamente dos meus vizinhos de outra área
+        summaries = {orig: dict(rec["summary"]) for orig, rec in snap.lsdb.items()
+                     if "summary" in rec and orig != self.node_id}
+        summary_hops = {orig: dict(snap.lsdb[orig].get("summary_saltos") or {}) for orig in summaries}
+        now = self.clock.time()
+        for neigh, (ts, routes, hops) in self._border_routes.items():
+            if now - ts <= BORDER_TIMEOUT and neigh in snap.neighbors:
+                summaries[neigh] = routes
+                summary_hops[neigh] = hops
+        t0 = time.perf_counter()
+        table = routing_table_for(graph, self.node_id, summaries, summary_hops)
+        SPF_SECONDS.labels(self.node_id).observe(time.perf_counter() - t0)
+        return snap.evolve(routing_table=table)
+
+    # ---------- resumos entre áreas (ABR) ----------
+    def _area_summary(self, snap: RouterSnapshot) -> Tuple[Dict[str, float], Dict[str, int]]:
+        """Destinos de outras áreas que eu alcanço pela fronteira (injetados no meu LSP) e seus saltos."""
+        border = set(self._inter_area_neighbors(snap))
+        entries = [e for e in snap.routing_table
+                   if e["next_hop"] in border and float(e["costo"]) < SUMMARY_MAX_COST]
+        return ({str(e["destino"]): float(e["costo"]) for e in entries},
+                {str(e["destino"]): int(e["saltos"]) for e in entries if "saltos" in e})
+
+    def _emit_border_summaries(self, snap: RouterSnapshot) -> None:
+        """Envia a cada vizinho de outra área o que eu alcanço, sem devolver o que veio da área dele."""
+        for neigh in self._inter_area_neighbors(snap):
+            their_area = self._area_of(neigh)
+            routes = {self.node_id: 0.0}
+            hops = {self.node_id: 0}
+            for e in snap.routing_table:
+                dest, nh, cost = str(e["destino"]), str(e["next_hop"]), float(e["costo"])
+                if (dest == neigh or nh == neigh or cost >= SUMMARY_MAX_COST
+                        or self._area_of(dest) == their_area or self._area_of(nh) == their_area):
+                    continue
+                routes[dest] = cost
+                if "saltos" in e:
+                    hops[dest] = int(e["saltos"])
+            ch = get_channel(neigh)
+            pkt = make_packet("summary", self.channel_local, ch, hops=1, payload="")
+            pkt["area"] = self.area
+            pkt["routes"] = routes
+            pkt["saltos"] = hops
+            self.transport.publish(ch, pkt)
+            self.log.debug("summary", "🧭 Resumo → %s (área %s): %d destinos", neigh, their_area, len(routes))
+
     def _calculate_routing_table(self) -> None:
-        graph: Dict[str, Dict[str, float]] = {}
-        for node, rec in self.lsdb.items():
-            graph[node] = {v: float(c) for v, c in rec.get("neighbors", {}).items()}
+        self._state.update(self._with_routes)
+        if self.log.enabled(DEBUG, "route"):
+            self.log.debug("route", "Tabela recalculada: %s", self.routing_table)
+        self._drain_pending()
+
+    # ---------- store-and-forward ----------
+    def _route_or_hold(self, packet: Dict[str, Any], dst_node: str) -> None:
+        """Encaminha se há rota; senão aplica a política sem-rota. Mantém a ordem por destino."""
+        nh = self._get_next_hop(dst_node)
+        if nh and dst_node not in self.pending:
+            self._forward_packet(packet, nh)
+            return
+        if nh:
+            # ainda há pacotes velhos na fila: este entra atrás deles
+            self.pending.push(dst_node, packet)
+            self._drain_pending()
+            return
 
-        if self.node_id not in graph:
-            graph[self.node_id] = {n: 1.0 for n in self.neighbors}
+        if self.no_route_policy == "buffer":
+            if self.pending.push(dst_node, packet):
+                self.log.debug("queue", "⏸️ Sem rota para %s, pacote em espera", dst_node)
+            else:
+                DROPS.labels(self.node_id, "queue_full").inc()
+                self.log.warn("queue", "Sem rota para %s e fila cheia, descartado", dst_node)
+        elif self.no_route_policy == "flood":
+            self._flood_no_route(packet)
+        else:
+            DROPS.labels(self.node_id, "no_route").inc()
+            self.log.warn("fwd", "Sem rota para %s", dst_node)
+
+    def _flood_no_route(self, packet: Dict[str, Any]) -> None:
+        """Política "flood": a todos os vizinhos, uma vez por pacote e gastando TTL."""
+        pkt_id = get_packet_id(packet)
+        if pkt_id in self._flooded:
+            DUPLICATES.labels(self.node_id, "flood").inc()
+            return  # a cópia voltou por outro vizinho sem rota
+        self._flooded.add(pkt_id)
+        packet["flooded"] = True  # o destino descarta as outras cópias
+        if dec_hops(packet) <= 0:
+            DROPS.labels(self.node_id, "ttl").inc()
+            return
+        for neigh in self._state.snapshot.neighbors:
+            hop_trace.on_send(packet, self.clock)
+            self.transport.publish(get_channel(neigh), packet)
+        self.log.debug("fwd", "(fallback) mensagem por flooding")
 
-        self.routing_table = routing_table_for(graph, self.node_id)
-        print(f"[{self.node_id}] Tabela recalculada: {self.routing_table}")
+    def _drain_pending(self) -> None:
+        if not self.pending.destinations():
+            return
+        with self._drain_lock:
+            for dest in self.pending.destinations():
+                nh = self._get_next_hop(dest)
+                if not nh:
+                    continue
+                packets = self.pending.drain(dest)
+                for pkt in packets:
+                    self._forward_packet(pkt, nh)
+                if packets:
+                    self.log.info("queue", "▶️ Rota para %s instalada: %d pacote(s) liberados", dest, len(packets))
+
+    # ---------- checkpoint (warm restart) ----------
+    def _save_checkpoint(self) -> None:
+        if not self._checkpoint:
+            return
+        snap = self._state.snapshot  # vista consistente, sem lock
+        try:
+            self._checkpoint.save(self.sequence_number, snap.lsdb, snap.routing_table, self._border_routes)
+        except Exception as e:
+            self.log.error("ctrl", "⚠️ Falha salvando checkpoint: %s", e)
+
+    def _reserve_seq(self) -> None:
+        """Grava o fim de um bloco novo de números de sequência (chamado sob _lsp_lock)."""
+        self._seq_reserved = self.sequence_number + SEQ_BLOCK
+        try:
+            self._checkpoint.reserve(self._seq_reserved)
+        except Exception as e:
+            self.log.error("ctrl", "⚠️ Falha reservando números de sequência: %s", e)
+
+    def _restore_checkpoint(self) -> bool:
+        if not self._checkpoint:
+            return False
+        try:
+            saved = self._checkpoint.load()
+        except Exception as e:
+            # checkpoint inutilizável: o roteador sobe a frio em vez de não subir
+            self.log.error("ctrl", "⚠️ Falha lendo checkpoint: %s", e)
+            return False
+        if not saved:
+            return False
+
+        # o arquivo guarda o fim do último bloco reservado: nenhum LSP saiu acima dele
+        self.sequence_number = self._seq_reserved = saved["sequence_number"]
+        if not saved["saved_at"]:
+            # só houve reserva de bloco antes da queda: a numeração continua, a LSDB vem do zero
+            self.log.info("ctrl", "♻️ Checkpoint sem LSDB: seq=%d", self.sequence_number)
+            return False
+        own = saved["lsdb"].get(self.node_id, {}).get("neighbors", {})
+        # resumos da fronteira com a hora original: os velhos vencem no primeiro SPF
+        self._border_routes = dict(saved["border_routes"])
+
+        def restore(s: RouterSnapshot) -> RouterSnapshot:
+            s = s.with_lsdb(saved["lsdb"])
+            return s.evolve(neighbors=list(s.neighbors) + list(own),
+                            routing_table=saved["routing_table"])
+        self._state.update(restore)
+        self.log.info("ctrl", "♻️ Warm restart: LSDB=%d rotas=%d seq=%d",
+                      len(saved["lsdb"]), len(saved["routing_table"]), self.sequence_number)
+        return True
 
     def _get_next_hop(self, destination_node: str) -> str:
-        for entry in self.routing_table:
-            if entry["destino"] == destination_node:
-                return str(entry["next_hop"])
-        return ""
+        # leitura sem lock: um único acesso à referência do snapshot vigente
+        return self._state.snapshot.fib.get(destination_node, "")
+
+    # ---------- rotas de origem ----------
+    def path_to(self, dst_node: str) -> List[str]:
+        """Caminho SPF [eu, ..., dst] ([] se fora da área/inalcançável). Cache por destino."""
+        snap = self._state.snapshot
+        version, parent, cache = self._path_cache
+        if version != snap.version:
+            parent, cache = shortest_path_tree(self._graph_of(snap), self.node_id), {}
+            self._path_cache = (snap.version, parent, cache)
+        path = cache.get(dst_node)
+        if path is None:
+            path = []
+            if dst_node in parent and dst_node != self.node_id:
+                node = dst_node
+                while node is not None:
+                    path.append(node)
+                    node = parent[node]
+                path.reverse()
+            cache[dst_node] = path
+        return path
+
+    def paths_to(self, dst_node: str, k: int = 3) -> List[List[str]]:
+        """Os k caminhos mais curtos até dst_node, para fixar uma rota alternativa."""
+        return k_shortest_paths(self.graph, self.node_id, dst_node, k)
+
+    def _route_header(self, dst_node: str, source_route: Union[bool, Sequence[str], None]) -> List[str]:
+        """Cabeçalho "route" (nós depois de mim até dst) ou [] para usar a FIB."""
+        if source_route is None:
+            source_route = self.source_route
+        if source_route is True:
+            path = self.path_to(dst_node)
+        elif source_route:
+            path = list(source_route)
+            if path[0] != self.node_id:
+                path.insert(0, self.node_id)
+            if path[-1] != dst_node or len(path) < 2:
+                raise ValueError(f"Caminho {path} não termina em {dst_node}")
+        else:
+            return []
+        return path[1:]
 
     # ---------- API de envio ----------
-    def send(self, dst_node: str, payload: str, hops: int = 8) -> None:
-        pkt = make_packet("message", self.channel_local, get_channel(dst_node), hops=hops, payload=payload)
-        nh = self._get_next_hop(dst_node)
-        if nh:
-            self._forward_packet(pkt, nh)
-        else:
-            for neigh in self.neighbors:
-                self.transport.publish(get_channel(neigh), pkt)
-            print(f"[{self.node_id}] (fallback) mensagem inicial por flooding")
+    def send(self, dst_node: str, payload: Any, hops: Optional[int] = None,
+             p_type: str = "message", extra: Optional[Dict[str, Any]] = None,
+             claim_check: bool = False, source_route: Union[bool, Sequence[str], None] = None,
+             trace: Optional[bool] = None) -> None:
+        route = (extra or {}).get("route") or self._route_header(dst_node, source_route)
+        if hops is None and route:
+            hops = len(route) + 1  # rota fixa: os saltos dela (+1, a origem também decrementa)
+        if hops is None:
+            # TTL pelo nº de saltos do caminho SPF (não pelo custo) + margem
+            hops = ttl_for(self._state.snapshot.hop_counts, dst_node, fallback=DEFAULT_HOPS)
+        claim = None
+        if claim_check or self.claims.wants(payload):
+            # o corpo fica no Redis; pelos saltos só viaja a referência
+            claim, payload = self.claims.store(self.transport, payload), ""
+        pkt = make_packet(p_type, self.channel_local, get_channel(dst_node), hops=hops, payload=payload)
+        if extra:
+            pkt.update(extra)
+        if claim:
+            pkt["claim"] = claim
+        if route:
+            pkt["route"] = route
+        if trace or (trace is None and hop_trace.TRACE_ALL):
+            hop_trace.open_trace(pkt, self.node_id, self.clock)
+        # payloads grandes saem em fragmentos, um atrás do outro, sem esperar
+        for frag in fragment_packet(pkt):
+            if not self._source_forward(frag):
+                self._route_or_hold(frag, dst_node)
 
 def main():
     if len(sys.argv) < 3:
@@ -225,23 +809,19 @@ def main():
         print(f"Erro carregando topologia '{topo_path}': {e}")
         sys.exit(2)
 
-    router = LinkStateRouterRedis(node, graph)
+    router = LinkStateRouterRedis(node, graph, areas=load_areas(topo_path))
 
     try:
         router.start()
         if node == "A":
             time.sleep(2.0)
-            router.send("D", "Olá de A (LSR+Redis)!", hops=6)
+            router.send("D", "Olá de A (LSR+Redis)!")
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
         print("\nSaindo...")
     finally:
-        router._stop.set()
-        try:
-            router.transport.stop()
-        except Exception:
-            pass
+        router.stop()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,129 @@
+# router_state.py
+"""
+Estado de enrutamiento inmutable (copy-on-write).
+
+Cada RouterSnapshot agrupa la vista de la LSDB, el conjunto de vecinos y la
+FIB (destino -> next hop, más los saltos del camino para dimensionar TTLs). Los snapshots nunca se modifican: los escritores
+construyen uno nuevo y lo publican con un único cambio de referencia, así que
+los lectores del data path (forwarding) no toman locks y nunca ven una tabla
+a medio actualizar.
+
+Uso típico:
+    state = RouterState(neighbors=["B", "C"])
+    snap = state.snapshot              # lectura sin lock
+    nh = snap.fib.get("D", "")
+    state.update(lambda s: s.with_neighbor("E"))   # escritura serializada
+"""
+from __future__ import annotations
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+
+
+def _freeze_record(rec: Mapping[str, Any]) -> Mapping[str, Any]:
+    out: Dict[str, Any] = {}
+    for k, v in rec.items():
+        out[k] = MappingProxyType(dict(v)) if isinstance(v, Mapping) else v
+    return MappingProxyType(out)
+
+
+class RouterSnapshot:
+    """Vista inmutable del estado de un router en un instante dado."""
+    __slots__ = ("lsdb", "neighbors", "routing_table", "fib", "hop_counts", "version")
+
+    def __init__(self,
+                 lsdb: Optional[Mapping[str, Mapping[str, Any]]] = None,
+                 neighbors: Iterable[str] = (),
+                 routing_table: Iterable[Mapping[str, Any]] = (),
+                 version: int = 0):
+        table = tuple(e if isinstance(e, MappingProxyType) else MappingProxyType(dict(e))
+                      for e in routing_table)
+        fib = MappingProxyType({str(e["destino"]): str(e["next_hop"]) for e in table})
+        hop_counts = MappingProxyType({str(e["destino"]): int(e["saltos"]) for e in table if "saltos" in e})
+        object.__setattr__(self, "lsdb", lsdb if isinstance(lsdb, MappingProxyType)
+                           else MappingProxyType(dict(lsdb or {})))
+        # tupla (y no set) para conservar el orden de descubrimiento
+        object.__setattr__(self, "neighbors", tuple(dict.fromkeys(neighbors)))
+        object.__setattr__(self, "routing_table", table)
+        object.__setattr__(self, "fib", fib)
+        object.__setattr__(self, "hop_counts", hop_counts)
+        object.__setattr__(self, "version", version)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RouterSnapshot es inmutable")
+
+    def __repr__(self) -> str:
+        return (f"RouterSnapshot(v{self.version}, vecinos={list(self.neighbors)}, "
+                f"lsdb={len(self.lsdb)}, rutas={len(self.routing_table)})")
+
+    # ---------- constructores derivados (copy-on-write) ----------
+    def evolve(self, *,
+               lsdb: Optional[Mapping[str, Mapping[str, Any]]] = None,
+               neighbors: Optional[Iterable[str]] = None,
+               routing_table: Optional[Iterable[Mapping[str, Any]]] = None) -> "RouterSnapshot":
+        return RouterSnapshot(
+            lsdb=self.lsdb if lsdb is None else lsdb,
+            neighbors=self.neighbors if neighbors is None else neighbors,
+            routing_table=self.routing_table if routing_table is None else routing_table,
+            version=self.version + 1,
+        )
+
+    def with_neighbor(self, node: str) -> Optional["RouterSnapshot"]:
+        """Nuevo snapshot con `node` como vecino, o None si ya lo era."""
+        if not node or node in self.neighbors:
+            return None
+        return self.evolve(neighbors=self.neighbors + (node,))
+
+    def without_neighbor(self, node: str) -> Optional["RouterSnapshot"]:
+        """Nuevo snapshot sin `node` entre los vecinos (vecino caído), o None si no lo era."""
+        if node not in self.neighbors:
+            return None
+        return self.evolve(neighbors=tuple(n for n in self.neighbors if n != node))
+
+    def with_lsdb_record(self, originator: str, record: Mapping[str, Any]) -> "RouterSnapshot":
+        """Nuevo snapshot reemplazando el registro de `originator` (el resto se comparte)."""
+        lsdb = dict(self.lsdb)
+        lsdb[originator] = _freeze_record(record)
+        return self.evolve(lsdb=MappingProxyType(lsdb))
+
+    def with_lsdb(self, records: Mapping[str, Mapping[str, Any]]) -> "RouterSnapshot":
+        """Nuevo snapshot con la LSDB completa reemplazada (p.ej. al restaurar un checkpoint)."""
+        return self.evolve(lsdb=MappingProxyType({o: _freeze_record(r) for o, r in records.items()}))
+
+    def next_hop(self, destination: str) -> str:
+        return self.fib.get(destination, "")
+
+    def graph(self) -> Dict[str, Dict[str, float]]:
+        """Grafo {nodo: {vecino: costo}} reconstruido desde la LSDB."""
+        return {node: {v: float(c) for v, c in rec.get("neighbors", _EMPTY).items()}
+                for node, rec in self.lsdb.items()}
+
+
+class RouterState:
+    """
+    Contenedor del snapshot vigente.
+    - Lectores: `state.snapshot` (lectura atómica de una referencia, sin lock).
+    - Escritores: `state.update(fn)`; fn recibe el snapshot actual y devuelve el
+      nuevo (o None si no hay cambios). Los escritores se serializan entre sí.
+    """
+    def __init__(self, neighbors: Iterable[str] = ()):
+        self._snap = RouterSnapshot(neighbors=neighbors)
+        self._write_lock = threading.Lock()
+
+    @property
+    def snapshot(self) -> RouterSnapshot:
+        return self._snap
+
+    def update(self, fn: Callable[[RouterSnapshot], Optional[RouterSnapshot]]) -> Tuple[RouterSnapshot, bool]:
+        with self._write_lock:
+            new = fn(self._snap)
+            if new is None or new is self._snap:
+                return self._snap, False
+            self._snap = new
+            return new, True
+
+    def routing_table(self) -> List[Dict[str, Any]]:
+        """Copia mutable de la tabla vigente (para mostrar o serializar)."""
+        return [dict(e) for e in self._snap.routing_table]
@@ -0,0 +1,33 @@
+# test_dv_vecino_caido.py
+"""
+Distance vector sobre el simulador (netsim.py, reloj virtual): un vecino
+configurado que nunca arranca vence por ROUTE_TIMEOUT como cualquier otro,
+y el tráfico deja de pasar por él.
+
+    python -m pytest -q test_dv_vecino_caido.py     (o python test_dv_vecino_caido.py)
+"""
+from dijkstra_rt import load_topology
+from netsim import SimNetwork
+from router_dv_redis import ROUTE_TIMEOUT
+
+
+def test_vecino_caido_desde_el_arranque():
+    net = SimNetwork(load_topology("topo.json"), router="dv", seed=1)
+    # B aislado desde antes de arrancar: A y D nunca reciben su vector
+    net.set_link("A", "B", up=False)
+    net.set_link("B", "D", up=False)
+    net.run(ROUTE_TIMEOUT + 60)
+
+    a = net.routers["A"]
+    assert "B" in a.dead_neighbors
+    d = {e["destino"]: e for e in a.routing_table}["D"]
+    assert (d["next_hop"], d["costo"]) == ("C", 2.0)
+
+    net.send_traffic(10, pairs=[("A", "D")])
+    net.run(5)
+    assert net.report()["delivered"] == 10
+
+
+if __name__ == "__main__":
+    test_vecino_caido_desde_el_arranque()
+    print("✅ test_dv_vecino_caido OK")
@@ -0,0 +1,44 @@
+# test_echo.py
+"""
+Ping sobre el simulador (netsim.py, reloj virtual): los envíos y los RTT
+corren en el reloj del router, así el RTT es el de los enlaces simulados.
+
+    python -m pytest -q test_echo.py     (o python test_echo.py)
+"""
+from dijkstra_rt import load_topology
+from netsim import SimNetwork
+from echo import EchoService
+
+
+def test_ping_y_flood_en_tiempo_virtual():
+    # 10 ms por unidad de costo: A-B-D ida y vuelta = 4 enlaces = 40 ms
+    net = SimNetwork(load_topology("topo.json"), router="lsr", seed=1, delay_per_cost=0.01)
+    assert net.run_until_converged(60) is not None
+    echos = {n: EchoService(r) for n, r in net.routers.items()}
+    results = []
+
+    echos["A"].start_ping("D", count=5, interval=1.0, on_done=results.append)
+    net.run(10)
+    ping = results.pop()
+    assert (ping["sent"], ping["received"]) == (5, 5)
+    assert abs(ping["max"] - 0.04) < 1e-6
+    assert abs(ping["seconds"] - 4.04) < 1e-6   # 4 intervalos + el último RTT
+
+    echos["A"].start_flood("D", count=100, window=4, on_done=results.append)
+    net.run(10)
+    flood = results.pop()
+    assert flood["received"] == 100
+    assert abs(flood["pps"] - 100) < 1   # 4 en vuelo / 40 ms
+
+    # sin camino: todo se pierde y la corrida termina igual
+    net.set_link("B", "D", up=False)
+    net.set_link("C", "D", up=False)
+    echos["A"].start_ping("D", count=3, interval=0.5, timeout=2.0, on_done=results.append)
+    net.run(10)
+    assert results.pop()["loss"] == 1.0
+    assert echos["A"]._runs == {}
+
+
+if __name__ == "__main__":
+    test_ping_y_flood_en_tiempo_virtual()
+    print("✅ test_echo OK")
@@ -0,0 +1,72 @@
+# test_multipath.py
+"""
+Transferencias por caminos disjuntos sobre el simulador (netsim.py, reloj
+virtual): el reparto entre los dos caminos del rombo de topo.json, la
+recuperación tras cortar un camino un momento y el abandono con la red caída
+sin dejar lugares de ventana ocupados para la transferencia siguiente.
+
+    python -m pytest -q test_multipath.py     (o python test_multipath.py)
+"""
+from dijkstra_rt import load_topology
+from netsim import SimNetwork
+from multipath import Multipath, MAX_TIMEOUT
+
+DATA = "".join(chr(ord("a") + i % 26) for i in range(20_000))
+
+
+def _setup():
+    net = SimNetwork(load_topology("topo.json"), router="lsr", seed=1)
+    assert net.run_until_converged(60) is not None
+    got = []
+    mps = {n: Multipath(r, on_message=lambda src, data: got.append((src, data)), chunk_size=500, window=8)
+           for n, r in net.routers.items()}
+    return net, mps, got
+
+
+def test_reparte_entre_caminos_disjuntos():
+    net, mps, got = _setup()
+    tid = mps["A"].send_bulk("D", DATA)
+    net.run(10)
+    assert got == [("A", DATA)]
+    per_path = mps["A"].completed[tid]["per_path"]
+    assert set(per_path) == {"A-B-D", "A-C-D"}
+    assert all(n > 0 for n in per_path.values())
+    assert sum(per_path.values()) == 40
+
+
+def test_camino_cortado_se_recupera():
+    net, mps, got = _setup()
+    net.set_link("A", "C", up=False)
+    tid = mps["A"].send_bulk("D", DATA)
+    net.run(2.5)
+    net.set_link("A", "C", up=True)
+    net.run(30)
+    assert got == [("A", DATA)]
+    assert mps["A"].completed[tid]["seconds"] < 15
+    # la penalización del corte tiene tope
+    assert all(p.timeout() <= MAX_TIMEOUT for p in mps["A"].paths())
+
+
+def test_abandono_no_bloquea_la_siguiente():
+    net, mps, got = _setup()
+    sender = mps["A"]
+    net.paused = True
+    first = sender.send_bulk("D", DATA)
+    net.run(200)
+    assert sender.active() == {}
+    assert first not in sender.completed
+    assert all(p.latency <= MAX_TIMEOUT for p in sender.paths())
+
+    net.paused = False
+    assert net.run_until_converged(60) is not None
+    second = sender.send_bulk("D", DATA)
+    net.run(60)
+    assert got == [("A", DATA)]
+    assert sum(sender.completed[second]["per_path"].values()) == 40
+
+
+if __name__ == "__main__":
+    test_reparte_entre_caminos_disjuntos()
+    test_camino_cortado_se_recupera()
+    test_abandono_no_bloquea_la_siguiente()
+    print("✅ test_multipath OK")
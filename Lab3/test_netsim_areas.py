@@ -0,0 +1,50 @@
+# test_netsim_areas.py
+"""
+LSR con dos áreas sobre el simulador (netsim.py, reloj virtual): la LSDB de
+cada router queda dentro de su área, las rutas a la otra área llegan por los
+resúmenes de los ABRs y los mensajes entre áreas se entregan.
+
+    python -m pytest -q test_netsim_areas.py     (o python test_netsim_areas.py)
+"""
+from dijkstra_rt import load_topology, load_areas
+from netsim import SimNetwork
+
+# cadena A-B-C | D-E-F: C y D son los ABRs, A y F quedan a 2 saltos de la frontera
+CHAIN = {"A": {"B": 1}, "B": {"A": 1, "C": 1}, "C": {"B": 1, "D": 1},
+         "D": {"C": 1, "E": 1}, "E": {"D": 1, "F": 1}, "F": {"E": 1}}
+CHAIN_AREAS = {"A": "0", "B": "0", "C": "0", "D": "1", "E": "1", "F": "1"}
+
+
+def test_dos_areas_convergen_y_entregan():
+    net = SimNetwork(CHAIN, router="lsr", seed=1, areas=CHAIN_AREAS)
+    assert net.run_until_converged(120) is not None
+
+    for node, r in net.routers.items():
+        lsdb = r._state.snapshot.lsdb
+        assert {CHAIN_AREAS[o] for o in lsdb} <= {CHAIN_AREAS[node]}, node
+    # A no ve los LSPs del área 1, pero llega a F por el resumen de C
+    a = net.routers["A"]
+    assert not set(a._state.snapshot.lsdb) & {"D", "E", "F"}
+    f = {e["destino"]: e for e in a.routing_table}["F"]
+    assert (f["next_hop"], f["costo"], f["saltos"]) == ("B", 5.0, 5)
+
+    pairs = [("A", "F"), ("F", "A"), ("B", "E"), ("E", "B")]
+    net.send_traffic(20, pairs=pairs)
+    net.run(5)
+    assert net.report()["delivered"] == 20
+
+
+def test_areas_de_topo_areas_json():
+    net = SimNetwork(load_topology("topo_areas.json"), router="lsr", seed=1,
+                     areas=load_areas("topo_areas.json"))
+    assert net.run_until_converged(60) is not None
+    assert net.routers["A"].area == "0" and net.routers["D"].area == "1"
+    net.send_traffic(40)
+    net.run(5)
+    assert net.report()["delivered"] == 40
+
+
+if __name__ == "__main__":
+    test_dos_areas_convergen_y_entregan()
+    test_areas_de_topo_areas_json()
+    print("✅ test_netsim_areas OK")
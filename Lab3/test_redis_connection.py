@@ -1,5 +1,8 @@
 # test_redis_connection.py
 import os, redis
+from resp_broker import ensure_embedded
+
+ensure_embedded()   # REDIS_HOST=embedded: broker local en un puerto efímero
 
 HOST = os.getenv("REDIS_HOST")
 PORT = int(os.getenv("REDIS_PORT", "6379"))
@@ -0,0 +1,79 @@
+# test_reliable.py
+"""
+Entrega confiable sobre el simulador (netsim.py, reloj virtual): después de
+abandonar un destino, los mensajes nuevos tienen que llegar a la aplicación,
+y una copia tardía de la sesión abandonada no puede reiniciar la nueva.
+
+    python -m pytest -q test_reliable.py     (o python test_reliable.py)
+"""
+from dijkstra_rt import load_topology
+from netsim import SimNetwork
+from reliable import ReliableChannel
+
+
+def test_envios_despues_de_abandonar_un_destino():
+    net = SimNetwork(load_topology("topo.json"), router="dv", seed=1)
+    assert net.run_until_converged(60) is not None
+    got = []
+    channels = {n: ReliableChannel(r, on_message=lambda src, data: got.append(data), max_retries=2)
+                for n, r in net.routers.items()}
+    sender = channels["A"]
+
+    for i in range(3):
+        sender.send_reliable("D", f"antes-{i}")
+    net.run(5)
+    assert got == ["antes-0", "antes-1", "antes-2"]
+
+    # "Redis" caído: nada llega, el emisor agota los reintentos y abandona D
+    net.paused = True
+    for i in range(2):
+        sender.send_reliable("D", f"perdido-{i}")
+    net.run(20)
+    assert sender.stats["failed"] == 2
+    assert sender.outstanding() == {}
+
+    net.paused = False
+    for i in range(5):
+        sender.send_reliable("D", f"despues-{i}")
+    net.run(10)
+    assert got[3:] == [f"despues-{i}" for i in range(5)]
+    assert sender.stats["acked"] == 8
+
+
+def test_copia_tardia_de_sesion_abandonada():
+    net = SimNetwork(load_topology("topo.json"), router="dv", seed=1)
+    assert net.run_until_converged(60) is not None
+    got = []
+    channels = {n: ReliableChannel(r, on_message=lambda src, data: got.append(data), max_retries=2)
+                for n, r in net.routers.items()}
+    sender, receiver = channels["A"], channels["D"]
+    sender.send_reliable("D", "calentar")
+    net.run(2)
+
+    # A -> vecinos muy lento: las copias de "viejo-0" llegan después de abandonar D
+    for n in ("B", "C"):
+        net.set_link("A", n, both=False, delay=5.0)
+    sender.send_reliable("D", "viejo-0")
+    net.run(3)
+    assert sender.outstanding() == {}
+    for n in ("B", "C"):
+        net.set_link("A", n, both=False, delay=0.001)
+
+    for i in range(2):
+        sender.send_reliable("D", f"nuevo-{i}")
+    net.run(1)
+    assert got == ["calentar", "nuevo-0", "nuevo-1"]
+    net.run(10)   # llegan las copias de la sesión vieja
+    assert receiver.stats["stale"] > 0
+    assert got == ["calentar", "nuevo-0", "nuevo-1"]
+
+    sender.send_reliable("D", "nuevo-2")
+    net.run(5)
+    assert got[-1] == "nuevo-2"
+    assert sender.outstanding() == {}
+
+
+if __name__ == "__main__":
+    test_envios_despues_de_abandonar_un_destino()
+    test_copia_tardia_de_sesion_abandonada()
+    print("✅ test_reliable OK")
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# topogen.py
+"""
+Generador de topologías con pesos para pruebas de escala.
+
+Tipos (todas no dirigidas, pesos enteros 1..max_weight al azar):
+- grid:       grilla RxC, nodos "r<i>c<j>"
+- ring:       anillo de N nodos
+- geometric:  N puntos al azar en el cuadrado unitario, enlace si distan
+              menos que el radio de conectividad; peso proporcional a la
+              distancia
+- erdos:      Erdős–Rényi G(N, p), p = 2·ln(N)/N por defecto
+- scalefree:  Barabási–Albert (cada nodo nuevo se une a m existentes con
+              probabilidad proporcional al grado)
+
+geometric/erdos pueden salir desconectados: connect=True (por defecto) une
+cada componente suelta a la principal con un enlace extra.
+
+Los archivos usan los formatos de siempre: topo.json con pesos
+({"type": "topo", "config": {"n0": {"n1": 3, ...}}}) y names.json con
+usuario = id del nodo.
+
+Uso:
+    python topogen.py grid 30x30 -o topo_grid.json --names names_grid.json
+    python topogen.py scalefree 10000 --seed 7 -o topo_sf.json
+"""
+from __future__ import annotations
+import argparse
+import json
+import math
+import random
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dijkstra_rt import Graph
+
+KINDS = ("grid", "ring", "geometric", "erdos", "scalefree")
+DEFAULT_MAX_WEIGHT = 10
+
+
+def _add_edge(graph: Graph, u: str, v: str, w: float) -> None:
+    graph[u][v] = w
+    graph[v][u] = w
+
+
+def _weight_fn(rng: random.Random, max_weight: int) -> Callable[[], float]:
+    if max_weight <= 1:
+        return lambda: 1.0
+    return lambda: float(rng.randint(1, max_weight))
+
+
+def _nodes(n: int) -> List[str]:
+    return [f"n{i}" for i in range(n)]
+
+
+def grid(rows: int, cols: int, rng: Optional[random.Random] = None,
+         max_weight: int = 1) -> Graph:
+    """Grilla rows x cols con nodos "r<i>c<j>"."""
+    weight = _weight_fn(rng or random.Random(0), max_weight)
+    graph: Graph = {f"r{i}c{j}": {} for i in range(rows) for j in range(cols)}
+    for i in range(rows):
+        for j in range(cols):
+            if i + 1 < rows:
+                _add_edge(graph, f"r{i}c{j}", f"r{i + 1}c{j}", weight())
+            if j + 1 < cols:
+                _add_edge(graph, f"r{i}c{j}", f"r{i}c{j + 1}", weight())
+    return graph
+
+
+def ring(n: int, rng: Optional[random.Random] = None, max_weight: int = 1) -> Graph:
+    weight = _weight_fn(rng or random.Random(0), max_weight)
+    names = _nodes(n)
+    graph: Graph = {u: {} for u in names}
+    for i in range(n if n > 2 else n - 1):
+        _add_edge(graph, names[i], names[(i + 1) % n], weight())
+    return graph
+
+
+def geometric(n: int, rng: Optional[random.Random] = None, max_weight: int = DEFAULT_MAX_WEIGHT,
+              radius: Optional[float] = None, connect: bool = True) -> Graph:
+    """Grafo geométrico aleatorio; los vecinos se buscan por celdas de lado `radius` (O(N))."""
+    rng = rng or random.Random(0)
+    r = radius or math.sqrt(2.0 * math.log(max(n, 2)) / (math.pi * max(n, 1)))
+    names = _nodes(n)
+    pts = [(rng.random(), rng.random()) for _ in range(n)]
+    cells: Dict[Tuple[int, int], List[int]] = {}
+    for i, (x, y) in enumerate(pts):
+        cells.setdefault((int(x / r), int(y / r)), []).append(i)
+    graph: Graph = {u: {} for u in names}
+    for (cx, cy), members in cells.items():
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in cells.get((cx + dx, cy + dy), ()):
+                    for i in members:
+                        if i < j:
+                            d = math.dist(pts[i], pts[j])
+                            if d <= r:
+                                w = max(1.0, float(math.ceil(d / r * max(1, max_weight))))
+                                _add_edge(graph, names[i], names[j], w)
+    if connect:
+        _connect(graph, rng, lambda: float(max(1, max_weight)))
+    return graph
+
+
+def erdos(n: int, rng: Optional[random.Random] = None, max_weight: int = DEFAULT_MAX_WEIGHT,
+          p: Optional[float] = None, connect: bool = True) -> Graph:
+    """G(n, p) con salto geométrico entre aristas (Batagelj–Brandes): O(N + aristas)."""
+    rng = rng or random.Random(0)
+    weight = _weight_fn(rng, max_weight)
+    p = min(1.0, p if p is not None else 2.0 * math.log(max(n, 2)) / max(n, 1))
+    names = _nodes(n)
+    graph: Graph = {u: {} for u in names}
+    if p > 0:
+        log_q = math.log(1.0 - p) if p < 1.0 else None
+        v, w = 1, -1
+        while v < n:
+            if log_q is None:
+                w += 1
+            else:
+                w += 1 + int(math.log(1.0 - rng.random()) / log_q)
+            while w >= v and v < n:
+                w -= v
+                v += 1
+            if v < n:
+                _add_edge(graph, names[v], names[w], weight())
+    if connect:
+        _connect(graph, rng, weight)
+    return graph
+
+
+def scalefree(n: int, rng: Optional[random.Random] = None, max_weight: int = DEFAULT_MAX_WEIGHT,
+              m: int = 2) -> Graph:
+    """Barabási–Albert: núcleo completo de m+1 nodos y luego m enlaces por nodo nuevo."""
+    rng = rng or random.Random(0)
+    weight = _weight_fn(rng, max_weight)
+    names = _nodes(n)
+    graph: Graph = {u: {} for u in names}
+    core = min(n, m + 1)
+    # cada nodo aparece en `ends` una vez por enlace: elegir al azar = proporcional al grado
+    ends: List[int] = []
+    for i in range(core):
+        for j in range(i + 1, core):
+            _add_edge(graph, names[i], names[j], weight())
+            ends += (i, j)
+    for i in range(core, n):
+        targets = set()
+        while len(targets) < min(m, i):
+            targets.add(rng.choice(ends) if ends else rng.randrange(i))
+        for j in targets:
+            _add_edge(graph, names[i], names[j], weight())
+            ends += (i, j)
+    return graph
+
+
+def _connect(graph: Graph, rng: random.Random, weight: Callable[[], float]) -> None:
+    """Une cada componente a la más grande con un enlace entre nodos al azar."""
+    comps: List[List[str]] = []
+    seen = set()
+    for start in graph:
+        if start in seen:
+            continue
+        comp, stack = [start], [start]
+        seen.add(start)
+        while stack:
+            for v in graph[stack.pop()]:
+                if v not in seen:
+                    seen.add(v)
+                    comp.append(v)
+                    stack.append(v)
+        comps.append(comp)
+    if len(comps) < 2:
+        return
+    comps.sort(key=len, reverse=True)
+    main = comps[0]
+    for comp in comps[1:]:
+        _add_edge(graph, rng.choice(comp), rng.choice(main), weight())
+
+
+def generate(kind: str, size: str, seed: int = 0, max_weight: int = DEFAULT_MAX_WEIGHT) -> Graph:
+    """`size` es N, o "RxC" para grid (con N a secas, la grilla casi cuadrada más cercana)."""
+    rng = random.Random(seed)
+    if kind == "grid":
+        if "x" in str(size).lower():
+            rows, cols = (int(x) for x in str(size).lower().split("x"))
+        else:
+            n = int(size)
+            rows = max(1, int(math.sqrt(n)))
+            cols = max(1, n // rows)
+        return grid(rows, cols, rng, max_weight)
+    n = int(size)
+    if kind == "ring":
+        return ring(n, rng, max_weight)
+    if kind == "geometric":
+        return geometric(n, rng, max_weight)
+    if kind == "erdos":
+        return erdos(n, rng, max_weight)
+    if kind == "scalefree":
+        return scalefree(n, rng, max_weight)
+    raise ValueError(f"tipo desconocido '{kind}' (usar uno de {KINDS})")
+
+
+def edge_count(graph: Graph) -> int:
+    return sum(len(neighs) for neighs in graph.values()) // 2
+
+
+def write_topology(graph: Graph, path: str) -> None:
+    """topo.json con pesos (lo lee dijkstra_rt.load_topology)."""
+    cfg = {u: {v: int(w) if float(w).is_integer() else w for v, w in neighs.items()}
+           for u, neighs in graph.items()}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "topo", "config": cfg}, f, separators=(",", ":"))
+
+
+def write_names(graph: Graph, path: str) -> None:
+    """names.json con usuario = id del nodo."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "names", "config": {u: u for u in graph}}, f, separators=(",", ":"))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Genera topo.json/names.json sintéticos")
+    ap.add_argument("kind", choices=KINDS)
+    ap.add_argument("size", help="cantidad de nodos (o RxC para grid)")
+    ap.add_argument("-o", "--out", default="topo_gen.json")
+    ap.add_argument("--names", help="además escribir names.json en esta ruta")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--max-weight", type=int, default=DEFAULT_MAX_WEIGHT, help="1 = todos los pesos en 1")
+    args = ap.parse_args()
+
+    graph = generate(args.kind, args.size, args.seed, args.max_weight)
+    write_topology(graph, args.out)
+    if args.names:
+        write_names(graph, args.names)
+    print(f"🗺️ {args.kind}: {len(graph)} nodos, {edge_count(graph)} enlaces → {args.out}")
+
+
+if __name__ == "__main__":
+    main()